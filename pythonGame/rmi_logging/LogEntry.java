@@ -0,0 +1,50 @@
+import java.io.Serializable;
+
+/**
+ * Entrada de log transportable por RMI, usada para registrar lotes
+ */
+public class LogEntry implements Serializable {
+    
+    private static final long serialVersionUID = 1L;
+    
+    private final String type;
+    private final long timestamp;
+    private final String gameId;
+    private final String operation;
+    private final String[] details;
+    
+    /**
+     * @param type Tipo de registro ("ini" o "fin")
+     * @param timestamp Tiempo de la operación
+     * @param gameId Identificador del juego
+     * @param operation Operación realizada
+     * @param details Detalles adicionales de la operación
+     */
+    public LogEntry(String type, long timestamp, String gameId, String operation, String... details) {
+        this.type = type;
+        this.timestamp = timestamp;
+        this.gameId = gameId;
+        this.operation = operation;
+        this.details = details != null ? details : new String[0];
+    }
+    
+    public String getType() {
+        return type;
+    }
+    
+    public long getTimestamp() {
+        return timestamp;
+    }
+    
+    public String getGameId() {
+        return gameId;
+    }
+    
+    public String getOperation() {
+        return operation;
+    }
+    
+    public String[] getDetails() {
+        return details;
+    }
+}
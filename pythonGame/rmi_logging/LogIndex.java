@@ -0,0 +1,134 @@
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * Índice en memoria de las entradas de log por juego
+ *
+ * Para cada gameId guarda, en arreglos primitivos, el timestamp de cada
+ * entrada y su ubicación en disco (segmento, desplazamiento y largo), de modo
+ * que consultar los logs de un juego no recorre el resto del almacén.
+ */
+public class LogIndex {
+
+    /**
+     * Ubicación de una entrada dentro de los archivos del almacén
+     */
+    public static class Ref {
+        public final long generation;
+        public final long offset;
+        public final int length;
+
+        Ref(long generation, long offset, int length) {
+            this.generation = generation;
+            this.offset = offset;
+            this.length = length;
+        }
+    }
+
+    private static class GameEntries {
+        long[] timestamps = new long[16];
+        long[] generations = new long[16];
+        long[] offsets = new long[16];
+        int[] lengths = new int[16];
+        int start = 0;
+        int size = 0;
+
+        void add(long timestamp, long generation, long offset, int length) {
+            if (size == timestamps.length) {
+                int capacity = timestamps.length * 2;
+                timestamps = Arrays.copyOf(timestamps, capacity);
+                generations = Arrays.copyOf(generations, capacity);
+                offsets = Arrays.copyOf(offsets, capacity);
+                lengths = Arrays.copyOf(lengths, capacity);
+            }
+            timestamps[size] = timestamp;
+            generations[size] = generation;
+            offsets[size] = offset;
+            lengths[size] = length;
+            size++;
+        }
+
+        // Las entradas se agregan en orden de commit, por lo que las de
+        // segmentos eliminados siempre forman un prefijo
+        void purgeBefore(long generation) {
+            while (start < size && generations[start] < generation) {
+                start++;
+            }
+            if (start > 0 && start * 2 >= size) {
+                int remaining = size - start;
+                System.arraycopy(timestamps, start, timestamps, 0, remaining);
+                System.arraycopy(generations, start, generations, 0, remaining);
+                System.arraycopy(offsets, start, offsets, 0, remaining);
+                System.arraycopy(lengths, start, lengths, 0, remaining);
+                size = remaining;
+                start = 0;
+            }
+        }
+
+        int count() {
+            return size - start;
+        }
+    }
+
+    private final Map<String, GameEntries> games = new HashMap<>();
+    private long totalEntries = 0;
+
+    public synchronized void add(String gameId, long timestamp, long generation, long offset, int length) {
+        games.computeIfAbsent(gameId, id -> new GameEntries()).add(timestamp, generation, offset, length);
+        totalEntries++;
+    }
+
+    /**
+     * Ubicaciones de las entradas de un juego con timestamp en [fromTs, toTs]
+     * @param offset Cantidad de coincidencias a saltar (paginación)
+     * @param limit Máximo de resultados; 0 o negativo para no limitar
+     */
+    public synchronized List<Ref> find(String gameId, long fromTs, long toTs, int offset, int limit) {
+        List<Ref> refs = new ArrayList<>();
+        GameEntries entries = games.get(gameId);
+        if (entries == null) {
+            return refs;
+        }
+
+        int skipped = 0;
+        for (int i = entries.start; i < entries.size; i++) {
+            long timestamp = entries.timestamps[i];
+            if (timestamp < fromTs || timestamp > toTs) {
+                continue;
+            }
+            if (skipped < offset) {
+                skipped++;
+                continue;
+            }
+            refs.add(new Ref(entries.generations[i], entries.offsets[i], entries.lengths[i]));
+            if (limit > 0 && refs.size() >= limit) {
+                break;
+            }
+        }
+        return refs;
+    }
+
+    /**
+     * Descarta las entradas de segmentos anteriores a la generación indicada
+     */
+    public synchronized void purgeBefore(long generation) {
+        totalEntries = 0;
+        games.values().removeIf(entries -> {
+            entries.purgeBefore(generation);
+            totalEntries += entries.count();
+            return entries.count() == 0;
+        });
+    }
+
+    public synchronized void clear() {
+        games.clear();
+        totalEntries = 0;
+    }
+
+    public synchronized long size() {
+        return totalEntries;
+    }
+}
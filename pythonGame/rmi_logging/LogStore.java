@@ -0,0 +1,399 @@
+import java.io.BufferedOutputStream;
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.Closeable;
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.RandomAccessFile;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.locks.ReentrantReadWriteLock;
+
+/**
+ * Almacén de logs de solo escritura al final (append-only)
+ *
+ * Las entradas se acumulan en memoria y un hilo de commit las escribe en
+ * grupo al archivo (cada cierto tiempo o al llegar a un tamaño de lote), con
+ * una sola escritura y un solo flush por grupo. Mantiene en memoria solo una
+ * cola acotada con las entradas más recientes y rota el archivo al superar
+ * su tamaño máximo.
+ *
+ * Cada entrada confirmada se registra en un LogIndex por gameId con su
+ * ubicación en disco; las consultas por juego leen solo esas posiciones.
+ * Cada archivo es un segmento con número de generación: el activo es la
+ * generación actual y "archivo.N" es la generación actual - N.
+ */
+public class LogStore implements Closeable {
+
+    public static final int DEFAULT_TAIL_CAPACITY = 10000;
+    public static final int DEFAULT_COMMIT_BATCH = 1000;
+    public static final long DEFAULT_COMMIT_INTERVAL_MS = 50;
+    public static final long DEFAULT_MAX_FILE_BYTES = 10L * 1024 * 1024;
+    public static final int DEFAULT_MAX_BACKUPS = 5;
+
+    // Máximo de entradas pendientes antes de frenar a los productores
+    private static final int MAX_PENDING = 100000;
+
+    private final String fileName;
+    private final long maxFileBytes;
+    private final int maxBackups;
+    private final int tailCapacity;
+    private final int commitBatch;
+    private final long commitIntervalMs;
+    private final boolean echo;
+
+    private final Object lock = new Object();
+    private final ArrayDeque<String> tail;
+    private List<Pending> pending = new ArrayList<>();
+    private boolean running = true;
+
+    private final LogIndex index = new LogIndex();
+    // Las lecturas por posición no deben cruzarse con una rotación
+    private final ReentrantReadWriteLock rotationLock = new ReentrantReadWriteLock();
+    private volatile long generation = 0;
+
+    private OutputStream out;
+    private long fileBytes;
+    private final Thread committer;
+
+    private static class Pending {
+        final String line;
+        final String gameId;
+        final long timestamp;
+
+        Pending(String line, String gameId, long timestamp) {
+            this.line = line;
+            this.gameId = gameId;
+            this.timestamp = timestamp;
+        }
+    }
+
+    public LogStore(String fileName) throws IOException {
+        this(fileName, DEFAULT_TAIL_CAPACITY, DEFAULT_COMMIT_BATCH, DEFAULT_COMMIT_INTERVAL_MS,
+             DEFAULT_MAX_FILE_BYTES, DEFAULT_MAX_BACKUPS, true);
+    }
+
+    /**
+     * @param fileName Archivo de logs activo
+     * @param tailCapacity Entradas recientes que se conservan en memoria
+     * @param commitBatch Entradas pendientes que disparan un commit inmediato
+     * @param commitIntervalMs Intervalo máximo entre commits
+     * @param maxFileBytes Tamaño a partir del cual se rota el archivo
+     * @param maxBackups Cantidad de archivos rotados que se conservan
+     * @param echo Si se muestran las entradas en consola al confirmarlas
+     */
+    public LogStore(String fileName, int tailCapacity, int commitBatch, long commitIntervalMs,
+                    long maxFileBytes, int maxBackups, boolean echo) throws IOException {
+        this.fileName = fileName;
+        this.tailCapacity = tailCapacity;
+        this.commitBatch = commitBatch;
+        this.commitIntervalMs = commitIntervalMs;
+        this.maxFileBytes = maxFileBytes;
+        this.maxBackups = maxBackups;
+        this.echo = echo;
+        this.tail = new ArrayDeque<>(Math.min(tailCapacity, 1024));
+
+        rebuildIndex();
+        openFile();
+
+        this.committer = new Thread(this::commitLoop, "log-store-commit");
+        this.committer.setDaemon(true);
+        this.committer.start();
+    }
+
+    /**
+     * Agrega una entrada al archivo, al índice del juego y a la cola de
+     * entradas recientes
+     */
+    public void append(String entry, String gameId, long timestamp) {
+        append(new Pending(entry, gameId, timestamp), true);
+    }
+
+    /**
+     * Agrega una línea solo al archivo (marcas de inicio, limpieza, etc.)
+     */
+    public void appendMarker(String marker) {
+        append(new Pending(marker, null, 0), false);
+    }
+
+    private void append(Pending entry, boolean keepInTail) {
+        synchronized (lock) {
+            // Contrapresión: si el disco no da abasto, el productor espera
+            while (running && pending.size() >= MAX_PENDING) {
+                lock.notifyAll();
+                try {
+                    lock.wait(commitIntervalMs);
+                } catch (InterruptedException e) {
+                    Thread.currentThread().interrupt();
+                    break;
+                }
+            }
+
+            pending.add(entry);
+            if (keepInTail) {
+                if (tail.size() >= tailCapacity) {
+                    tail.pollFirst();
+                }
+                tail.addLast(entry.line);
+            }
+            if (pending.size() >= commitBatch) {
+                lock.notifyAll();
+            }
+        }
+    }
+
+    /**
+     * Copia de las entradas más recientes, de la más antigua a la más nueva
+     */
+    public List<String> tail() {
+        synchronized (lock) {
+            return new ArrayList<>(tail);
+        }
+    }
+
+    /**
+     * Olvida las entradas en memoria y el índice; los archivos se conservan
+     */
+    public void clear() {
+        synchronized (lock) {
+            tail.clear();
+            index.clear();
+        }
+    }
+
+    /**
+     * Entradas confirmadas de un juego con timestamp en [fromTs, toTs]
+     * @param offset Coincidencias a saltar (paginación)
+     * @param limit Máximo de resultados; 0 o negativo para no limitar
+     */
+    public List<String> find(String gameId, long fromTs, long toTs, int offset, int limit) throws IOException {
+        List<String> result = new ArrayList<>();
+        Map<Long, RandomAccessFile> files = new HashMap<>();
+        rotationLock.readLock().lock();
+        try {
+            for (LogIndex.Ref ref : index.find(gameId, fromTs, toTs, offset, limit)) {
+                RandomAccessFile file = files.get(ref.generation);
+                if (file == null) {
+                    String path = segmentPath(ref.generation);
+                    if (path == null || !new File(path).exists()) {
+                        continue;
+                    }
+                    file = new RandomAccessFile(path, "r");
+                    files.put(ref.generation, file);
+                }
+                byte[] bytes = new byte[ref.length];
+                file.seek(ref.offset);
+                file.readFully(bytes);
+                result.add(new String(bytes, StandardCharsets.UTF_8));
+            }
+        } finally {
+            rotationLock.readLock().unlock();
+            for (RandomAccessFile file : files.values()) {
+                file.close();
+            }
+        }
+        return result;
+    }
+
+    /**
+     * Confirma las entradas pendientes y cierra el archivo
+     */
+    @Override
+    public void close() {
+        synchronized (lock) {
+            running = false;
+            lock.notifyAll();
+        }
+        try {
+            committer.join();
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        }
+        try {
+            out.close();
+        } catch (IOException e) {
+            System.err.println("Error cerrando el archivo de log: " + e.getMessage());
+        }
+    }
+
+    private void commitLoop() {
+        while (true) {
+            List<Pending> batch;
+            synchronized (lock) {
+                if (pending.isEmpty() && running) {
+                    try {
+                        lock.wait(commitIntervalMs);
+                    } catch (InterruptedException e) {
+                        Thread.currentThread().interrupt();
+                        running = false;
+                    }
+                }
+                if (pending.isEmpty()) {
+                    if (!running) {
+                        return;
+                    }
+                    continue;
+                }
+                batch = pending;
+                pending = new ArrayList<>(Math.min(batch.size(), commitBatch));
+                lock.notifyAll();
+            }
+            writeBatch(batch);
+        }
+    }
+
+    private void writeBatch(List<Pending> batch) {
+        byte[][] lines = new byte[batch.size()][];
+        int total = 0;
+        for (int i = 0; i < lines.length; i++) {
+            lines[i] = (batch.get(i).line + "\n").getBytes(StandardCharsets.UTF_8);
+            total += lines[i].length;
+        }
+
+        try {
+            if (fileBytes > 0 && fileBytes + total > maxFileBytes) {
+                rotate();
+            }
+
+            ByteArrayOutputStream bytes = new ByteArrayOutputStream(total);
+            long[] offsets = new long[lines.length];
+            for (int i = 0; i < lines.length; i++) {
+                offsets[i] = fileBytes + bytes.size();
+                bytes.write(lines[i]);
+            }
+            bytes.writeTo(out);
+            out.flush();
+            fileBytes += total;
+
+            // Solo se indexa lo que ya está en disco
+            long currentGeneration = generation;
+            for (int i = 0; i < lines.length; i++) {
+                Pending entry = batch.get(i);
+                if (entry.gameId != null) {
+                    index.add(entry.gameId, entry.timestamp, currentGeneration, offsets[i], lines[i].length - 1);
+                }
+            }
+        } catch (IOException e) {
+            System.err.println("Error escribiendo al archivo de log: " + e.getMessage());
+        }
+
+        if (echo) {
+            StringBuilder console = new StringBuilder(total + batch.size() * 5);
+            for (Pending entry : batch) {
+                console.append("LOG: ").append(entry.line).append('\n');
+            }
+            System.out.print(console);
+        }
+    }
+
+    private void rotate() throws IOException {
+        rotationLock.writeLock().lock();
+        try {
+            rotateFiles();
+            generation++;
+        } finally {
+            rotationLock.writeLock().unlock();
+        }
+        index.purgeBefore(generation - maxBackups);
+    }
+
+    private void rotateFiles() throws IOException {
+        out.close();
+        for (int i = maxBackups - 1; i >= 1; i--) {
+            Path source = Paths.get(fileName + "." + i);
+            if (Files.exists(source)) {
+                Files.move(source, Paths.get(fileName + "." + (i + 1)), StandardCopyOption.REPLACE_EXISTING);
+            }
+        }
+        if (maxBackups > 0) {
+            Files.move(Paths.get(fileName), Paths.get(fileName + ".1"), StandardCopyOption.REPLACE_EXISTING);
+        } else {
+            Files.delete(Paths.get(fileName));
+        }
+        openFile();
+    }
+
+    private String segmentPath(long segmentGeneration) {
+        long age = generation - segmentGeneration;
+        if (age == 0) {
+            return fileName;
+        }
+        if (age < 0 || age > maxBackups) {
+            return null;
+        }
+        return fileName + "." + age;
+    }
+
+    /**
+     * Reconstruye el índice a partir de los segmentos existentes, del más
+     * antiguo al activo
+     */
+    private void rebuildIndex() {
+        for (int age = maxBackups; age >= 0; age--) {
+            String path = age == 0 ? fileName : fileName + "." + age;
+            File file = new File(path);
+            if (!file.exists()) {
+                continue;
+            }
+            long segmentGeneration = generation - age;
+            try (BufferedReader reader = new BufferedReader(
+                    new InputStreamReader(new FileInputStream(file), StandardCharsets.UTF_8))) {
+                long offset = 0;
+                String line;
+                while ((line = reader.readLine()) != null) {
+                    int length = line.getBytes(StandardCharsets.UTF_8).length;
+                    indexExistingLine(line, segmentGeneration, offset, length);
+                    offset += length + 1;
+                }
+            } catch (IOException e) {
+                System.err.println("Error reconstruyendo el índice de " + path + ": " + e.getMessage());
+            }
+        }
+        System.out.println("Índice de logs reconstruido: " + index.size() + " entradas");
+    }
+
+    // Formato: [fecha] timestamp(N), tipo, gameId, operación[, detalles...]
+    private void indexExistingLine(String line, long segmentGeneration, long offset, int length) {
+        int start = line.indexOf("] timestamp(");
+        if (start < 0) {
+            return;
+        }
+        int tsStart = start + "] timestamp(".length();
+        int tsEnd = line.indexOf("), ", tsStart);
+        if (tsEnd < 0) {
+            return;
+        }
+        int typeEnd = line.indexOf(", ", tsEnd + 3);
+        if (typeEnd < 0) {
+            return;
+        }
+        int gameEnd = line.indexOf(", ", typeEnd + 2);
+        if (gameEnd < 0) {
+            return;
+        }
+        try {
+            long timestamp = Long.parseLong(line.substring(tsStart, tsEnd));
+            index.add(line.substring(typeEnd + 2, gameEnd), timestamp, segmentGeneration, offset, length);
+        } catch (NumberFormatException e) {
+            // Línea con formato desconocido: no se indexa
+        }
+    }
+
+    private void openFile() throws IOException {
+        File file = new File(fileName);
+        fileBytes = file.exists() ? file.length() : 0;
+        out = new BufferedOutputStream(new FileOutputStream(file, true), 64 * 1024);
+    }
+}
@@ -12,6 +12,9 @@ public class LoggingServer {
             // Crear y registrar el servicio de logging
             LoggingServiceImpl loggingService = new LoggingServiceImpl();
             
+            // Confirmar los logs pendientes al detener el servidor
+            Runtime.getRuntime().addShutdownHook(new Thread(loggingService::close));
+            
             // Iniciar el registro RMI en el puerto 1099
             try {
                 Registry registry = LocateRegistry.createRegistry(1099);
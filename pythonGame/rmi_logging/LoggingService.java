@@ -27,6 +27,14 @@ public interface LoggingService extends Remote {
      */
     void logEnd(long timestamp, String gameId, String operation, String... details) throws RemoteException;
     
+    /**
+     * Registra un lote de operaciones de inicio y fin en una sola llamada remota
+     * @param entries Entradas del lote, en orden
+     * @return Cantidad de entradas registradas
+     * @throws RemoteException Error de comunicación RMI
+     */
+    int logBatch(List<LogEntry> entries) throws RemoteException;
+    
     /**
      * Obtiene todos los logs registrados
      * @return Lista de todas las entradas de log
@@ -42,6 +50,29 @@ public interface LoggingService extends Remote {
      */
     List<String> getGameLogs(String gameId) throws RemoteException;
     
+    /**
+     * Obtiene los logs de un juego dentro de un rango de tiempo
+     * @param gameId Identificador exacto del juego
+     * @param fromTs Timestamp mínimo (inclusive)
+     * @param toTs Timestamp máximo (inclusive)
+     * @param limit Máximo de entradas a devolver; 0 o negativo para no limitar
+     * @return Lista de logs del juego en orden de registro
+     * @throws RemoteException Error de comunicación RMI
+     */
+    List<String> getGameLogs(String gameId, long fromTs, long toTs, int limit) throws RemoteException;
+    
+    /**
+     * Obtiene una página de los logs de un juego dentro de un rango de tiempo
+     * @param gameId Identificador exacto del juego
+     * @param fromTs Timestamp mínimo (inclusive)
+     * @param toTs Timestamp máximo (inclusive)
+     * @param offset Cantidad de entradas a saltar
+     * @param limit Máximo de entradas a devolver; 0 o negativo para no limitar
+     * @return Lista de logs del juego en orden de registro
+     * @throws RemoteException Error de comunicación RMI
+     */
+    List<String> getGameLogs(String gameId, long fromTs, long toTs, int offset, int limit) throws RemoteException;
+    
     /**
      * Limpia todos los logs
      * @throws RemoteException Error de comunicación RMI
@@ -1,27 +1,28 @@
 import java.rmi.RemoteException;
 import java.rmi.server.UnicastRemoteObject;
-import java.util.ArrayList;
 import java.util.List;
-import java.util.concurrent.CopyOnWriteArrayList;
-import java.io.FileWriter;
 import java.io.IOException;
-import java.text.SimpleDateFormat;
-import java.util.Date;
+import java.time.LocalDateTime;
+import java.time.format.DateTimeFormatter;
 
 /**
  * Implementación del servicio de logging centralizado
  */
 public class LoggingServiceImpl extends UnicastRemoteObject implements LoggingService {
     
-    private final List<String> logs;
+    private final LogStore store;
     private final String logFileName;
-    private final SimpleDateFormat dateFormat;
+    private final DateTimeFormatter dateFormat;
     
     public LoggingServiceImpl() throws RemoteException {
         super();
-        this.logs = new CopyOnWriteArrayList<>();
         this.logFileName = "game_logs.txt";
-        this.dateFormat = new SimpleDateFormat("yyyy-MM-dd HH:mm:ss.SSS");
+        this.dateFormat = DateTimeFormatter.ofPattern("yyyy-MM-dd HH:mm:ss.SSS");
+        try {
+            this.store = new LogStore(logFileName);
+        } catch (IOException e) {
+            throw new RemoteException("No se pudo abrir el archivo de log " + logFileName, e);
+        }
         
         // Log de inicio del servidor
         logToFile("=== SERVIDOR DE LOGS INICIADO ===");
@@ -31,34 +32,52 @@ public class LoggingServiceImpl extends UnicastRemoteObject implements LoggingSe
     @Override
     public void logStart(long timestamp, String gameId, String operation, String... details) throws RemoteException {
         String logEntry = formatLogEntry(timestamp, "ini", gameId, operation, details);
-        addLog(logEntry);
+        addLog(logEntry, gameId, timestamp);
     }
     
     @Override
     public void logEnd(long timestamp, String gameId, String operation, String... details) throws RemoteException {
         String logEntry = formatLogEntry(timestamp, "fin", gameId, operation, details);
-        addLog(logEntry);
+        addLog(logEntry, gameId, timestamp);
+    }
+    
+    @Override
+    public int logBatch(List<LogEntry> entries) throws RemoteException {
+        for (LogEntry entry : entries) {
+            String logEntry = formatLogEntry(entry.getTimestamp(), entry.getType(), entry.getGameId(),
+                                             entry.getOperation(), entry.getDetails());
+            addLog(logEntry, entry.getGameId(), entry.getTimestamp());
+        }
+        return entries.size();
     }
     
     @Override
     public List<String> getAllLogs() throws RemoteException {
-        return new ArrayList<>(logs);
+        return store.tail();
     }
     
     @Override
     public List<String> getGameLogs(String gameId) throws RemoteException {
-        List<String> gameLogs = new ArrayList<>();
-        for (String log : logs) {
-            if (log.contains(gameId)) {
-                gameLogs.add(log);
-            }
+        return getGameLogs(gameId, Long.MIN_VALUE, Long.MAX_VALUE, 0, 0);
+    }
+    
+    @Override
+    public List<String> getGameLogs(String gameId, long fromTs, long toTs, int limit) throws RemoteException {
+        return getGameLogs(gameId, fromTs, toTs, 0, limit);
+    }
+    
+    @Override
+    public List<String> getGameLogs(String gameId, long fromTs, long toTs, int offset, int limit) throws RemoteException {
+        try {
+            return store.find(gameId, fromTs, toTs, Math.max(offset, 0), limit);
+        } catch (IOException e) {
+            throw new RemoteException("Error leyendo los logs del juego " + gameId, e);
         }
-        return gameLogs;
     }
     
     @Override
     public void clearLogs() throws RemoteException {
-        logs.clear();
+        store.clear();
         logToFile("=== LOGS LIMPIADOS ===");
         System.out.println("Logs limpiados");
     }
@@ -79,22 +98,21 @@ public class LoggingServiceImpl extends UnicastRemoteObject implements LoggingSe
         return sb.toString();
     }
     
-    private void addLog(String logEntry) {
-        // Agregar timestamp legible al log
-        String timestampedEntry = "[" + dateFormat.format(new Date()) + "] " + logEntry;
-        
-        logs.add(timestampedEntry);
-        logToFile(timestampedEntry);
-        
-        System.out.println("LOG: " + timestampedEntry);
+    /**
+     * Confirma los logs pendientes y cierra el archivo
+     */
+    public void close() {
+        logToFile("=== SERVIDOR DE LOGS DETENIDO ===");
+        store.close();
+    }
+    
+    private void addLog(String logEntry, String gameId, long timestamp) {
+        // Agregar timestamp legible al log; el almacén lo escribe en grupo, lo indexa por juego y lo muestra en consola
+        String timestampedEntry = "[" + dateFormat.format(LocalDateTime.now()) + "] " + logEntry;
+        store.append(timestampedEntry, gameId, timestamp);
     }
     
     private void logToFile(String logEntry) {
-        try (FileWriter writer = new FileWriter(logFileName, true)) {
-            writer.write(logEntry + "\n");
-            writer.flush();
-        } catch (IOException e) {
-            System.err.println("Error escribiendo al archivo de log: " + e.getMessage());
-        }
+        store.appendMarker(logEntry);
     }
 }
@@ -1,11 +1,14 @@
 import java.io.*;
 import java.net.*;
 import java.rmi.Naming;
+import java.util.ArrayList;
+import java.util.List;
 import java.util.concurrent.ExecutorService;
 import java.util.concurrent.Executors;
 import com.google.gson.Gson;
 import com.google.gson.JsonObject;
 import com.google.gson.JsonArray;
+import com.google.gson.JsonElement;
 
 /**
  * Proxy que convierte conexiones TCP en llamadas RMI
@@ -119,6 +122,30 @@ public class RMIProxy {
                 JsonObject request = gson.fromJson(jsonRequest, JsonObject.class);
                 
                 String method = request.get("method").getAsString();
+                
+                // Lote de registros: una sola llamada RMI y un solo acuse "OK n".
+                // n cuenta solo los registros guardados: el emisor da el lote por
+                // entregado y no reintenta los inválidos que se descartan aquí
+                if ("logBatch".equals(method)) {
+                    JsonArray records = request.getAsJsonArray("records");
+                    List<LogEntry> entries = new ArrayList<>(records.size());
+                    for (int i = 0; i < records.size(); i++) {
+                        // Un registro inválido se descarta sin perder el resto del lote
+                        LogEntry entry = parseEntry(records.get(i));
+                        if (entry == null) {
+                            System.out.println("⚠️  Registro inválido descartado del lote: " + records.get(i));
+                            continue;
+                        }
+                        entries.add(entry);
+                    }
+                    
+                    int logged = entries.isEmpty() ? 0 : loggingService.logBatch(entries);
+                    writer.println("OK " + logged);
+                    writer.flush();
+                    System.out.println("✅ Lote de " + logged + " logs enviado correctamente");
+                    return;
+                }
+                
                 long timestamp = request.get("timestamp").getAsLong();
                 String gameId = request.get("gameId").getAsString();
                 String operation = request.get("operation").getAsString();
@@ -126,14 +153,7 @@ public class RMIProxy {
                 // Convertir detalles a array de strings
                 System.out.println("🔍 Método: " + method + ", GameId: " + gameId + ", Operation: " + operation);
 
-                String[] details = new String[0];
-                if (request.has("details") && !request.get("details").isJsonNull()) {
-                    JsonArray detailsArray = request.getAsJsonArray("details");
-                    details = new String[detailsArray.size()];
-                    for (int i = 0; i < detailsArray.size(); i++) {
-                        details[i] = detailsArray.get(i).getAsString();
-                    }
-                }
+                String[] details = parseDetails(request);
                 
                 // Llamar al método RMI correspondiente
                 if ("logStart".equals(method)) {
@@ -161,6 +181,61 @@ public class RMIProxy {
                 writer.flush();
             }
         }
+        
+        /** Registro de un lote; null si no es un objeto o su método no es logStart/logEnd */
+        private LogEntry parseEntry(JsonElement element) {
+            if (element == null || !element.isJsonObject()) {
+                return null;
+            }
+            JsonObject record = element.getAsJsonObject();
+            String method = stringField(record, "method", null);
+            String type;
+            if ("logStart".equals(method)) {
+                type = "ini";
+            } else if ("logEnd".equals(method)) {
+                type = "fin";
+            } else {
+                return null;
+            }
+            
+            // Campos nulos o ausentes (p. ej. una partida sin nombre) toman un valor por defecto
+            long timestamp;
+            try {
+                JsonElement value = record.get("timestamp");
+                timestamp = value == null || value.isJsonNull() ? System.currentTimeMillis() : value.getAsLong();
+            } catch (RuntimeException e) {
+                timestamp = System.currentTimeMillis();
+            }
+            try {
+                return new LogEntry(type, timestamp,
+                                    stringField(record, "gameId", ""),
+                                    stringField(record, "operation", ""),
+                                    parseDetails(record));
+            } catch (RuntimeException e) {
+                return null;
+            }
+        }
+        
+        private String stringField(JsonObject record, String name, String defaultValue) {
+            JsonElement value = record.get(name);
+            if (value == null || value.isJsonNull() || !value.isJsonPrimitive()) {
+                return defaultValue;
+            }
+            return value.getAsString();
+        }
+        
+        private String[] parseDetails(JsonObject request) {
+            String[] details = new String[0];
+            if (request.has("details") && request.get("details").isJsonArray()) {
+                JsonArray detailsArray = request.getAsJsonArray("details");
+                details = new String[detailsArray.size()];
+                for (int i = 0; i < detailsArray.size(); i++) {
+                    JsonElement detail = detailsArray.get(i);
+                    details[i] = detail.isJsonNull() ? "" : detail.isJsonPrimitive() ? detail.getAsString() : detail.toString();
+                }
+            }
+            return details;
+        }
     }
     
     public static void main(String[] args) {
@@ -0,0 +1,212 @@
+"""
+Modo clúster del servidor del juego
+Varios GameServer comparten un directorio de partidas (game_directory.py) que
+indica qué nodo es dueño de cada una. Un jugador puede conectarse a cualquier
+nodo: si entra a una partida de otro nodo, sus solicitudes se reenvían al
+dueño como 'relay' por un pool de conexiones internas persistentes, y las
+notificaciones vuelven por el mismo camino.
+"""
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import wait as wait_futures
+from typing import Callable, Dict, List, Optional
+
+from game_client import GameClient
+from protocol import JSON_CODEC
+from console_log import get_logger
+
+log = get_logger("cluster")
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_CLUSTER_TIMEOUT = 5.0
+# Reintentos al registrarse en el directorio durante el arranque
+DIRECTORY_CONNECT_ATTEMPTS = 20
+
+def parse_address(address: str, default_port: int = None):
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, default_port
+    return host, int(port)
+
+class InternalLink(GameClient):
+    """Conexión interna persistente; reutiliza el despachador de respuestas de GameClient"""
+
+    def __init__(self, host, port, on_notification: Optional[Callable[[dict], None]] = None):
+        super().__init__(host, port)
+        self.on_notification = on_notification
+
+    def handle_notification(self, data):
+        if self.on_notification is not None:
+            self.on_notification(data)
+
+class RelayConnection:
+    """Conexión de un jugador remoto: sus notificaciones viajan por la conexión del nodo de origen
+
+    Se registra en client_sockets en lugar del socket del jugador. Cada trama
+    se envuelve en una notificación 'relay' con el nombre del destinatario.
+    """
+
+    def __init__(self, peer_connection, player_name: str):
+        self.peer = peer_connection
+        self.player_name = player_name
+        self.codec = JSON_CODEC
+        self.prefix = (b'{"type": "notification", "data": {"type": "relay", "player": '
+                       + json.dumps(player_name).encode('utf-8') + b', "frame": ')
+
+    def send(self, data: bytes, key=None, droppable: bool = True) -> int:
+        # Misma política que una conexión local; la clave se separa por jugador
+        # porque la conexión del nodo de origen la comparten muchos
+        if key is not None:
+            key = (self.player_name, key)
+        return self.peer.send(self.prefix + data.rstrip(b'\n') + b'}}\n', key, droppable)
+
+    def close(self):
+        pass
+
+class ClusterNode:
+    """Pertenencia de un GameServer al clúster: directorio y pool hacia los demás nodos"""
+
+    def __init__(self, node_name: str, address: str, directory: str,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_CLUSTER_TIMEOUT,
+                 on_relay: Optional[Callable[[str, dict], None]] = None):
+        self.node_name = node_name
+        self.address = address
+        self.directory_address = parse_address(directory)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.on_relay = on_relay
+        self.lock = threading.Lock()
+        self.directory: Optional[InternalLink] = None
+        self.nodes: Dict[str, str] = {}
+        self.pools: Dict[str, List[InternalLink]] = {}
+        self.rotation = itertools.count()
+
+    def start(self):
+        for attempt in range(DIRECTORY_CONNECT_ATTEMPTS):
+            response = self.directory_request({
+                "command": "register_node", "node": self.node_name, "address": self.address
+            })
+            if response is not None and response.get('status') == 'ok':
+                self.nodes = response.get('nodes', {})
+                log.info("🖥️  Nodo %s registrado en el directorio %s:%s",
+                         self.node_name, *self.directory_address)
+                return True
+            time.sleep(0.25)
+        log.error("❌ No se pudo registrar el nodo %s en el directorio", self.node_name)
+        return False
+
+    def stop(self):
+        with self.lock:
+            links = [link for pool in self.pools.values() for link in pool]
+            if self.directory is not None:
+                links.append(self.directory)
+            self.pools.clear()
+            self.directory = None
+        for link in links:
+            link.disconnect()
+
+    # -- Directorio -------------------------------------------------------
+
+    def directory_request(self, request: dict) -> Optional[dict]:
+        with self.lock:
+            link = self.directory
+            if link is None or not link.running:
+                link = InternalLink(*self.directory_address)
+                if not link.connect():
+                    return None
+                self.directory = link
+        return link.send_request(request, self.timeout)
+
+    def claim(self, game_name: str) -> Optional[bool]:
+        """Reclama el nombre de una partida; None si el directorio no responde"""
+        response = self.directory_request({"command": "claim", "game": game_name, "node": self.node_name})
+        if response is None:
+            return None
+        return response.get('status') == 'ok'
+
+    def release(self, game_name: str):
+        """Libera el nombre sin esperar respuesta (se llama con el lock de la partida tomado)"""
+        with self.lock:
+            link = self.directory
+        if link is not None and link.running:
+            link.send_request_async({"command": "release", "game": game_name, "node": self.node_name})
+
+    def owner(self, game_name: str) -> Optional[str]:
+        response = self.directory_request({"command": "lookup", "game": game_name})
+        if response is None or response.get('status') != 'ok' or not response.get('owner'):
+            return None
+        if response.get('address'):
+            self.nodes[response['owner']] = response['address']
+        return response['owner']
+
+    # -- Pool de conexiones entre nodos -----------------------------------
+
+    def link(self, node: str) -> Optional[InternalLink]:
+        """Una conexión del pool hacia el nodo, en ronda; reabre las que se cayeron"""
+        address = self.nodes.get(node)
+        if address is None:
+            return None
+        with self.lock:
+            pool = self.pools.setdefault(node, [])
+            index = next(self.rotation) % self.pool_size
+            if index < len(pool) and pool[index].running:
+                return pool[index]
+        link = InternalLink(*parse_address(address), on_notification=self._on_peer_notification)
+        if not link.connect():
+            return None
+        with self.lock:
+            pool = self.pools.setdefault(node, [])
+            if index < len(pool):
+                pool[index].disconnect()
+                pool[index] = link
+            else:
+                pool.append(link)
+        return link
+
+    def request(self, node: str, request: dict) -> Optional[dict]:
+        link = self.link(node)
+        if link is None:
+            return None
+        return link.send_request(request, self.timeout)
+
+    def relay(self, node: str, player_name: str, request: dict, current_game) -> Optional[dict]:
+        """Ejecuta la solicitud de un jugador local en el nodo dueño de su partida"""
+        return self.request(node, {
+            "command": "relay",
+            "player": player_name,
+            "current_game": current_game,
+            "request": {key: value for key, value in request.items() if key != 'id'}
+        })
+
+    def relay_close(self, node: str, player_name: str):
+        """Avisa al nodo dueño que el jugador se desconectó, sin esperar respuesta"""
+        link = self.link(node)
+        if link is not None:
+            link.send_request_async({"command": "relay_close", "player": player_name})
+
+    def list_remote_games(self) -> list:
+        """Partidas de los demás nodos, consultadas en paralelo"""
+        response = self.directory_request({"command": "nodes"})
+        if response is not None and response.get('status') == 'ok':
+            self.nodes = response.get('nodes', {})
+        futures = []
+        for node in self.nodes:
+            if node == self.node_name:
+                continue
+            link = self.link(node)
+            if link is not None:
+                futures.append(link.send_request_async({"command": "list_games", "scope": "node"}))
+        wait_futures(futures, timeout=self.timeout)
+        games = []
+        for future in futures:
+            if future.done() and future.exception() is None:
+                response = future.result()
+                if response.get('status') == 'ok':
+                    games.extend(response.get('games', []))
+        return games
+
+    def _on_peer_notification(self, data: dict):
+        if data.get('type') == 'relay' and self.on_relay is not None:
+            self.on_relay(data.get('player'), data.get('frame') or {})
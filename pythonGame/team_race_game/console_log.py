@@ -0,0 +1,48 @@
+"""
+Registro por niveles de la consola, asíncrono
+Los módulos escriben con logging estándar; un QueueHandler solo encola el
+registro y un QueueListener en su propio hilo lo formatea y lo escribe. Así
+ningún hilo del servidor queda bloqueado por stdout bajo carga. El detalle
+de cada solicitud va en DEBUG y está apagado por defecto.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional
+
+ROOT_LOGGER = "team_race"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+DEFAULT_LOG_LEVEL = 'INFO'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def setup_logging(level=DEFAULT_LOG_LEVEL, stream=None, fmt: str = LOG_FORMAT):
+    """Configura el registro asíncrono (una sola vez por proceso) y fija el nivel"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(fmt, datefmt="%H:%M:%S"))
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    # Vacía la cola al salir para no perder los últimos mensajes
+    atexit.register(stop_logging)
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logging.getLogger(ROOT_LOGGER).handlers.clear()
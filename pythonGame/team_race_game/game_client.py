@@ -3,174 +3,423 @@ Cliente del juego de carreras por equipos
 Interfaz de consola para interactuar con el servidor
 """
 import socket
-import json
+import selectors
 import threading
-import time
 import sys
+import argparse
+import itertools
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+from console_log import get_logger, setup_logging, LOG_LEVELS
+from protocol import (
+    CODECS, JSON_CODEC, PROTOCOL_JSON, PROTOCOL_BINARY, PROTOCOL_VERSION,
+    FEATURE_BINARY, FEATURE_DELTAS, FEATURE_REQUEST_IDS, FrameTooLarge
+)
+
+log = get_logger("client")
+
+# Tope de las tramas que llegan del servidor: list_games o la foto de una
+# partida grande superan el tope de 64 KB que el servidor aplica a las solicitudes
+MAX_RESPONSE_SIZE = 16 * 1024 * 1024
+
+class GameStateMirror:
+    """Copia local del estado de la partida, mantenida con los deltas del servidor"""
+    
+    def __init__(self, snapshot, version):
+        self.version = version
+        self.players = snapshot['players']
+        self.votes = snapshot['votes']
+        self.started = snapshot['started']
+        self.finished = snapshot['finished']
+        self.winner = snapshot['winner']
+        self.board_length = snapshot['board_length']
+        self.current_turn = snapshot['current_turn']
+        self.closed = False
+        # Un delta no encajó con la copia local: hace falta una foto completa
+        self.needs_snapshot = False
+        self.teams = {
+            team['name']: {"position": team['position'], "players": list(team['players'])}
+            for team in snapshot['teams']
+        }
+    
+    def apply(self, changes) -> bool:
+        """Aplica deltas en orden; devuelve False si falta alguno y hay que resincronizar"""
+        for change in changes:
+            version = change['v']
+            if version <= self.version:
+                continue
+            if version != self.version + 1:
+                return False
+            try:
+                self._apply_change(change)
+            except KeyError as e:
+                # Equipo o jugador que la copia no conoce: se perdió un cambio anterior
+                log.debug("🔄 Delta %s sin base local (%s), se pide la foto completa", version, e)
+                self.needs_snapshot = True
+                return False
+            self.version = version
+        return True
+    
+    def _apply_change(self, change):
+        op = change['op']
+        if op == 'moved':
+            self.teams[change['team']]['position'] = change['position']
+            self.current_turn = change['next_turn']
+        elif op == 'player_joined':
+            self.players += 1
+        elif op == 'player_left':
+            self.players -= 1
+        elif op == 'team_created':
+            self.teams[change['team']] = {"position": 0, "players": list(change['players'])}
+        elif op == 'team_removed':
+            self.teams.pop(change['team'], None)
+            self.current_turn = change['current_turn']
+        elif op == 'member_added':
+            self.teams[change['team']]['players'].append(change['player'])
+        elif op == 'member_removed':
+            players = self.teams[change['team']]['players']
+            if change['player'] in players:
+                players.remove(change['player'])
+            self.votes = change['votes']
+        elif op == 'votes':
+            self.votes = change['votes']
+        elif op == 'started':
+            self.started = True
+            self.current_turn = change['current_turn']
+        elif op == 'finished':
+            self.teams[change['team']]['position'] = change['position']
+            self.finished = True
+            self.winner = change['winner']
+        elif op == 'closed':
+            self.closed = True
+    
+    def to_status(self) -> dict:
+        """Misma forma que la respuesta de game_status, sin consultar al servidor"""
+        if not self.started:
+            in_teams = sum(len(team['players']) for team in self.teams.values())
+            return {
+                "status": "ok",
+                "game_status": "waiting",
+                "message": "Esperando inicio de partida",
+                "votes_to_start": f"{self.votes}/{self.players}",
+                "can_start": bool(self.teams) and in_teams >= self.players and self.votes >= self.players
+            }
+        return {
+            "status": "ok",
+            "game_status": "playing" if not self.finished else "finished",
+            "positions": [
+                {"team": name, "position": team['position'], "players": list(team['players'])}
+                for name, team in self.teams.items()
+            ],
+            "current_turn": self.current_turn,
+            "board_length": self.board_length,
+            "winner": self.winner
+        }
 
 class GameClient:
-    def __init__(self, host='localhost', port=12345):
+    def __init__(self, host='localhost', port=12345, protocol=PROTOCOL_JSON):
         self.host = host
         self.port = port
+        self.protocol = protocol
+        # Resultado del 'hello': versión y funcionalidades aceptadas por el servidor
+        self.server_version = 0
+        self.features = frozenset()
+        # Estado de la partida recibido por suscripción (funcionalidad 'deltas')
+        self.game_state = None
+        self.game_state_stale = False
+        # Formato de tramas vigente; siempre se empieza en JSON y se negocia al conectar
+        self.codec = JSON_CODEC
+        self.framer = JSON_CODEC.new_framer(MAX_RESPONSE_SIZE)
+        # Mientras se espera la respuesta al 'hello' el lector toma de a una trama
+        self.hello_pending = False
+        # Solicitudes en vuelo: id -> Future, en orden de envío
+        self.request_ids = itertools.count(1)
+        self.pending: Dict[int, Future] = {}
+        self.pending_lock = threading.Lock()
+        self.send_lock = threading.Lock()
         self.socket = None
         self.player_name = None
         self.current_game = None
         self.current_team = None
         self.running = False
-        self.last_prompt_time = time.time()
-        self.needs_reprompt = False
+        # Prompt que se está leyendo; se repite cuando llega una notificación
+        self.prompt = None
+        self.wakeup_prompt = threading.Event()
+        self.reprompt_thread = None
+        self.reader_thread = None
+        self.wakeup_reader = None
+        self.wakeup_writer = None
         
     def connect(self):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((self.host, self.port))
             self.running = True
-
-
             
-            # Iniciar hilo para recibir notificaciones
-            notification_thread = threading.Thread(target=self.receive_notifications)
-            notification_thread.daemon = True
-            notification_thread.start()
+            # Hilo lector: único consumidor del socket, reparte respuestas y notificaciones
+            self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+            self.reader_thread = threading.Thread(target=self.receive_messages, daemon=True)
+            self.reader_thread.start()
+            
+            self.hello()
             
             return True
         except Exception as e:
             print(f"Error conectando al servidor: {e}")
             return False
     
+    def hello(self):
+        """Negocia versión y funcionalidades con el servidor
+        
+        Un servidor anterior al 'hello' responde con error y la conexión
+        sigue con el protocolo original en JSON.
+        """
+        requested = [FEATURE_DELTAS, FEATURE_REQUEST_IDS]
+        if self.protocol == PROTOCOL_BINARY:
+            requested.append(FEATURE_BINARY)
+        self.hello_pending = True
+        try:
+            response = self.send_request({
+                "command": "hello",
+                "version": PROTOCOL_VERSION,
+                "features": requested
+            })
+        finally:
+            self.hello_pending = False
+        if not response or response.get('status') != 'ok':
+            if self.protocol != PROTOCOL_JSON:
+                log.warning("⚠️  El servidor no aceptó el protocolo '%s', se usará JSON", self.protocol)
+            return False
+        
+        # El formato ya lo cambió el hilo lector al recibir esta respuesta
+        self.server_version = response.get('version', 0)
+        self.features = frozenset(response.get('features', []))
+        return True
+    
+    def switch_protocol(self, protocol: str):
+        """Cambia el formato de las tramas en ambos sentidos (desde el hilo lector)
+        
+        El servidor responde al 'hello' en el formato anterior y pasa al nuevo
+        enseguida: todo lo que llegue después de esa respuesta, notificaciones
+        incluidas, ya viene en el formato nuevo.
+        """
+        codec = CODECS[protocol]
+        with self.send_lock:
+            leftover = self.framer.buffer
+            self.codec = codec
+            self.framer = codec.new_framer(MAX_RESPONSE_SIZE)
+            self.framer.buffer += leftover
+    
     def disconnect(self):
         self.running = False
-        if self.socket:
-            self.socket.close()
+        self.wakeup_prompt.set()
+        if self.wakeup_writer:
+            # Despierta al hilo lector bloqueado en select
+            try:
+                self.wakeup_writer.send(b'\0')
+            except OSError:
+                pass
+        if self.reader_thread and self.reader_thread is not threading.current_thread():
+            self.reader_thread.join(timeout=1.0)
+        for sock in (self.socket, self.wakeup_reader, self.wakeup_writer):
+            if sock:
+                sock.close()
     
-    def send_request(self, request):
+    def send_requests_async(self, requests) -> List[Future]:
+        """Envía varias solicitudes de una vez sin esperar respuesta
+        
+        Cada solicitud lleva un 'id' que el servidor devuelve en su respuesta;
+        el hilo lector completa el Future correspondiente al recibirla.
+        """
+        futures = [Future() for _ in requests]
+        if not self.socket:
+            for future in futures:
+                future.set_exception(ConnectionError("No hay conexión al servidor"))
+            return futures
+        
+        ids = []
+        with self.send_lock:
+            frames = []
+            with self.pending_lock:
+                for request, future in zip(requests, futures):
+                    request_id = next(self.request_ids)
+                    self.pending[request_id] = future
+                    ids.append(request_id)
+                    frames.append(self.codec.encode(dict(request, id=request_id)))
+            try:
+                self.socket.sendall(b''.join(frames))
+            except OSError as e:
+                for request_id in ids:
+                    future = self.take_pending(request_id)
+                    if future is not None:
+                        future.set_exception(e)
+        return futures
+    
+    def send_request_async(self, request) -> Future:
+        return self.send_requests_async([request])[0]
+    
+    def send_requests(self, requests, timeout=5.0) -> list:
+        """Envía varias solicitudes en la misma conexión y espera todas las respuestas"""
+        futures = self.send_requests_async(requests)
+        return [self.wait_response(future, timeout) for future in futures]
+    
+    def send_request(self, request, timeout=5.0):
         if not self.socket:
             print("❌ No hay conexión al servidor")
             return None
         
+        log.debug("📤 Enviando solicitud: %s", request)
+        response = self.wait_response(self.send_request_async(request), timeout)
+        if response is not None:
+            log.debug("📥 Respuesta principal: %s", response)
+        return response
+    
+    def wait_response(self, future: Future, timeout=5.0):
         try:
-            # Bloquear temporalmente al thread de notificaciones
-            self.waiting_response = True
-            
-            message = json.dumps(request) + '\n'
-            print(f"📤 Enviando solicitud: {request}")
-            self.socket.send(message.encode('utf-8'))
-            
-            # Buffer para acumular datos
-            buffer = ""
-            self.socket.settimeout(5.0)
-            
-            # Leer hasta encontrar al menos un mensaje completo
-            while '\n' not in buffer:
-                data = self.socket.recv(4096).decode('utf-8')
-                if not data:
-                    break
-                buffer += data
-            
-            print(f"📥 Buffer completo recibido: {buffer}\n")
-
-            # Separar todos los mensajes
-            messages = []
-            temp_buffer = buffer
-            while '\n' in temp_buffer:
-                msg, temp_buffer = temp_buffer.split('\n', 1)
-                if msg.strip():
-                    try:
-                        parsed_msg = json.loads(msg)
-                        messages.append(parsed_msg)
-                    except json.JSONDecodeError:
-                        print(f"⚠️ Error parseando mensaje: {msg}")
-            
-            # Identificar la respuesta correcta y las notificaciones
-            main_response = None
-            notifications = []
-            
-            for msg in messages:
-                if 'status' in msg:
-                    # Esto es una respuesta directa
-                    main_response = msg
-                    print(f"📥 Respuesta principal: {msg}")
-                elif msg.get('type') == 'notification':
-                    # Esto es una notificación
-                    notifications.append(msg)
-                    print(f"📣 Notificación recibida: {msg}")
-            
-            # Procesar notificaciones
-            for notification in notifications:
-                self.handle_notification(notification.get('data', {}))
-            # Retornar la respuesta principal
-            if main_response:
-                return main_response
-            elif messages:
-                # Si no hay respuesta con 'status', usar el primer mensaje
-                return messages[0]
-            else:
-                print("⚠️ No se recibieron mensajes válidos")
-                return None
-            
-        except socket.timeout:
-            print("⏰ Timeout esperando respuesta del servidor")
-            return None
-        except json.JSONDecodeError as e:
-            print(f"❌ Error decodificando JSON: {e}")
+            return future.result(timeout)
+        except FutureTimeoutError:
+            log.warning("⏰ Timeout esperando respuesta del servidor")
+            with self.pending_lock:
+                for request_id, pending in list(self.pending.items()):
+                    if pending is future:
+                        del self.pending[request_id]
             return None
         except Exception as e:
-            print(f"❌ Error en la comunicación: {e}")
+            log.error("❌ Error en la comunicación: %s", e)
             return None
-        finally:
-            self.waiting_response = False
+    
+    def take_pending(self, request_id=None) -> Optional[Future]:
+        """Saca el Future de una solicitud en vuelo
+        
+        Sin 'id' (servidor que no devuelve identificadores) la respuesta
+        corresponde a la solicitud más antigua, porque el servidor atiende
+        cada conexión en orden.
+        """
+        with self.pending_lock:
+            if request_id is None:
+                if not self.pending:
+                    return None
+                request_id = next(iter(self.pending))
+            return self.pending.pop(request_id, None)
+    
+    def fail_pending(self, error: Exception):
+        with self.pending_lock:
+            futures = list(self.pending.values())
+            self.pending.clear()
+        for future in futures:
+            future.set_exception(error)
+    
+    def dispatch_message(self, message):
+        """Reparte un mensaje recibido: notificación o respuesta a una solicitud"""
+        if message.get('type') == 'notification':
+            self.handle_notification(message.get('data', {}))
+            return
+        future = self.take_pending(message.pop('id', None))
+        if future is None:
+            log.warning("⚠️ Respuesta sin solicitud pendiente: %s", message)
+            return
+        future.set_result(message)
                     
     
-    def process_remaining_data(self, data):
-        """Procesa cualquier dato adicional recibido en send_request"""
-        # Dividir por líneas y procesar cada mensaje completo
-        buffer = data
-        print(f"\n📥 datos: {buffer}")  # ← AGREGAR DEBUG
-        while '\n' in buffer:
-            message, buffer = buffer.split('\n', 1)
-            if message.strip():  # Ignorar líneas vacías
-                try:
-                    notification = json.loads(message)
-                    if notification.get('type') == 'notification':
-                        self.handle_notification(notification.get('data', {}))
-                        print(f"\n📥 Mensaje adicional procesado: {notification}")
-                    else:
-                        print(f"\n⚠️ Mensaje adicional no procesado: {notification}")
-                        
-                except json.JSONDecodeError:
-                    print(f"\n⚠️ Datos adicionales no son JSON válido: {message}")
-                    sys.stdout.flush()
-        # Limpiar el buffer
-        # Si queda algo en el buffer, guardarlo para procesar después
-        if buffer.strip():
-            # Aquí podrías implementar un mecanismo para guardar este buffer residual
-            print(f"\n⚠️ Datos incompletos en buffer: {buffer}")
+    def receive_messages(self):
+        """Único lector del socket: espera con select, sin sondeo, y reparte cada trama
+        
+        Las respuestas completan el Future de su solicitud y las notificaciones
+        van a handle_notification en cuanto llegan.
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.socket, selectors.EVENT_READ)
+        selector.register(self.wakeup_reader, selectors.EVENT_READ)
+        try:
+            while self.running:
+                for key, _ in selector.select():
+                    if key.fileobj is self.wakeup_reader:
+                        return
+                    try:
+                        data = self.socket.recv(65536)
+                    except OSError as e:
+                        self.connection_lost(f"Error leyendo del servidor: {e}")
+                        return
+                    if not data:
+                        self.connection_lost("Servidor cerró la conexión.")
+                        return
+                    try:
+                        self.handle_data(data)
+                    except FrameTooLarge as e:
+                        # El flujo ya no se puede separar en tramas: la conexión no sirve más
+                        log.error("❌ Trama del servidor inválida: %s", e)
+                        self.connection_lost("Se perdió la sincronía con el servidor.")
+                        return
+        finally:
+            selector.close()
+            self.fail_pending(ConnectionError("Conexión con el servidor cerrada"))
+    
+    def connection_lost(self, message: str):
+        """El hilo lector termina: se avisa al usuario y se despierta el prompt"""
+        if self.running:
+            print(f"\n{message}")
             sys.stdout.flush()
-
-
-    def receive_notifications(self):
-        while self.running:
-            try:
-
-                if hasattr(self, 'waiting_response') and self.waiting_response:
-                    time.sleep(0.1)  # Esperar y no leer del socket
+        self.running = False
+        self.wakeup_prompt.set()
+    
+    def handle_data(self, data: bytes):
+        """Decodifica y reparte las tramas recibidas
+        
+        Hasta la respuesta al 'hello' se separa de a una trama JSON, para que
+        los bytes siguientes pasen por el framer del formato negociado.
+        """
+        while data:
+            if self.hello_pending:
+                cut = data.find(b'\n') + 1 or len(data)
+                chunk, data = data[:cut], data[cut:]
+            else:
+                chunk, data = data, b''
+            for frame in self.framer.feed(chunk):
+                try:
+                    message = self.codec.decode(frame)
+                except ValueError:
+                    log.warning("⚠️ Error parseando mensaje: %r", frame)
                     continue
-                
-                self.socket.settimeout(0.1)
-                data = self.socket.recv(4096).decode('utf-8')
-                if data:
-                    notification = json.loads(data)
-                    if notification.get('type') == 'notification':
-                        self.handle_notification(notification['data'])
-                if not data: 
-                    print("Servidor cerró la conexión.");
-                    sys.stdout.flush()
-            except:
-                break
+                if self.hello_pending and message.get('type') != 'notification':
+                    # Respuesta al 'hello': se cambia el formato antes de leer la trama siguiente
+                    self.hello_pending = False
+                    protocol = message.get('protocol', PROTOCOL_JSON) if message.get('status') == 'ok' else PROTOCOL_JSON
+                    if protocol != self.codec.name:
+                        self.switch_protocol(protocol)
+                self.dispatch_message(message)
+    
+    def subscribe_game_state(self):
+        """Se suscribe a los deltas de la partida actual o se pone al día si quedó atrás"""
+        if FEATURE_DELTAS not in self.features or not self.current_game:
+            return False
+        since = self.game_state.version if self.game_state and not self.game_state.needs_snapshot else None
+        response = self.send_request({"command": "subscribe", "since": since})
+        if not response or response.get('status') != 'ok':
+            self.game_state = None
+            return False
+        if 'snapshot' in response:
+            self.game_state = GameStateMirror(response['snapshot'], response['version'])
+            self.game_state_stale = False
+        else:
+            self.game_state_stale = not self.game_state.apply(response.get('changes', []))
+        return not self.game_state_stale
+    
+    def apply_state_delta(self, data):
+        if self.game_state is None or data.get('game') != self.current_game:
+            return
+        if not self.game_state.apply(data.get('changes', [])):
+            # Se perdió algún delta: la próxima consulta pide lo que falta
+            self.game_state_stale = True
     
     def handle_notification(self, data):
         msg_type = data.get('type')
         
+        if msg_type == 'state_delta':
+            # Silencioso: solo actualiza la copia local del estado
+            self.apply_state_delta(data)
+            return
+        
         if msg_type == 'team_created':
             print(f"\n🎉 Nuevo equipo creado: '{data['team_name']}' por {data['creator']}")
             sys.stdout.flush()
@@ -211,30 +460,35 @@ class GameClient:
             print(f"\n⚠️  {data['message']}")
             self.current_game = None
             self.current_team = None
+            self.game_state = None
             sys.stdout.flush()
         
         sys.stdout.flush()
 
-        self.needs_reprompt = True
+        self.wakeup_prompt.set()
+    
+    def reprompt_loop(self):
+        """Vuelve a mostrar el prompt activo después de cada notificación"""
+        while self.running:
+            self.wakeup_prompt.wait()
+            self.wakeup_prompt.clear()
+            prompt = self.prompt
+            if self.running and prompt is not None:
+                print(f"\n{prompt}", end='', flush=True)
     
     def get_input_with_live_updates(self, prompt):
         """Input que permite mostrar notificaciones mientras espera"""
-        print(prompt, end='', flush=True)
+        # Un único hilo de reprompt para todo el cliente, despertado por las notificaciones
+        if self.reprompt_thread is None:
+            self.reprompt_thread = threading.Thread(target=self.reprompt_loop, daemon=True)
+            self.reprompt_thread.start()
         
-        # Thread para rehacer el prompt cuando lleguen notificaciones
-        def reprompt_handler():
-            while True:
-                time.sleep(0.1)
-                if self.needs_reprompt:
-                    print(f"\n{prompt}", end='', flush=True)
-                    self.needs_reprompt = False
-        
-        # Iniciar el thread de reprompt
-        reprompt_thread = threading.Thread(target=reprompt_handler, daemon=True)
-        reprompt_thread.start()
-        
-        # Obtener input normalmente
-        return input()
+        self.prompt = prompt
+        print(prompt, end='', flush=True)
+        try:
+            return input()
+        finally:
+            self.prompt = None
 
 
     def set_player_name(self, name):
@@ -245,43 +499,18 @@ class GameClient:
         response = self.send_request(request)
         if response.get("status") in ["success", "ok"]:
             self.player_name = name
+            # El servidor se reinició con la partida guardada: se retoma
+            if response.get('current_game'):
+                print(f"♻️  {response.get('message')}")
+                self.current_game = response['current_game']
+                self.current_team = response.get('team_name')
+                self.game_state = None
+                self.subscribe_game_state()
             return True
         else:
             print(f"Error estableciendo nombre: {response.get('message', 'Error desconocido')}")
             return False
     
-    def refresh_connection(self):
-        """Envía una solicitud de refresco al servidor y limpia el buffer."""
-        print("🔄 Refrescando conexión...")
-        
-        # Primero, vaciar cualquier dato pendiente en el socket
-        if self.socket:
-            try:
-                # Cambiamos a modo no bloqueante temporalmente
-                self.socket.setblocking(False)
-                try:
-                    # Intentamos leer y descartar datos hasta que no haya más
-                    while True:
-                        data = self.socket.recv(4096)
-                        if not data:
-                            break
-                        print(f"🧹 Limpiando buffer: {len(data)} bytes")
-                except BlockingIOError:
-                    # No hay más datos para leer
-                    pass
-                finally:
-                    # Volvemos a modo bloqueante
-                    self.socket.setblocking(True)
-
-                
-            except Exception as e:
-                print(f"❌ Error al refrescar la conexión: {e}")
-                return None
-        else:
-            print("❌ No hay conexión al servidor")
-            return None
-
-
     def create_game(self, game_name, max_teams, max_players_per_team, board_length, min_dice, max_dice):
         request = {
             "command": "create_game",
@@ -295,6 +524,8 @@ class GameClient:
         response = self.send_request(request)
         if response['status'] in ['success', 'ok'] and 'current_game' in response:
             self.current_game = response['current_game']
+            self.game_state = None
+            self.subscribe_game_state()
         return response
     
     
@@ -347,9 +578,11 @@ class GameClient:
         status = response.get('status', '')
         if status in ['ok', 'success'] or 'unido' in response.get('message', '').lower():
             self.current_game = response.get('current_game', game_name)
+            self.game_state = None
+            self.subscribe_game_state()
             return response
         else:
-            print(f"🔍 Debug - Respuesta completa: {response}")  # ← AGREGAR DEBUG
+            log.debug("🔍 Respuesta completa: %s", response)
             return response
     
     def list_teams(self):
@@ -359,6 +592,11 @@ class GameClient:
             return response
     
     def game_status(self):
+        # Con suscripción el estado ya está en memoria: no hace falta consultar
+        if self.game_state is not None:
+            if not self.game_state_stale or self.subscribe_game_state():
+                return self.game_state.to_status()
+        
         request = {"command": "game_status"}
         response = self.send_request(request)
         if 'status' in response:
@@ -398,6 +636,7 @@ class GameClient:
             if response['status'] == 'ok':
                 self.current_game = None
                 self.current_team = None
+                self.game_state = None
             return response
     
     def vote_team_join(self, vote_id, vote):
@@ -490,7 +729,6 @@ class GameClient:
                 
                 self.running = False
             elif choice == "":
-                self.refresh_connection()
                 continue
             else:
                 print("❌ Opción inválida")
@@ -500,11 +738,8 @@ class GameClient:
             self.show_game_menu()
             choice = input("Elige una opción: ").strip().lower()
 
-            if choice == "" and not self.current_team:
-                self.refresh_connection()
-                continue
-            elif choice == "" and self.current_team:
-                self.refresh_connection()
+            if choice == "":
+                # Las notificaciones ya se muestran al llegar; solo se repite el menú
                 continue
             elif choice == '1' and not self.current_team:
     
@@ -789,12 +1024,17 @@ class GameClient:
         print(f"{'✅' if response['status'] == 'ok' else '❌'} {response['message']}")
 
 if __name__ == "__main__":
-    import sys
-    
     # Permitir especificar host como argumento de línea de comandos
-    host = 'localhost'
-    if len(sys.argv) > 1:
-        host = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Cliente del juego de carreras por equipos")
+    parser.add_argument('host', nargs='?', default='localhost')
+    parser.add_argument('--port', type=int, default=12345)
+    parser.add_argument('--protocol', choices=[PROTOCOL_JSON, PROTOCOL_BINARY], default=PROTOCOL_JSON,
+                        help="Formato de tramas a negociar con el servidor")
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='WARNING',
+                        help="DEBUG muestra cada solicitud y respuesta")
+    args = parser.parse_args()
+    # Solo el mensaje: la consola es también la interfaz del juego
+    setup_logging(args.log_level, fmt="%(message)s")
     
-    client = GameClient(host=host)
+    client = GameClient(host=args.host, port=args.port, protocol=args.protocol)
     client.run()
@@ -0,0 +1,110 @@
+"""
+Directorio de partidas del clúster
+Servicio central (un proceso local basta) que registra los nodos del clúster
+y a qué nodo pertenece cada partida. Atiende todas las solicitudes en un solo
+event loop, así que reclamar un nombre es atómico: dos nodos que crean la
+misma partida a la vez nunca la obtienen ambos.
+"""
+import argparse
+import asyncio
+from typing import Dict
+
+from protocol import JSON_CODEC, FrameTooLarge, PROTOCOL_JSON, PROTOCOL_VERSION, FEATURE_REQUEST_IDS
+from console_log import get_logger, setup_logging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+
+log = get_logger("directory")
+
+DEFAULT_DIRECTORY_PORT = 12400
+RECV_SIZE = 64 * 1024
+
+class GameDirectory:
+    def __init__(self, host='localhost', port=DEFAULT_DIRECTORY_PORT):
+        self.host = host
+        self.port = port
+        # Nombre de nodo -> dirección host:port para las conexiones internas
+        self.nodes: Dict[str, str] = {}
+        # Nombre de partida -> nodo dueño
+        self.owners: Dict[str, str] = {}
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        log.info("📒 Directorio de partidas iniciado en %s:%s", self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        framer = JSON_CODEC.new_framer()
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                responses = []
+                for frame in framer.feed(data):
+                    try:
+                        request = JSON_CODEC.decode(frame)
+                    except ValueError:
+                        request = None
+                    if not isinstance(request, dict):
+                        response = {"status": "error", "message": "Formato JSON inválido"}
+                    else:
+                        response = self.handle(request)
+                        if 'id' in request:
+                            response['id'] = request['id']
+                    responses.append(JSON_CODEC.encode(response))
+                writer.write(b''.join(responses))
+                await writer.drain()
+        except (ConnectionError, FrameTooLarge) as e:
+            log.warning("❌ Error manejando nodo: %s", e)
+        finally:
+            writer.close()
+
+    def handle(self, request: dict) -> dict:
+        command = request.get('command')
+        if command == 'hello':
+            # Solo JSON con identificadores de solicitud
+            return {"status": "ok", "version": PROTOCOL_VERSION,
+                    "features": [FEATURE_REQUEST_IDS], "protocol": PROTOCOL_JSON}
+
+        elif command == 'register_node':
+            node, address = request.get('node'), request.get('address')
+            if not node or not address:
+                return {"status": "error", "message": "Faltan nodo o dirección"}
+            self.nodes[node] = address
+            log.info("🖥️  Nodo %s registrado en %s", node, address)
+            return {"status": "ok", "nodes": self.nodes}
+
+        elif command == 'nodes':
+            return {"status": "ok", "nodes": self.nodes}
+
+        elif command == 'claim':
+            game, node = request.get('game'), request.get('node')
+            owner = self.owners.setdefault(game, node)
+            if owner != node:
+                return {"status": "error", "message": "La partida ya existe", "owner": owner}
+            return {"status": "ok", "owner": owner}
+
+        elif command == 'release':
+            game, node = request.get('game'), request.get('node')
+            if self.owners.get(game) == node:
+                del self.owners[game]
+            return {"status": "ok"}
+
+        elif command == 'lookup':
+            owner = self.owners.get(request.get('game'))
+            return {"status": "ok", "owner": owner, "address": self.nodes.get(owner)}
+
+        return {"status": "error", "message": "Comando no reconocido"}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Directorio de partidas del clúster")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=DEFAULT_DIRECTORY_PORT)
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL)
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    try:
+        asyncio.run(GameDirectory(args.host, args.port).serve())
+    except KeyboardInterrupt:
+        log.info("🛑 Cerrando directorio...")
@@ -0,0 +1,209 @@
+"""
+Bitácora de eventos de las partidas
+Cada mutación de una partida (create_game, join, create_team, join_request,
+join_vote, team_join, vote_start, roll, leave) se agrega como una trama binaria del protocolo a un
+segmento de solo escritura al final. El estado de cualquier partida se
+reconstruye reproduciendo sus eventos en orden; los dados quedan registrados,
+así que la reproducción es determinista.
+
+Los eventos se encolan con el lock de la partida tomado (eso fija su orden)
+y un hilo propio los escribe por lotes. La compactación abre un segmento
+nuevo, agrega un 'checkpoint' con el estado completo de cada partida viva y,
+una vez escrito, borra los segmentos anteriores.
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, Iterator, List, Optional
+
+from protocol import BINARY_CODEC, BinaryFramer, FrameTooLarge
+from console_log import get_logger
+
+log = get_logger("journal")
+
+DEFAULT_JOURNAL_DIR = 'journal'
+DEFAULT_COMPACT_INTERVAL = 60.0
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_EXT = '.bin'
+READ_SIZE = 1024 * 1024
+# Los checkpoints llevan la partida completa: se lee sin el tope de tramas de red
+MAX_EVENT_SIZE = 64 * 1024 * 1024
+
+# Tipos de evento
+EVENT_CREATE_GAME = 'create_game'
+EVENT_JOIN = 'join'
+EVENT_CREATE_TEAM = 'create_team'
+EVENT_TEAM_JOIN = 'team_join'
+EVENT_JOIN_REQUEST = 'join_request'
+EVENT_JOIN_VOTE = 'join_vote'
+EVENT_VOTE_START = 'vote_start'
+EVENT_ROLL = 'roll'
+EVENT_LEAVE = 'leave'
+EVENT_CHECKPOINT = 'checkpoint'
+
+def segment_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_EXT}")
+
+def list_segments(directory: str) -> List[str]:
+    """Segmentos del directorio en orden de escritura"""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_EXT)
+    ]
+
+def read_segment(path: str) -> Iterator[dict]:
+    """Eventos de un segmento; una trama cortada al final (caída) se descarta"""
+    framer = BinaryFramer(MAX_EVENT_SIZE)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            for frame in framer.feed(data):
+                yield BINARY_CODEC.decode(frame)
+    if framer.buffer:
+        log.warning("⚠️  Evento incompleto al final de %s (%s bytes), se descarta",
+                    os.path.basename(path), len(framer.buffer))
+
+def read_journal(directory: str) -> Iterator[dict]:
+    """Todos los eventos de la bitácora, en orden"""
+    for path in list_segments(directory):
+        try:
+            yield from read_segment(path)
+        except (ValueError, FrameTooLarge) as e:
+            # Lo posterior a un segmento dañado no puede aplicarse con seguridad
+            log.error("❌ Segmento dañado %s: %s", os.path.basename(path), e)
+            return
+
+class _Compacted:
+    """Marca en la cola: los checkpoints anteriores ya se escribieron"""
+    __slots__ = ('segments',)
+
+    def __init__(self, segments: List[str]):
+        self.segments = segments
+
+_STOP = object()
+
+class GameJournal:
+    """Escritor de la bitácora: cola sin bloqueo, segmentos y compactación periódica
+
+    'checkpoint' recorre las partidas vivas y, con el lock de cada una, llama
+    a append con un evento EVENT_CHECKPOINT que lleva su estado completo.
+    """
+
+    def __init__(self, directory: str = DEFAULT_JOURNAL_DIR,
+                 compact_interval: float = DEFAULT_COMPACT_INTERVAL,
+                 checkpoint: Optional[Callable[[], None]] = None):
+        self.directory = directory
+        self.compact_interval = compact_interval
+        self.checkpoint = checkpoint
+        self.queue = queue.SimpleQueue()
+        self.segments: List[str] = []
+        self.file = None
+        self.bytes_since_compaction = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def append(self, op: str, game: str, **fields):
+        """Encola un evento; se llama con el lock de la partida tomado"""
+        fields['op'] = op
+        fields['game'] = game
+        self.queue.put(BINARY_CODEC.encode(fields))
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments = list_segments(self.directory)
+        # Lo que quedó de la ejecución anterior se compacta en la primera vuelta
+        self.bytes_since_compaction = sum(os.path.getsize(path) for path in self.segments)
+        # Nunca se sigue escribiendo un segmento que pudo quedar cortado
+        self._open_segment()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(_STOP)
+        if self.thread is not None:
+            self.thread.join(timeout=10.0)
+
+    def _open_segment(self):
+        if self.file is not None:
+            self.file.close()
+        last = os.path.basename(self.segments[-1]) if self.segments else None
+        index = int(last[len(SEGMENT_PREFIX):-len(SEGMENT_EXT)]) + 1 if last else 1
+        path = segment_path(self.directory, index)
+        self.file = open(path, 'ab')
+        self.segments.append(path)
+
+    def _compact(self):
+        """Empieza un segmento con el estado de cada partida; los anteriores se borran al escribirse"""
+        started = time.perf_counter()
+        previous = list(self.segments)
+        self._open_segment()
+        self.checkpoint()
+        self.queue.put(_Compacted(previous))
+        log.debug("🗜️  Compactación iniciada en %.1f ms", (time.perf_counter() - started) * 1000.0)
+
+    def _remove_segments(self, segments: List[str]):
+        for path in segments:
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning("⚠️  No se pudo borrar el segmento %s: %s", os.path.basename(path), e)
+            if path in self.segments:
+                self.segments.remove(path)
+
+    def _run(self):
+        next_compaction = time.monotonic() + self.compact_interval
+        running = True
+        while running:
+            timeout = max(0.0, next_compaction - time.monotonic())
+            try:
+                items = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            # Todo lo que ya esté en la cola sale en la misma escritura
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = []
+            for item in items:
+                if item is _STOP:
+                    running = False
+                elif isinstance(item, _Compacted):
+                    written = self._write(batch)
+                    batch = []
+                    if not written:
+                        # Sin los checkpoints en disco, los segmentos anteriores siguen siendo la única copia
+                        log.warning("⚠️  Checkpoints sin escribir, se conservan %s segmentos", len(item.segments))
+                        continue
+                    self._remove_segments(item.segments)
+                    # Solo los eventos posteriores a los checkpoints justifican otra compactación
+                    self.bytes_since_compaction = 0
+                else:
+                    batch.append(item)
+            self._write(batch)
+
+            if running and self.checkpoint is not None and time.monotonic() >= next_compaction:
+                if self.bytes_since_compaction:
+                    self._compact()
+                next_compaction = time.monotonic() + self.compact_interval
+        self.file.close()
+
+    def _write(self, batch: List[bytes]) -> bool:
+        """Escribe el lote en el segmento actual; False si falló"""
+        if not batch:
+            return True
+        data = b''.join(batch)
+        try:
+            self.file.write(data)
+            self.file.flush()
+        except OSError as e:
+            log.error("❌ No se pudo escribir la bitácora: %s", e)
+            return False
+        self.bytes_since_compaction += len(data)
+        return True
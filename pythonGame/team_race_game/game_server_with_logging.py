@@ -4,33 +4,125 @@ Maneja múltiples partidas y jugadores concurrentes
 """
 import socket
 import threading
-import json
+import asyncio
+import argparse
+import sys
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
 import random
+from collections import deque
+try:
+    import resource  # Solo disponible en Unix
+except ImportError:
+    resource = None
 from simple_rmi_logger import (
     init_rmi_logging, cleanup_rmi_logging,
     log_game_start, log_game_end, log_player_create_start, log_player_create_end,
     log_dice_roll_start, log_dice_roll_end, log_team_create_start, log_team_create_end,
     log_team_join_start, log_team_join_end, log_game_win
 )
+from protocol import (
+    FrameTooLarge, Message, CODECS, JSON_CODEC, PROTOCOL_JSON, PROTOCOL_BINARY,
+    PROTOCOL_VERSION, MIN_PROTOCOL_VERSION, SUPPORTED_FEATURES, FEATURE_BINARY,
+    MSG_ALREADY_IN_TEAM, MSG_CANNOT_VOTE, MSG_GAME_ALREADY_STARTED, MSG_GAME_CLOSED,
+    MSG_GAME_CLOSED_BY_CREATOR, MSG_GAME_CREATED, MSG_GAME_EXISTS, MSG_GAME_JOINED,
+    MSG_GAME_LEFT, MSG_GAME_NOT_FOUND, MSG_GAME_NOT_RUNNING, MSG_GAME_STARTED,
+    MSG_INVALID_FRAME, MSG_INVALID_JSON, MSG_JOIN_ACCEPTED, MSG_JOIN_REJECTED,
+    MSG_JOIN_REQUEST_SENT, MSG_JOIN_VOTE_REQUEST, MSG_NOT_IN_GAME, MSG_NOT_IN_TEAM,
+    MSG_NOT_YOUR_TURN, MSG_PROTOCOL_NEGOTIATED, MSG_PROTOCOL_UNSUPPORTED, MSG_TEAM_ADVANCED,
+    MSG_TEAM_CREATED, MSG_TEAM_FULL, MSG_TEAM_GONE, MSG_TEAM_NOT_CREATED, MSG_TEAM_NOT_FOUND,
+    MSG_TEAM_WON, MSG_UNKNOWN_COMMAND, MSG_VOTE_COMPLETED, MSG_VOTE_FAILED,
+    MSG_VOTE_NOT_FOUND, MSG_VOTE_WAITING, MSG_WAITING_START, MSG_CLUSTER_UNAVAILABLE,
+    MSG_GAME_RESUMED
+)
+from console_log import get_logger, setup_logging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+from server_metrics import ServerMetrics, MetricsDumper, DEFAULT_STATS_INTERVAL, INVALID_FRAME
+from outbound import (
+    ThreadedClientConnection, AsyncClientConnection, SlowConsumerError, BroadcastStats,
+    SLOW_CONSUMER_POLICIES, POLICY_DROP_OLDEST, DEFAULT_MAX_BACKLOG
+)
+from cluster import ClusterNode, RelayConnection, DEFAULT_POOL_SIZE
+from game_snapshot import SnapshotWriter, load_snapshots, DEFAULT_SNAPSHOT_DIR, DEFAULT_SNAPSHOT_INTERVAL
+from game_journal import (
+    GameJournal, read_journal, DEFAULT_JOURNAL_DIR, DEFAULT_COMPACT_INTERVAL,
+    EVENT_CREATE_GAME, EVENT_JOIN, EVENT_CREATE_TEAM, EVENT_JOIN_REQUEST, EVENT_JOIN_VOTE,
+    EVENT_TEAM_JOIN, EVENT_VOTE_START, EVENT_ROLL, EVENT_LEAVE, EVENT_CHECKPOINT
+)
+
+log = get_logger("server")
+
+# Modos de servidor disponibles
+MODE_THREADS = 'threads'
+MODE_ASYNCIO = 'asyncio'
+
+# Comandos que operan sobre la partida actual y se serializan con su lock
+GAME_COMMANDS = {
+    'create_team', 'join_team', 'list_teams', 'game_status', 'vote_start',
+    'roll_dice', 'leave_game', 'vote_team_join', 'subscribe', 'unsubscribe'
+}
+
+# Cambios de estado recientes que guarda cada partida para ponerse al día;
+# un cliente más atrasado recibe una foto completa
+GAME_HISTORY = 256
+
+# Tamaño de lectura del socket y backlog de conexiones en modo asyncio
+RECV_SIZE = 64 * 1024
+ASYNC_BACKLOG = 4096
+
+class ClientSession:
+    """Estado asociado a una conexión de cliente"""
+    __slots__ = ('connection', 'framer', 'player_name', 'current_game', 'version', 'features',
+                 'remote_node', 'relayed')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.framer = connection.codec.new_framer()
+        self.player_name = None
+        self.current_game = None
+        # Sin 'hello' la conexión usa el protocolo original sin extras
+        self.version = 0
+        self.features = frozenset()
+        # Modo clúster: nodo dueño de la partida actual si no es este, y
+        # jugadores remotos que otro nodo atiende a través de esta conexión
+        self.remote_node = None
+        self.relayed = set()
+    
+    def switch_protocol(self, codec):
+        """Cambia el formato de las tramas de la conexión en ambos sentidos
+        
+        Los bytes ya recibidos que aún no forman una trama se conservan para
+        el nuevo framer: el cliente no debe usar el nuevo formato hasta recibir
+        la confirmación, que todavía sale en el formato anterior.
+        """
+        leftover = self.framer.buffer
+        self.connection.codec = codec
+        self.framer = codec.new_framer()
+        self.framer.buffer += leftover
 
 class Team:
-    def __init__(self, name: str, creator: str):
+    def __init__(self, name: str, creator: str, game: Optional['Game'] = None):
         self.name = name
-        self.players = [creator]
+        self.game = game
+        # Conjunto ordenado: pertenencia y remoción O(1) conservando el orden de llegada
+        self.players: Dict[str, None] = {}
         self.position = 0
         self.votes_to_start = set()
+        self.add_player(creator)
         
     def add_player(self, player: str):
         if player not in self.players:
-            self.players.append(player)
+            self.players[player] = None
+            if self.game is not None:
+                self.game._team_member_added(self, player)
     
     def remove_player(self, player: str):
         if player in self.players:
-            self.players.remove(player)
+            del self.players[player]
+            had_voted = player in self.votes_to_start
             self.votes_to_start.discard(player)
+            if self.game is not None:
+                self.game._team_member_removed(self, player, had_voted)
 
 class Game:
     def __init__(self, name: str, creator: str, max_teams: int, max_players_per_team: int, 
@@ -44,27 +136,95 @@ class Game:
         self.max_dice = max_dice
         self.teams: Dict[str, Team] = {}
         self.players = {creator}
+        self.player_teams: Dict[str, str] = {}  # Índice jugador -> equipo
+        # Contadores incrementales para can_start y el estado de espera
+        self.players_without_team = 1
+        self.votes_cast = 0
         self.started = False
         self.finished = False
         self.winner = None
         self.current_turn = 0
         self.team_names = []
         self.pending_votes = {}  # Para votaciones de unión a equipos
+        # Serializa todas las solicitudes sobre esta partida
+        self.lock = threading.RLock()
+        self.closed = False
+        # Versión del estado: sube con cada cambio visible para los clientes
+        self.version = 0
+        self.changes = deque(maxlen=GAME_HISTORY)
+        self.published_version = 0
+        self.subscribers = set()
+        
+    def record_change(self, op: str, **fields):
+        """Registra un cambio de estado como delta versionado"""
+        self.version += 1
+        fields['v'] = self.version
+        fields['op'] = op
+        self.changes.append(fields)
+    
+    def changes_since(self, version: int) -> Optional[List[dict]]:
+        """Deltas posteriores a 'version', o None si ya no están en el historial"""
+        if version >= self.version:
+            return []
+        if not self.changes or version < self.changes[0]['v'] - 1:
+            return None
+        start = len(self.changes) - (self.version - version)
+        return [self.changes[index] for index in range(start, len(self.changes))]
+    
+    def snapshot(self) -> dict:
+        """Foto completa del estado que los clientes mantienen con los deltas"""
+        return {
+            "v": self.version,
+            "players": len(self.players),
+            "votes": self.votes_cast,
+            "started": self.started,
+            "finished": self.finished,
+            "winner": self.winner,
+            "board_length": self.board_length,
+            "current_turn": self.current_team(),
+            "teams": [
+                {"name": name, "position": team.position, "players": list(team.players)}
+                for name, team in self.teams.items()
+            ]
+        }
         
     def add_player(self, player: str):
-        self.players.add(player)
+        if player not in self.players:
+            self.players.add(player)
+            if player not in self.player_teams:
+                self.players_without_team += 1
+            self.record_change("player_joined", player=player)
     
     def remove_player(self, player: str):
-        self.players.discard(player)
-        # Remover de equipos
-        for team in self.teams.values():
-            team.remove_player(player)
-        # Limpiar equipos vacíos
-        empty_teams = [name for name, team in self.teams.items() if not team.players]
-        for team_name in empty_teams:
+        self.subscribers.discard(player)
+        if player in self.players:
+            self.players.discard(player)
+            if player not in self.player_teams:
+                self.players_without_team -= 1
+            self.record_change("player_left", player=player)
+        # Remover de su equipo y limpiarlo si quedó vacío
+        team_name = self.player_teams.get(player)
+        if team_name is None:
+            return
+        team = self.teams[team_name]
+        team.remove_player(player)
+        if not team.players:
             del self.teams[team_name]
             if team_name in self.team_names:
+                index = self.team_names.index(team_name)
                 self.team_names.remove(team_name)
+                # El turno sigue en el mismo equipo; si era el del eliminado, pasa al siguiente
+                if index < self.current_turn:
+                    self.current_turn -= 1
+                if self.current_turn >= len(self.team_names):
+                    self.current_turn = 0
+            self.record_change("team_removed", team=team_name, current_turn=self.current_team())
+    
+    def current_team(self) -> Optional[str]:
+        """Equipo con el turno, o None si la partida no empezó o ya no quedan equipos"""
+        if not self.started or self.current_turn >= len(self.team_names):
+            return None
+        return self.team_names[self.current_turn]
     
     def create_team(self, team_name: str, creator: str) -> bool:
         if len(self.teams) >= self.max_teams:
@@ -74,131 +234,608 @@ class Game:
         if self.get_player_team(creator):
             return False
             
-        team = Team(team_name, creator)
+        team = Team(team_name, creator, self)
         self.teams[team_name] = team
         self.team_names.append(team_name)
+        self.record_change("team_created", team=team_name, players=list(team.players))
         return True
     
     def get_player_team(self, player: str) -> Optional[str]:
-        for team_name, team in self.teams.items():
-            if player in team.players:
-                return team_name
-        return None
+        return self.player_teams.get(player)
     
     def can_start(self) -> bool:
         if self.started or len(self.teams) == 0:
             return False
         
         # Todos los jugadores deben estar en equipos
-        for player in self.players:
-            if not self.get_player_team(player):
-                return False
+        if self.players_without_team > 0:
+            return False
         
         # Todos los jugadores deben haber votado para empezar
-        total_votes_needed = len(self.players)
-        total_votes = sum(len(team.votes_to_start) for team in self.teams.values())
-        
-        return total_votes >= total_votes_needed
+        return self.votes_cast >= len(self.players)
     
     def vote_to_start(self, player: str) -> bool:
         team_name = self.get_player_team(player)
         if team_name and team_name in self.teams:
-            self.teams[team_name].votes_to_start.add(player)
+            votes = self.teams[team_name].votes_to_start
+            if player not in votes:
+                votes.add(player)
+                self.votes_cast += 1
+                self.record_change("votes", votes=self.votes_cast)
             return True
         return False
     
+    def open_join_vote(self, player: str, team_name: str, total_needed: int):
+        """Abre la votación para que 'player' entre al equipo (forma parte de la foto)"""
+        self.pending_votes[player] = {
+            "type": "join_team",
+            "team_name": team_name,
+            "player": player,
+            "votes": {},
+            "total_needed": total_needed
+        }
+        self.record_change("join_vote", player=player, team=team_name, votes=0)
+    
+    def cast_join_vote(self, vote_id: str, voter: str, vote):
+        vote_data = self.pending_votes[vote_id]
+        vote_data["votes"][voter] = vote
+        self.record_change("join_vote", player=vote_id, team=vote_data["team_name"],
+                           votes=len(vote_data["votes"]))
+    
+    def close_join_vote(self, vote_id: str):
+        if self.pending_votes.pop(vote_id, None) is not None:
+            self.record_change("join_vote_closed", player=vote_id)
+    
+    def _team_member_added(self, team: Team, player: str):
+        self.player_teams[player] = team.name
+        if player in self.players:
+            self.players_without_team -= 1
+        # El creador ya viaja en el delta "team_created"
+        if team.name in self.teams:
+            self.record_change("member_added", team=team.name, player=player)
+    
+    def _team_member_removed(self, team: Team, player: str, had_voted: bool):
+        self.player_teams.pop(player, None)
+        if had_voted:
+            self.votes_cast -= 1
+        if player in self.players:
+            self.players_without_team += 1
+        self.record_change("member_removed", team=team.name, player=player, votes=self.votes_cast)
+    
     def start_game(self):
         if self.can_start():
             self.started = True
+            self.record_change("started", current_turn=self.team_names[self.current_turn])
+            return True
+        return False
+    
+    def apply_roll(self, team_name: str, rolls: List[int]) -> bool:
+        """Mueve al equipo con los dados ya tirados y pasa el turno; True si ganó"""
+        team = self.teams[team_name]
+        team.position += sum(rolls)
+        
+        # Verificar victoria
+        if team.position >= self.board_length:
+            self.finished = True
+            self.winner = team_name
+            self.record_change("finished", team=team_name, position=team.position, winner=team_name)
             return True
+        
+        # Siguiente turno
+        self.current_turn = (self.current_turn + 1) % len(self.team_names)
+        self.record_change("moved", team=team_name, position=team.position,
+                           next_turn=self.team_names[self.current_turn])
         return False
+    
+    def to_state(self) -> dict:
+        """Estado completo para guardar en disco (con el lock de la partida)"""
+        return {
+            "name": self.name,
+            "creator": self.creator,
+            "max_teams": self.max_teams,
+            "max_players_per_team": self.max_players_per_team,
+            "board_length": self.board_length,
+            "min_dice": self.min_dice,
+            "max_dice": self.max_dice,
+            "v": self.version,
+            "players": list(self.players),
+            "started": self.started,
+            "finished": self.finished,
+            "winner": self.winner,
+            "current_turn": self.current_turn,
+            "teams": [
+                {"name": name, "players": list(team.players), "position": team.position,
+                 "votes": list(team.votes_to_start)}
+                for name, team in self.teams.items()
+            ],
+            # Copia propia: la foto se serializa fuera del lock mientras siguen llegando votos
+            "pending_votes": {
+                vote_id: dict(vote_data, votes=dict(vote_data['votes']))
+                for vote_id, vote_data in self.pending_votes.items()
+            }
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'Game':
+        """Reconstruye una partida guardada con to_state, sin registrar deltas"""
+        game = cls(state['name'], state['creator'], state['max_teams'], state['max_players_per_team'],
+                   state['board_length'], state['min_dice'], state['max_dice'])
+        game.players = set(state['players'])
+        for team_state in state['teams']:
+            # Sin partida asociada para no contar cada miembro como un cambio
+            team = Team(team_state['name'], team_state['players'][0])
+            for player in team_state['players'][1:]:
+                team.add_player(player)
+            team.game = game
+            team.position = team_state['position']
+            team.votes_to_start = set(team_state['votes'])
+            game.teams[team.name] = team
+            game.team_names.append(team.name)
+            for player in team.players:
+                game.player_teams[player] = team.name
+            game.votes_cast += len(team.votes_to_start)
+        game.players_without_team = sum(1 for player in game.players if player not in game.player_teams)
+        game.started = state['started']
+        game.finished = state['finished']
+        game.winner = state['winner']
+        game.current_turn = state['current_turn']
+        game.pending_votes = state['pending_votes']
+        game.version = game.published_version = state['v']
+        return game
 
 class GameServer:
-    def __init__(self, host='localhost', port=12345):
+    def __init__(self, host='localhost', port=12345, mode=MODE_THREADS,
+                 max_backlog=DEFAULT_MAX_BACKLOG, slow_consumer_policy=POLICY_DROP_OLDEST,
+                 stats_file=None, stats_interval=DEFAULT_STATS_INTERVAL,
+                 cluster: Optional[ClusterNode] = None, snapshot_dir=None,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, restore=False, journal_dir=None,
+                 journal_compact_interval=DEFAULT_COMPACT_INTERVAL):
         self.host = host
         self.port = port
+        self.mode = mode
+        self.max_backlog = max_backlog
+        self.slow_consumer_policy = slow_consumer_policy
         self.games: Dict[str, Game] = {}
         self.client_sockets = {}
+        # Orden de adquisición: lock de partida -> games_lock / clients_lock
+        self.games_lock = threading.Lock()
+        self.clients_lock = threading.Lock()
+        self.broadcast_stats = BroadcastStats()
+        self.metrics = ServerMetrics()
+        # Volcado periódico de métricas a un archivo JSONL (opcional)
+        self.metrics_dumper = MetricsDumper(self.stats_snapshot, stats_file, stats_interval) if stats_file else None
+        # Pertenencia a un clúster de nodos con directorio de partidas (opcional)
+        self.cluster = cluster
+        if cluster is not None:
+            cluster.on_relay = self.deliver_relayed
+        # Fotos incrementales de las partidas en disco y arranque en caliente (opcional)
+        self.snapshot_dir = snapshot_dir
+        self.restore = restore
+        self.snapshot_writer = SnapshotWriter(
+            self.games_copy, self.capture_game, snapshot_dir, snapshot_interval
+        ) if snapshot_dir else None
+        # Bitácora de eventos de las partidas (opcional)
+        self.journal = GameJournal(
+            journal_dir, journal_compact_interval, self.checkpoint_games
+        ) if journal_dir else None
+        # Jugadores restaurados -> partida que retoman al volver a identificarse
+        self.resumable: Dict[str, str] = {}
         self.running = False
         
     def start(self):
         # Inicializar logging RMI
         init_rmi_logging()
+        if self.metrics_dumper:
+            self.metrics_dumper.start()
+        if self.restore:
+            # La bitácora tiene hasta el último evento; las fotos, hasta el último intervalo
+            if self.journal:
+                self.restore_journal()
+            elif self.snapshot_dir:
+                self.restore_snapshots()
+        if self.journal:
+            self.journal.start()
+        if self.snapshot_writer:
+            self.snapshot_writer.start()
         
         self.running = True
+        if self.mode == MODE_ASYNCIO:
+            try:
+                asyncio.run(self.serve_async())
+            except KeyboardInterrupt:
+                log.info("🛑 Cerrando servidor...")
+            finally:
+                self.running = False
+                self.stop_metrics()
+                self.stop_snapshots()
+                cleanup_rmi_logging()
+            return
+        
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server_socket.bind((self.host, self.port))
         server_socket.listen(10)
         
-        print(f"🎮 Servidor del juego iniciado en {self.host}:{self.port}")
-        print("📡 Sistema de logging RMI activado")
+        log.info("🎮 Servidor del juego iniciado en %s:%s", self.host, self.port)
+        log.info("📡 Sistema de logging RMI activado")
+        if self.cluster is not None:
+            self.cluster.start()
+            # Las partidas restauradas siguen perteneciendo a este nodo
+            for game_name in list(self.games):
+                self.cluster.claim(game_name)
         
         try:
             while self.running:
                 try:
                     client_socket, address = server_socket.accept()
-                    print(f"🔌 Cliente conectado desde {address}")
+                    log.debug("🔌 Cliente conectado desde %s", address)
                     thread = threading.Thread(target=self.handle_client, args=(client_socket,))
                     thread.daemon = True
                     thread.start()
                 except Exception as e:
                     if self.running:
-                        print(f"❌ Error aceptando conexión: {e}")
+                        log.error("❌ Error aceptando conexión: %s", e)
         except KeyboardInterrupt:
-            print("\n🛑 Cerrando servidor...")
+            log.info("🛑 Cerrando servidor...")
         finally:
             server_socket.close()
+            if self.cluster is not None:
+                self.cluster.stop()
+            self.stop_metrics()
+            self.stop_snapshots()
             cleanup_rmi_logging()
     
+    def stop_metrics(self):
+        if self.metrics_dumper:
+            self.metrics_dumper.stop()
+    
+    def stop_snapshots(self):
+        # La última foto se toma al cerrar para no perder los cambios recientes
+        if self.snapshot_writer:
+            self.snapshot_writer.stop()
+        if self.journal:
+            self.journal.stop()
+    
+    def journal_event(self, op, game_name, **fields):
+        """Registra una mutación de la partida (con su lock tomado) si la bitácora está activa"""
+        if self.journal is not None:
+            self.journal.append(op, game_name, **fields)
+    
+    def checkpoint_games(self):
+        """Agrega a la bitácora el estado completo de cada partida viva (compactación)"""
+        for game in self.games_copy().values():
+            with game.lock:
+                if not game.closed:
+                    self.journal.append(EVENT_CHECKPOINT, game.name, state=game.to_state())
+    
+    def games_copy(self) -> Dict[str, Game]:
+        with self.games_lock:
+            return dict(self.games)
+    
+    def capture_game(self, game: Game) -> Optional[dict]:
+        if not isinstance(game.name, str):
+            return None
+        with game.lock:
+            if game.closed:
+                return None
+            return game.to_state()
+    
+    def restore_snapshots(self):
+        """Carga las partidas guardadas; sus jugadores las retoman al identificarse"""
+        for state in load_snapshots(self.snapshot_dir):
+            try:
+                game = Game.from_state(state)
+            except (KeyError, IndexError, TypeError) as e:
+                log.warning("⚠️  Foto inválida de %s: %s", state.get('name'), e)
+                continue
+            self.adopt_restored(game)
+        if self.games:
+            log.info("♻️  %s partidas restauradas desde %s", len(self.games), self.snapshot_dir)
+    
+    def restore_journal(self):
+        """Reconstruye las partidas reproduciendo la bitácora (recuperación tras una caída)"""
+        started = time.perf_counter()
+        games, events = replay_journal(read_journal(self.journal.directory))
+        for game in games.values():
+            self.adopt_restored(game)
+        if events:
+            log.info("♻️  %s partidas restauradas desde la bitácora (%s eventos en %.0f ms)",
+                     len(games), events, (time.perf_counter() - started) * 1000.0)
+    
+    def adopt_restored(self, game: Game):
+        self.games[game.name] = game
+        for player_name in game.players:
+            self.resumable[player_name] = game.name
+        if self.snapshot_writer:
+            self.snapshot_writer.mark_saved(game)
+    
+    def stats_snapshot(self) -> dict:
+        stats = self.metrics.snapshot(games=len(self.games))
+        stats["broadcast"] = self.broadcast_stats.snapshot()
+        return stats
+    
+    async def serve_async(self):
+        """Atiende todas las conexiones en un único event loop de asyncio"""
+        raise_fd_limit()
+        server = await asyncio.start_server(
+            self.handle_client_async, self.host, self.port, backlog=ASYNC_BACKLOG
+        )
+        
+        log.info("🎮 Servidor del juego (asyncio) iniciado en %s:%s", self.host, self.port)
+        log.info("📡 Sistema de logging RMI activado")
+        
+        async with server:
+            await server.serve_forever()
+    
     def handle_client(self, client_socket):
-        player_name = None
-        current_game = None
+        connection = ThreadedClientConnection(client_socket, self.max_backlog, self.slow_consumer_policy)
+        session = ClientSession(connection)
+        self.metrics.connection_opened()
         
         try:
             while True:
-                data = client_socket.recv(4096).decode('utf-8')
+                data = client_socket.recv(RECV_SIZE)
                 if not data:
                     break
                 
-                try:
-                    request = json.loads(data)
-                    response = self.process_request(request, player_name, current_game)
-                    
-                    # Actualizar estado local
-                    if 'player_name' in response:
-                        player_name = response['player_name']
-                        self.client_sockets[player_name] = client_socket
-                    
-                    if 'current_game' in response:
-                        current_game = response['current_game']
-                    
-                    client_socket.send((json.dumps(response) + '\n').encode('utf-8'))
-                    
-                except json.JSONDecodeError:
-                    error_response = {"status": "error", "message": "Formato JSON inválido"}
-                    client_socket.send((json.dumps(error_response) + '\n').encode('utf-8'))
+                # Procesar todas las tramas completas recibidas y responder en un solo envío
+                responses = self.handle_frames(session, session.framer.feed(data))
+                if responses:
+                    connection.send(responses, droppable=False)
                     
+        except FrameTooLarge as e:
+            log.warning("❌ Solicitud demasiado grande: %s", e)
         except Exception as e:
-            print(f"❌ Error manejando cliente: {e}")
+            log.warning("❌ Error manejando cliente: %s", e)
         finally:
-            if player_name:
-                # Limpiar jugador de partidas
-                for game in self.games.values():
-                    if player_name in game.players:
-                        game.remove_player(player_name)
+            self.close_session(session)
+            connection.close()
+            client_socket.close()
+            self.metrics.connection_closed()
+    
+    async def handle_client_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        log.debug("🔌 Cliente conectado desde %s", writer.get_extra_info('peername'))
+        connection = AsyncClientConnection(writer, self.max_backlog, self.slow_consumer_policy)
+        session = ClientSession(connection)
+        self.metrics.connection_opened()
+        
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
                 
-                if player_name in self.client_sockets:
-                    del self.client_sockets[player_name]
+                # Se atiende en el hilo del event loop: nada en este camino espera E/S.
+                # Los log_* del logger RMI solo encolan (el hilo emisor habla con el
+                # proxy), la bitácora encola para su propio hilo y el clúster, que sí
+                # espera respuestas de otros nodos, solo se admite en modo threads.
+                responses = self.handle_frames(session, session.framer.feed(data))
+                if responses:
+                    connection.send(responses, droppable=False)
+                    await connection.wait_writable()
+                
+        except FrameTooLarge as e:
+            log.warning("❌ Solicitud demasiado grande: %s", e)
+        except ConnectionError as e:
+            log.warning("❌ Error manejando cliente: %s", e)
+        except asyncio.CancelledError:
+            # Cierre del servidor: el jugador sigue en su partida para la foto final
+            session.player_name = None
+            raise
+        finally:
+            self.close_session(session)
+            connection.close()
+            writer.close()
+            self.metrics.connection_closed()
+    
+    def handle_frames(self, session: ClientSession, frames) -> bytes:
+        """Procesa en orden un lote de tramas y devuelve las respuestas concatenadas"""
+        responses = []
+        for frame in frames:
+            # La respuesta sale en el formato con el que llegó la solicitud
+            codec = session.connection.codec
+            responses.append(codec.encode(self.handle_message(session, frame, codec)))
+        return b''.join(responses)
+    
+    def handle_message(self, session: ClientSession, data, codec=JSON_CODEC) -> dict:
+        """Decodifica una solicitud, la procesa y actualiza el estado de la sesión"""
+        invalid = MSG_INVALID_JSON if codec.name == PROTOCOL_JSON else MSG_INVALID_FRAME
+        started = self.metrics.request_started()
+        command = INVALID_FRAME
+        response = None
+        try:
+            try:
+                request = codec.decode(data)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                response = {"status": "error", "message": Message(invalid)}
+                return response
             
-            client_socket.close()
+            command = request.get('command')
+            if self.cluster is not None:
+                response = self.cluster_request(session, request)
+            if response is None:
+                response = self.process_request(request, session.player_name, session.current_game)
+                if 'current_game' in response:
+                    session.remote_node = None
+        finally:
+            self.metrics.request_finished(command, started, response is not None and response.get('status') == 'ok')
+        log.debug("📥 %s de %s -> %s", command, session.player_name, response.get('status'))
+        if 'id' in request:
+            # Identificador de correlación: el cliente puede tener varias solicitudes en vuelo
+            response['id'] = request['id']
+        
+        # Actualizar estado local
+        if 'player_name' in response:
+            session.player_name = response['player_name']
+            with self.clients_lock:
+                self.client_sockets[session.player_name] = session.connection
+        
+        if 'current_game' in response:
+            session.current_game = response['current_game']
+        
+        if request.get('command') == 'hello' and response.get('status') == 'ok':
+            session.version = response['version']
+            session.features = frozenset(response['features'])
+            if response['protocol'] != session.connection.codec.name:
+                session.switch_protocol(CODECS[response['protocol']])
+        
+        return response
     
-    def process_request(self, request, player_name, current_game):
+    def close_session(self, session: ClientSession):
+        """Limpia el jugador de una sesión cerrada"""
+        player_name = session.player_name
+        if player_name:
+            if session.remote_node:
+                self.cluster.relay_close(session.remote_node, player_name)
+            self.remove_from_games(player_name)
+            
+            with self.clients_lock:
+                if self.client_sockets.get(player_name) is session.connection:
+                    del self.client_sockets[player_name]
+        
+        # Conexión interna de otro nodo: sus jugadores remotos se van con ella
+        for relayed_player in session.relayed:
+            self.drop_relayed(relayed_player, session.connection)
+    
+    def remove_from_games(self, player_name):
+        with self.games_lock:
+            games = list(self.games.values())
+        for game in games:
+            with game.lock:
+                if player_name in game.players:
+                    game.remove_player(player_name)
+                    self.journal_event(EVENT_LEAVE, game.name, player=player_name, close=False)
+                    self.publish_changes(game)
+    
+    def cluster_request(self, session: ClientSession, request) -> Optional[dict]:
+        """Solicitudes que dependen del clúster; None si se atienden localmente"""
         command = request.get('command')
+        if command == 'relay':
+            return self.handle_relay(session, request)
+        
+        elif command == 'relay_close':
+            self.drop_relayed(request.get('player'))
+            return {"status": "ok"}
+        
+        elif command == 'list_games':
+            # Otro nodo que arma la lista del clúster solo pide las partidas locales
+            if request.get('scope') == 'node':
+                return None
+            response = self.list_games()
+            response['games'].extend(self.cluster.list_remote_games())
+            return response
         
+        elif command == 'create_game':
+            return self.create_cluster_game(session, request)
+        
+        elif command == 'join_game':
+            game_name = request.get('game_name')
+            if not session.player_name or self.get_game(game_name) is not None:
+                return None
+            owner = self.cluster.owner(game_name)
+            if owner is None or owner == self.cluster.node_name:
+                return None
+            return self.relay_request(session, owner, request)
+        
+        elif command in GAME_COMMANDS and session.remote_node:
+            return self.relay_request(session, session.remote_node, request)
+        
+        return None
+    
+    def create_cluster_game(self, session: ClientSession, request) -> Optional[dict]:
+        """Reclama el nombre en el directorio antes de crear la partida en este nodo"""
+        game_name = request.get('game_name')
+        if self.get_game(game_name) is not None:
+            return None
+        claimed = self.cluster.claim(game_name)
+        if claimed is None:
+            return {"status": "error", "message": Message(MSG_CLUSTER_UNAVAILABLE)}
+        if not claimed:
+            return {"status": "error", "message": Message(MSG_GAME_EXISTS)}
+        
+        response = self.process_request(request, session.player_name, session.current_game)
+        if response.get('status') == 'ok':
+            session.remote_node = None
+        elif self.get_game(game_name) is None:
+            self.cluster.release(game_name)
+        return response
+    
+    def relay_request(self, session: ClientSession, node, request) -> dict:
+        """Ejecuta la solicitud en el nodo dueño de la partida y devuelve su respuesta"""
+        relayed = self.cluster.relay(node, session.player_name, request, session.current_game)
+        if relayed is None or relayed.get('status') != 'ok':
+            return {"status": "error", "message": Message(MSG_CLUSTER_UNAVAILABLE)}
+        response = relayed['response']
+        if 'current_game' in response:
+            session.remote_node = node if response['current_game'] else None
+        return response
+    
+    def handle_relay(self, session: ClientSession, request) -> dict:
+        """Atiende en este nodo la solicitud de un jugador conectado a otro nodo"""
+        player_name = request.get('player')
+        inner = request.get('request')
+        if (not player_name or not isinstance(inner, dict)
+                or (inner.get('command') != 'join_game' and inner.get('command') not in GAME_COMMANDS)):
+            return {"status": "error", "message": Message(MSG_UNKNOWN_COMMAND)}
+        
+        # Sus notificaciones vuelven por la conexión del nodo de origen
+        with self.clients_lock:
+            connection = self.client_sockets.get(player_name)
+            if connection is None or (isinstance(connection, RelayConnection)
+                                      and connection.peer is not session.connection):
+                self.client_sockets[player_name] = RelayConnection(session.connection, player_name)
+        session.relayed.add(player_name)
+        
+        response = self.process_request(inner, player_name, request.get('current_game'))
+        return {"status": "ok", "response": response}
+    
+    def drop_relayed(self, player_name, peer=None):
+        """Saca de las partidas a un jugador remoto que se desconectó de su nodo"""
+        with self.clients_lock:
+            connection = self.client_sockets.get(player_name)
+            if connection is not None:
+                if not isinstance(connection, RelayConnection):
+                    return
+                if peer is not None and connection.peer is not peer:
+                    return
+                del self.client_sockets[player_name]
+        if player_name:
+            self.remove_from_games(player_name)
+    
+    def deliver_relayed(self, player_name, frame):
+        """Entrega a un jugador local una notificación del nodo dueño de su partida"""
+        data = frame.get('data')
+        connection = self.client_sockets.get(player_name)
+        if isinstance(data, dict) and connection is not None and not isinstance(connection, RelayConnection):
+            self.send_to_players((player_name,), data)
+    
+    def get_game(self, game_name) -> Optional[Game]:
+        with self.games_lock:
+            return self.games.get(game_name)
+    
+    def process_request(self, request, player_name, current_game):
+        command = request.get('command')
+        if command not in GAME_COMMANDS:
+            return self.dispatch_request(command, request, player_name, current_game)
+        
+        game = self.get_game(current_game) if current_game else None
+        if game is None:
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
+        
+        # Las solicitudes de una misma partida se ejecutan de a una;
+        # partidas distintas no compiten entre sí
+        with game.lock:
+            if game.closed:
+                return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
+            response = self.dispatch_request(command, request, player_name, current_game)
+            self.publish_changes(game)
+            return response
+    
+    def dispatch_request(self, command, request, player_name, current_game):
         if command == 'set_player_name':
-            name = request.get('name')
-            return {"status": "ok", "player_name": name}
+            return self.set_player_name(request)
         
         elif command == 'create_game':
             return self.create_game(request, player_name)
@@ -219,7 +856,13 @@ class GameServer:
             return self.list_teams(current_game)
         
         elif command == 'game_status':
-            return self.game_status(current_game)
+            return self.game_status(current_game, request.get('since'))
+        
+        elif command == 'subscribe':
+            return self.subscribe(request, player_name, current_game)
+        
+        elif command == 'unsubscribe':
+            return self.unsubscribe(player_name, current_game)
         
         elif command == 'vote_start':
             return self.vote_start(player_name, current_game)
@@ -233,8 +876,35 @@ class GameServer:
         elif command == 'vote_team_join':
             return self.vote_team_join(request, player_name, current_game)
         
+        elif command == 'broadcast_stats':
+            return {"status": "ok", "broadcast_stats": self.broadcast_stats.snapshot()}
+        
+        elif command == 'server_stats':
+            return {"status": "ok", "server_stats": self.stats_snapshot()}
+        
+        elif command == 'hello':
+            return self.hello(request)
+        
         else:
-            return {"status": "error", "message": "Comando no reconocido"}
+            return {"status": "error", "message": Message(MSG_UNKNOWN_COMMAND)}
+    
+    def hello(self, request):
+        return negotiate_hello(request)
+    
+    def set_player_name(self, request):
+        name = request.get('name')
+        response = {"status": "ok", "player_name": name}
+        
+        # Tras un arranque en caliente el jugador vuelve a su partida y equipo
+        game_name = self.resumable.pop(name, None) if isinstance(name, str) else None
+        game = self.get_game(game_name) if game_name else None
+        if game is not None:
+            with game.lock:
+                if not game.closed and name in game.players:
+                    response["message"] = Message(MSG_GAME_RESUMED, game_name=game_name)
+                    response["current_game"] = game_name
+                    response["team_name"] = game.get_player_team(name)
+        return response
     
     def create_game(self, request, player_name):
         game_name = request.get('game_name')
@@ -247,43 +917,57 @@ class GameServer:
         # Log inicio de creación de juego
         log_game_start(game_name)
         
-        if game_name in self.games:
-            return {"status": "error", "message": "Ya existe una partida con ese nombre"}
-        
         game = Game(game_name, player_name, max_teams, max_players_per_team, 
                    board_length, min_dice, max_dice)
-        self.games[game_name] = game
+        with self.games_lock:
+            if game_name in self.games:
+                return {"status": "error", "message": Message(MSG_GAME_EXISTS)}
+            self.games[game_name] = game
+            # Con games_lock tomado: nadie puede unirse antes de que se registre la creación
+            self.journal_event(EVENT_CREATE_GAME, game_name, creator=player_name, max_teams=max_teams,
+                               max_players_per_team=max_players_per_team, board_length=board_length,
+                               min_dice=min_dice, max_dice=max_dice)
         
         return {
             "status": "ok", 
-            "message": f"Partida '{game_name}' creada exitosamente",
+            "message": Message(MSG_GAME_CREATED, game_name=game_name),
             "current_game": game_name
         }
     
     def join_game(self, request, player_name):
         game_name = request.get('game_name')
         
-        if game_name not in self.games:
-            return {"status": "error", "message": "La partida no existe"}
+        game = self.get_game(game_name)
+        if game is None:
+            return {"status": "error", "message": Message(MSG_GAME_NOT_FOUND)}
         
-        game = self.games[game_name]
-        if game.started:
-            return {"status": "error", "message": "La partida ya ha comenzado"}
-        
-        # Log creación de jugador en la partida
-        log_player_create_start(game_name, "sin_equipo", player_name)
-        game.add_player(player_name)
-        log_player_create_end(game_name, "sin_equipo", player_name)
+        with game.lock:
+            if game.closed:
+                return {"status": "error", "message": Message(MSG_GAME_NOT_FOUND)}
+            # Un jugador que ya está en la partida (restaurada) puede volver a ella
+            if game.started and player_name not in game.players:
+                return {"status": "error", "message": Message(MSG_GAME_ALREADY_STARTED)}
+            
+            # Log creación de jugador en la partida
+            log_player_create_start(game_name, "sin_equipo", player_name)
+            if player_name not in game.players:
+                game.add_player(player_name)
+                self.journal_event(EVENT_JOIN, game_name, player=player_name)
+            log_player_create_end(game_name, "sin_equipo", player_name)
+            self.publish_changes(game)
         
         return {
             "status": "ok",
-            "message": f"Te has unido a la partida '{game_name}'",
+            "message": Message(MSG_GAME_JOINED, game_name=game_name),
             "current_game": game_name
         }
     
     def list_games(self):
         games_info = []
-        for name, game in self.games.items():
+        with self.games_lock:
+            games = list(self.games.items())
+        # Lectura sin lock de partida: solo contadores y banderas
+        for name, game in games:
             games_info.append({
                 "name": name,
                 "creator": game.creator,
@@ -297,7 +981,7 @@ class GameServer:
     
     def create_team(self, request, player_name, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         team_name = request.get('team_name')
         game = self.games[current_game]
@@ -306,6 +990,7 @@ class GameServer:
         log_team_create_start(current_game, team_name, player_name)
         
         if game.create_team(team_name, player_name):
+            self.journal_event(EVENT_CREATE_TEAM, current_game, player=player_name, team=team_name)
             # Log fin de creación de equipo
             log_team_create_end(current_game, team_name, player_name)
             
@@ -314,73 +999,70 @@ class GameServer:
                 "team_name": team_name,
                 "creator": player_name
             })
-            return {"status": "ok", "message": f"Equipo '{team_name}' creado exitosamente"}
+            return {"status": "ok", "message": Message(MSG_TEAM_CREATED, team_name=team_name)}
         else:
-            return {"status": "error", "message": "No se pudo crear el equipo"}
+            return {"status": "error", "message": Message(MSG_TEAM_NOT_CREATED)}
     
     def join_team(self, request, player_name, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         team_name = request.get('team_name')
         game = self.games[current_game]
         
         if team_name not in game.teams:
-            return {"status": "error", "message": "El equipo no existe"}
+            return {"status": "error", "message": Message(MSG_TEAM_NOT_FOUND)}
         
         team = game.teams[team_name]
         
         if len(team.players) >= game.max_players_per_team:
-            return {"status": "error", "message": "El equipo está lleno"}
+            return {"status": "error", "message": Message(MSG_TEAM_FULL)}
         
         if game.get_player_team(player_name):
-            return {"status": "error", "message": "Ya estás en un equipo"}
+            return {"status": "error", "message": Message(MSG_ALREADY_IN_TEAM)}
         
         # Iniciar votación para unirse al equipo
         vote_id = player_name
-        game.pending_votes[vote_id] = {
-            "type": "join_team",
-            "team_name": team_name,
-            "player": player_name,
-            "votes": {},
-            "total_needed": len(team.players)
-        }
+        game.open_join_vote(player_name, team_name, len(team.players))
+        self.journal_event(EVENT_JOIN_REQUEST, current_game, player=player_name,
+                           team=team_name, needed=len(team.players))
         
         # Notificar a los miembros del equipo
         self.broadcast_to_team(current_game, team_name, {
             "type": "vote_request",
             "vote_id": vote_id,
-            "message": f"{player_name} quiere unirse al equipo {team_name}. Vota 'si' o 'no'",
+            "message": Message(MSG_JOIN_VOTE_REQUEST, player_name=player_name, team_name=team_name),
             "player_requesting": player_name
         })
         
-        return {"status": "ok", "message": f"Solicitud enviada al equipo '{team_name}'. Esperando votación..."}
+        return {"status": "ok", "message": Message(MSG_JOIN_REQUEST_SENT, team_name=team_name)}
     
     def vote_team_join(self, request, player_name, current_game):
         vote_id = request.get('vote_id')
         vote = request.get('vote')  # 'si' o 'no'
         
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         
         if vote_id not in game.pending_votes:
-            return {"status": "error", "message": "Votación no encontrada"}
+            return {"status": "error", "message": Message(MSG_VOTE_NOT_FOUND)}
         
         vote_data = game.pending_votes[vote_id]
         team_name = vote_data["team_name"]
         
         if team_name not in game.teams:
-            return {"status": "error", "message": "El equipo ya no existe"}
+            return {"status": "error", "message": Message(MSG_TEAM_GONE)}
         
         team = game.teams[team_name]
         
         if player_name not in team.players:
-            return {"status": "error", "message": "No puedes votar en este equipo"}
+            return {"status": "error", "message": Message(MSG_CANNOT_VOTE)}
         
         # Registrar voto
-        vote_data["votes"][player_name] = vote
+        game.cast_join_vote(vote_id, player_name, vote)
+        self.journal_event(EVENT_JOIN_VOTE, current_game, player=vote_id, voter=player_name, vote=vote)
         
         # Verificar si todos han votado
         if len(vote_data["votes"]) >= vote_data["total_needed"]:
@@ -389,8 +1071,14 @@ class GameServer:
             no_votes = len(vote_data["votes"]) - yes_votes
             
             requesting_player = vote_data["player"]
+            # El solicitante pudo abandonar la partida o entrar a otro equipo durante la votación
+            still_eligible = (requesting_player in game.players
+                              and game.get_player_team(requesting_player) is None)
             
-            if yes_votes > no_votes:  # Mayoría gana
+            accepted = yes_votes > no_votes and still_eligible  # Mayoría gana
+            self.journal_event(EVENT_TEAM_JOIN, current_game, player=requesting_player,
+                               team=team_name, accepted=accepted)
+            if accepted:
                 # Log inicio de unión a equipo
                 log_team_join_start(current_game, team_name, requesting_player)
                 
@@ -405,7 +1093,7 @@ class GameServer:
                     self.send_to_player(requesting_player, {
                         "type": "team_join_result",
                         "status": "accepted",
-                        "message": f"¡Has sido aceptado en el equipo '{team_name}'!"
+                        "message": Message(MSG_JOIN_ACCEPTED, team_name=team_name)
                     })
                 
                 # Notificar al equipo
@@ -420,19 +1108,19 @@ class GameServer:
                     self.send_to_player(requesting_player, {
                         "type": "team_join_result",
                         "status": "rejected",
-                        "message": f"Solicitud de unión al equipo '{team_name}' ¡RECHAZADA!"
+                        "message": Message(MSG_JOIN_REJECTED, team_name=team_name)
                     })
             
             # Limpiar votación
-            del game.pending_votes[vote_id]
+            game.close_join_vote(vote_id)
             
-            return {"status": "ok", "message": "Voto registrado. Votación completada."}
+            return {"status": "ok", "message": Message(MSG_VOTE_COMPLETED)}
         else:
-            return {"status": "ok", "message": "Voto registrado. Esperando más votos..."}
+            return {"status": "ok", "message": Message(MSG_VOTE_WAITING)}
     
     def list_teams(self, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         teams_info = []
@@ -440,27 +1128,31 @@ class GameServer:
         for name, team in game.teams.items():
             teams_info.append({
                 "name": name,
-                "players": team.players,
+                "players": list(team.players),
                 "position": team.position
             })
         
         return {"status": "ok", "teams": teams_info}
     
-    def game_status(self, current_game):
+    def game_status(self, current_game, since=None):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         
+        if isinstance(since, int):
+            # Solo lo que cambió desde la versión que ya tiene el cliente
+            return self.changes_response(game, since)
+        
         if not game.started:
             # Mostrar estado de votación para empezar
             total_players = len(game.players)
-            votes_cast = sum(len(team.votes_to_start) for team in game.teams.values())
+            votes_cast = game.votes_cast
             
             return {
                 "status": "ok",
                 "game_status": "waiting",
-                "message": f"Esperando inicio de partida",
+                "message": Message(MSG_WAITING_START),
                 "votes_to_start": f"{votes_cast}/{total_players}",
                 "can_start": game.can_start()
             }
@@ -471,10 +1163,10 @@ class GameServer:
                 positions.append({
                     "team": name,
                     "position": team.position,
-                    "players": team.players
+                    "players": list(team.players)
                 })
             
-            current_team = game.team_names[game.current_turn] if game.team_names else None
+            current_team = game.current_team()
             
             return {
                 "status": "ok",
@@ -485,66 +1177,85 @@ class GameServer:
                 "winner": game.winner
             }
     
+    def changes_response(self, game, since):
+        """Deltas desde 'since' o, si ese punto ya salió del historial, una foto completa"""
+        changes = game.changes_since(since)
+        if changes is None:
+            return {"status": "ok", "version": game.version, "snapshot": game.snapshot()}
+        return {"status": "ok", "version": game.version, "changes": changes}
+    
+    def subscribe(self, request, player_name, current_game):
+        """Suscribe al jugador a los deltas de su partida y lo pone al día"""
+        game = self.games[current_game]
+        since = request.get('since')
+        game.subscribers.add(player_name)
+        if not isinstance(since, int):
+            return {"status": "ok", "version": game.version, "snapshot": game.snapshot()}
+        return self.changes_response(game, since)
+    
+    def unsubscribe(self, player_name, current_game):
+        self.games[current_game].subscribers.discard(player_name)
+        return {"status": "ok"}
+    
     def vote_start(self, player_name, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         
         if game.started:
-            return {"status": "error", "message": "La partida ya ha comenzado"}
+            return {"status": "error", "message": Message(MSG_GAME_ALREADY_STARTED)}
         
         if game.vote_to_start(player_name):
+            self.journal_event(EVENT_VOTE_START, current_game, player=player_name)
             if game.can_start():
                 game.start_game()
                 self.broadcast_to_game(current_game, {
                     "type": "game_started",
-                    "message": "¡La partida ha comenzado!"
+                    "message": Message(MSG_GAME_STARTED)
                 })
-                return {"status": "ok", "message": "¡La partida ha comenzado!"}
+                return {"status": "ok", "message": Message(MSG_GAME_STARTED)}
             else:
-                return {"status": "ok", "message": "Voto registrado. Esperando más votos..."}
+                return {"status": "ok", "message": Message(MSG_VOTE_WAITING)}
         else:
-            return {"status": "error", "message": "No se pudo registrar el voto"}
+            return {"status": "error", "message": Message(MSG_VOTE_FAILED)}
     
     def roll_dice(self, player_name, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         
         if not game.started or game.finished:
-            return {"status": "error", "message": "La partida no está en curso"}
+            return {"status": "error", "message": Message(MSG_GAME_NOT_RUNNING)}
         
         player_team = game.get_player_team(player_name)
         if not player_team:
-            return {"status": "error", "message": "No estás en ningún equipo"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_TEAM)}
         
         current_team_name = game.team_names[game.current_turn]
         if player_team != current_team_name:
-            return {"status": "error", "message": f"No es el turno de tu equipo. Turno actual: {current_team_name}"}
+            return {"status": "error", "message": Message(MSG_NOT_YOUR_TURN, current_team=current_team_name)}
         
         team = game.teams[player_team]
         
         # Verificar si todos los miembros del equipo han jugado
         # (Simplificado: cualquier miembro puede tirar por todo el equipo)
-        total_roll = 0
+        rolls = []
         for team_player in team.players:
             roll = random.randint(game.min_dice, game.max_dice)
-            total_roll += roll
+            rolls.append(roll)
             
             # Log de cada lanzamiento de dado
             log_dice_roll_start(current_game, player_team, team_player, roll)
             log_dice_roll_end(current_game, player_team, team_player, roll)
+        total_roll = sum(rolls)
         
-        # Mover equipo
-        team.position += total_roll
+        # Mover equipo; los dados van a la bitácora para reproducir la tirada
+        finished = game.apply_roll(player_team, rolls)
+        self.journal_event(EVENT_ROLL, current_game, player=player_name, team=player_team, rolls=rolls)
         
-        # Verificar victoria
-        if team.position >= game.board_length:
-            game.finished = True
-            game.winner = player_team
-            
+        if finished:
             # Log de victoria
             log_game_win(current_game, player_team)
             log_game_end(current_game)
@@ -552,20 +1263,17 @@ class GameServer:
             self.broadcast_to_game(current_game, {
                 "type": "game_finished",
                 "winner": player_team,
-                "message": f"¡El equipo {player_team} ha ganado!"
+                "message": Message(MSG_TEAM_WON, team=player_team)
             })
             
             return {
                 "status": "ok",
-                "message": f"¡El equipo {player_team} ha ganado!",
+                "message": Message(MSG_TEAM_WON, team=player_team),
                 "roll": total_roll,
                 "new_position": team.position,
                 "game_finished": True
             }
         
-        # Siguiente turno
-        game.current_turn = (game.current_turn + 1) % len(game.team_names)
-        
         self.broadcast_to_game(current_game, {
             "type": "turn_played",
             "team": player_team,
@@ -573,11 +1281,11 @@ class GameServer:
             "roll": total_roll,
             "new_position": team.position,
             "next_turn": game.team_names[game.current_turn]
-        })
+        }, key=("turn_played", current_game, player_team))
         
         return {
             "status": "ok",
-            "message": f"Equipo avanzó {total_roll} posiciones",
+            "message": Message(MSG_TEAM_ADVANCED, roll=total_roll),
             "roll": total_roll,
             "new_position": team.position,
             "next_turn": game.team_names[game.current_turn]
@@ -585,10 +1293,11 @@ class GameServer:
     
     def leave_game(self, player_name, current_game):
         if not current_game or current_game not in self.games:
-            return {"status": "error", "message": "No estás en ninguna partida"}
+            return {"status": "error", "message": Message(MSG_NOT_IN_GAME)}
         
         game = self.games[current_game]
         game.remove_player(player_name)
+        self.journal_event(EVENT_LEAVE, current_game, player=player_name, close=player_name == game.creator)
         
         # Si era el creador, eliminar la partida
         if player_name == game.creator:
@@ -597,23 +1306,40 @@ class GameServer:
             
             self.broadcast_to_game(current_game, {
                 "type": "game_closed",
-                "message": "La partida ha sido cerrada por el creador"
+                "message": Message(MSG_GAME_CLOSED_BY_CREATOR)
             })
-            del self.games[current_game]
+            game.record_change("closed")
+            game.closed = True
+            with self.games_lock:
+                del self.games[current_game]
+            if self.cluster is not None:
+                self.cluster.release(current_game)
             
-            return {"status": "ok", "message": "Partida cerrada", "current_game": None}
+            return {"status": "ok", "message": Message(MSG_GAME_CLOSED), "current_game": None}
         
-        return {"status": "ok", "message": "Has abandonado la partida", "current_game": None}
+        return {"status": "ok", "message": Message(MSG_GAME_LEFT), "current_game": None}
     
-    def broadcast_to_game(self, game_name, message):
+    def publish_changes(self, game: Game):
+        """Empuja a los suscriptores los deltas aún no publicados (con el lock de la partida)"""
+        if game.published_version == game.version:
+            return
+        changes = game.changes_since(game.published_version)
+        game.published_version = game.version
+        if game.subscribers and changes:
+            self.send_to_players(game.subscribers, {
+                "type": "state_delta",
+                "game": game.name,
+                "changes": changes
+            })
+    
+    def broadcast_to_game(self, game_name, message, key=None):
         if game_name not in self.games:
             return
         
         game = self.games[game_name]
-        for player in game.players:
-            self.send_to_player(player, message)
+        self.send_to_players(game.players, message, key)
     
-    def broadcast_to_team(self, game_name, team_name, message):
+    def broadcast_to_team(self, game_name, team_name, message, key=None):
         if game_name not in self.games:
             return
         
@@ -622,26 +1348,230 @@ class GameServer:
             return
         
         team = game.teams[team_name]
-        for player in team.players:
-            self.send_to_player(player, message)
+        self.send_to_players(team.players, message, key)
     
-    def send_to_player(self, player_name, message):
+    def send_to_player(self, player_name, message, key=None):
         if player_name in self.client_sockets:
+            self.send_to_players((player_name,), message, key)
+    
+    def encode_notification(self, message, codec=JSON_CODEC) -> bytes:
+        """Serializa una notificación una sola vez por formato; la trama se comparte entre destinatarios"""
+        frame = codec.encode({
+            "type": "notification",
+            "data": message
+        })
+        self.broadcast_stats.record_encoded(frame)
+        return frame
+    
+    def send_to_players(self, players, message, key=None):
+        """Encola la notificación en la conexión de cada jugador, serializada una vez por formato"""
+        frames = {}
+        delivered = {}
+        for player_name in players:
+            connection = self.client_sockets.get(player_name)
+            if connection is None:
+                continue
+            codec = connection.codec
+            frame = frames.get(codec.name)
+            if frame is None:
+                frame = frames[codec.name] = self.encode_notification(message, codec)
             try:
-                notification = {
-                    "type": "notification",
-                    "data": message
-                }
-                self.client_sockets[player_name].send((json.dumps(notification)+'\n').encode('utf-8'))
-            except:
+                connection.send(frame, key)
+                delivered[codec.name] = delivered.get(codec.name, 0) + 1
+            except SlowConsumerError:
+                log.warning("⚠️  Cliente lento desconectado: %s", player_name)
+                self.forget_connection(player_name, connection)
+            except ConnectionError:
                 # Cliente desconectado
-                if player_name in self.client_sockets:
-                    del self.client_sockets[player_name]
+                self.forget_connection(player_name, connection)
+        for name, frame in frames.items():
+            self.broadcast_stats.record_sent(frame, delivered.get(name, 0))
+        if frames:
+            self.metrics.record_fanout(sum(delivered.values()))
+    
+    def forget_connection(self, player_name, connection):
+        with self.clients_lock:
+            if self.client_sockets.get(player_name) is connection:
+                del self.client_sockets[player_name]
+
+def negotiate_hello(request) -> dict:
+    """Negocia versión de protocolo y funcionalidades opcionales de la conexión"""
+    version = request.get('version')
+    if not isinstance(version, int) or version < MIN_PROTOCOL_VERSION:
+        return {
+            "status": "error",
+            "message": Message(MSG_PROTOCOL_UNSUPPORTED, min_version=MIN_PROTOCOL_VERSION),
+            "version": PROTOCOL_VERSION
+        }
+    
+    requested = request.get('features') or []
+    if not isinstance(requested, list):
+        requested = []
+    features = sorted(SUPPORTED_FEATURES.intersection(f for f in requested if isinstance(f, str)))
+    version = min(version, PROTOCOL_VERSION)
+    
+    return {
+        "status": "ok",
+        "message": Message(MSG_PROTOCOL_NEGOTIATED, version=version),
+        "version": version,
+        "features": features,
+        # La respuesta sale en JSON; desde la siguiente trama se usa este formato
+        "protocol": PROTOCOL_BINARY if FEATURE_BINARY in features else PROTOCOL_JSON
+    }
+
+def replay_event(games: Dict[str, Game], event: dict):
+    """Aplica un evento de la bitácora; los de partidas desconocidas se ignoran
+
+    Tras una compactación, el segmento nuevo puede empezar con eventos de una
+    partida anteriores a su checkpoint: el checkpoint los reemplaza.
+    """
+    op = event.get('op')
+    game_name = event.get('game')
+    if op == EVENT_CREATE_GAME:
+        games[game_name] = Game(game_name, event['creator'], event['max_teams'],
+                                event['max_players_per_team'], event['board_length'],
+                                event['min_dice'], event['max_dice'])
+        return
+    if op == EVENT_CHECKPOINT:
+        games[game_name] = Game.from_state(event['state'])
+        return
+    
+    game = games.get(game_name)
+    if game is None:
+        return
+    if op == EVENT_JOIN:
+        game.add_player(event['player'])
+    elif op == EVENT_CREATE_TEAM:
+        game.create_team(event['team'], event['player'])
+    elif op == EVENT_JOIN_REQUEST:
+        game.open_join_vote(event['player'], event['team'], event['needed'])
+    elif op == EVENT_JOIN_VOTE:
+        game.cast_join_vote(event['player'], event['voter'], event['vote'])
+    elif op == EVENT_TEAM_JOIN:
+        game.close_join_vote(event['player'])
+        if event['accepted'] and event['team'] in game.teams:
+            game.teams[event['team']].add_player(event['player'])
+    elif op == EVENT_VOTE_START:
+        if game.vote_to_start(event['player']) and game.can_start():
+            game.start_game()
+    elif op == EVENT_ROLL:
+        game.apply_roll(event['team'], event['rolls'])
+    elif op == EVENT_LEAVE:
+        game.remove_player(event['player'])
+        if event.get('close'):
+            game.closed = True
+            del games[game_name]
+
+def replay_journal(events, game_name=None):
+    """Reproduce una secuencia de eventos; devuelve (partidas, eventos aplicados)
+
+    Con 'game_name' solo se reconstruye esa partida.
+    """
+    games: Dict[str, Game] = {}
+    applied = 0
+    for event in events:
+        if not isinstance(event, dict):
+            log.warning("⚠️  Evento inválido en la bitácora: %r", event)
+            continue
+        if game_name is not None and event.get('game') != game_name:
+            continue
+        try:
+            replay_event(games, event)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            # Un evento dañado no impide reconstruir el resto de las partidas
+            log.warning("⚠️  Evento inválido en la bitácora (%s de %s): %s",
+                        event.get('op'), event.get('game'), e)
+            continue
+        applied += 1
+    return games, applied
+
+def raise_fd_limit():
+    """Sube el límite de descriptores abiertos para admitir miles de conexiones"""
+    if resource is None:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = hard if hard != resource.RLIM_INFINITY else 65536
+        if soft != resource.RLIM_INFINITY and soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ValueError, OSError) as e:
+        log.warning("⚠️  No se pudo ampliar el límite de descriptores: %s", e)
 
 if __name__ == "__main__":
-    server = GameServer()
+    parser = argparse.ArgumentParser(description="Servidor del juego de carreras por equipos")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=12345)
+    parser.add_argument('--mode', choices=[MODE_THREADS, MODE_ASYNCIO], default=MODE_THREADS,
+                        help="Hilo por conexión (threads) o event loop único (asyncio)")
+    parser.add_argument('--max-backlog', type=int, default=DEFAULT_MAX_BACKLOG,
+                        help="Notificaciones pendientes máximas por conexión")
+    parser.add_argument('--slow-consumer', choices=SLOW_CONSUMER_POLICIES, default=POLICY_DROP_OLDEST,
+                        help="Política ante clientes lentos")
+    parser.add_argument('--stats-file',
+                        help="Archivo JSONL donde volcar periódicamente las métricas del servidor")
+    parser.add_argument('--stats-interval', type=float, default=DEFAULT_STATS_INTERVAL,
+                        help="Segundos entre volcados de métricas")
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL,
+                        help="Nivel de la consola; DEBUG muestra cada conexión y solicitud")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Procesos trabajadores entre los que se reparten las partidas (0: un solo proceso)")
+    parser.add_argument('--shard-base-port', type=int, default=None,
+                        help="Primer puerto interno de los trabajadores (por defecto, --port + 1)")
+    parser.add_argument('--directory',
+                        help="Dirección host:port del directorio de partidas; activa el modo clúster")
+    parser.add_argument('--node-name', default=None,
+                        help="Nombre del nodo en el clúster (por defecto, host:port)")
+    parser.add_argument('--advertise', default=None,
+                        help="Dirección host:port con la que lo contactan los demás nodos")
+    parser.add_argument('--cluster-pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help="Conexiones internas persistentes hacia cada nodo")
+    parser.add_argument('--snapshot-dir', default=None,
+                        help=f"Guarda periódicamente las partidas en este directorio (p. ej. {DEFAULT_SNAPSHOT_DIR})")
+    parser.add_argument('--snapshot-interval', type=float, default=DEFAULT_SNAPSHOT_INTERVAL,
+                        help="Segundos entre fotos de las partidas que cambiaron")
+    parser.add_argument('--journal-dir', default=None,
+                        help=f"Registra cada evento de las partidas en una bitácora en este directorio (p. ej. {DEFAULT_JOURNAL_DIR})")
+    parser.add_argument('--journal-compact-interval', type=float, default=DEFAULT_COMPACT_INTERVAL,
+                        help="Segundos entre compactaciones de la bitácora")
+    parser.add_argument('--restore', action='store_true',
+                        help="Arranque en caliente: restaura las partidas de --journal-dir o --snapshot-dir")
+    args = parser.parse_args()
+    if args.restore and not (args.snapshot_dir or args.journal_dir):
+        parser.error("--restore requiere --journal-dir o --snapshot-dir")
+    if args.directory and (args.shards > 0 or args.mode != MODE_THREADS):
+        parser.error("--directory requiere --mode threads y no se combina con --shards")
+    setup_logging(args.log_level)
+    
+    if args.shards > 0:
+        from shard_router import run_sharded
+        run_sharded(args.host, args.port, args.shards, args.shard_base_port or args.port + 1,
+                    server_options={"max_backlog": args.max_backlog,
+                                    "slow_consumer_policy": args.slow_consumer,
+                                    "stats_file": args.stats_file,
+                                    "stats_interval": args.stats_interval,
+                                    "snapshot_dir": args.snapshot_dir,
+                                    "snapshot_interval": args.snapshot_interval,
+                                    "restore": args.restore,
+                                    "journal_dir": args.journal_dir,
+                                    "journal_compact_interval": args.journal_compact_interval},
+                    log_level=args.log_level)
+        sys.exit(0)
+    
+    cluster = None
+    if args.directory:
+        address = args.advertise or f"{args.host}:{args.port}"
+        cluster = ClusterNode(args.node_name or address, address, args.directory,
+                              pool_size=args.cluster_pool_size)
+    
+    server = GameServer(host=args.host, port=args.port, mode=args.mode,
+                        max_backlog=args.max_backlog, slow_consumer_policy=args.slow_consumer,
+                        stats_file=args.stats_file, stats_interval=args.stats_interval,
+                        cluster=cluster, snapshot_dir=args.snapshot_dir,
+                        snapshot_interval=args.snapshot_interval, restore=args.restore,
+                        journal_dir=args.journal_dir,
+                        journal_compact_interval=args.journal_compact_interval)
     try:
         server.start()
     except KeyboardInterrupt:
-        print("\n🛑 Cerrando servidor...")
+        log.info("🛑 Cerrando servidor...")
         server.running = False
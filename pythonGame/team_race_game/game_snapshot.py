@@ -0,0 +1,144 @@
+"""
+Fotos del estado de las partidas en disco
+Un hilo guarda cada cierto intervalo las partidas que cambiaron desde la
+última foto (una trama binaria del protocolo por partida, en su propio
+archivo) y borra las que ya no existen. El lock de cada partida solo se toma
+para copiar su estado; la serialización y la escritura ocurren fuera, así que
+las solicitudes siguen atendiéndose mientras se toma la foto.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import quote, unquote
+
+from protocol import BINARY_CODEC, FRAME_HEADER
+from console_log import get_logger
+
+log = get_logger("snapshot")
+
+DEFAULT_SNAPSHOT_DIR = 'snapshots'
+DEFAULT_SNAPSHOT_INTERVAL = 5.0
+SNAPSHOT_EXT = '.snap'
+
+def snapshot_path(directory: str, game_name: str) -> str:
+    # El nombre de la partida lo elige el jugador: se escapa para usarlo como archivo
+    return os.path.join(directory, quote(game_name, safe='') + SNAPSHOT_EXT)
+
+def write_snapshot(path: str, state: dict):
+    """Escribe la foto de forma atómica: un corte a mitad deja la foto anterior"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(BINARY_CODEC.encode(state))
+    os.replace(temp_path, path)
+
+def read_snapshot(path: str) -> Optional[dict]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < FRAME_HEADER.size:
+        return None
+    (length,) = FRAME_HEADER.unpack_from(data)
+    if len(data) != FRAME_HEADER.size + length:
+        return None
+    try:
+        state = BINARY_CODEC.decode(data[FRAME_HEADER.size:])
+    except ValueError:
+        return None
+    return state if isinstance(state, dict) else None
+
+def load_snapshots(directory: str) -> Iterator[dict]:
+    """Estados guardados en el directorio; las fotos dañadas se omiten"""
+    if not os.path.isdir(directory):
+        return
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(SNAPSHOT_EXT):
+            continue
+        path = os.path.join(directory, file_name)
+        try:
+            state = read_snapshot(path)
+        except OSError as e:
+            log.warning("⚠️  No se pudo leer la foto %s: %s", file_name, e)
+            continue
+        if state is None or state.get('name') != unquote(file_name[:-len(SNAPSHOT_EXT)]):
+            log.warning("⚠️  Foto dañada, se omite: %s", file_name)
+            continue
+        yield state
+
+class SnapshotWriter:
+    """Hilo que guarda incrementalmente las partidas cuya versión cambió
+
+    'games' devuelve las partidas actuales y 'capture' copia el estado de una
+    partida (con su lock tomado) o None si ya no debe guardarse.
+    """
+
+    def __init__(self, games: Callable[[], Dict[str, object]],
+                 capture: Callable[[object], Optional[dict]],
+                 directory: str = DEFAULT_SNAPSHOT_DIR,
+                 interval: float = DEFAULT_SNAPSHOT_INTERVAL):
+        self.games = games
+        self.capture = capture
+        self.directory = directory
+        self.interval = interval
+        # Partida -> (objeto, versión) de la última foto escrita; el objeto
+        # distingue una partida nueva que reutiliza el nombre de otra cerrada
+        self.saved: Dict[str, tuple] = {}
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def mark_saved(self, game):
+        """Registra una partida que ya está en disco (restaurada al arrancar)"""
+        self.saved[game.name] = (game, game.version)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1.0)
+        self.snapshot()
+
+    def snapshot(self):
+        """Guarda las partidas cambiadas y borra las desaparecidas; devuelve cuántas escribió"""
+        started = time.perf_counter()
+        games = self.games()
+        written = 0
+        for name, game in games.items():
+            saved = self.saved.get(name)
+            if saved is not None and saved[0] is game and saved[1] == game.version:
+                continue
+            try:
+                state = self.capture(game)
+                if state is None:
+                    continue
+                write_snapshot(snapshot_path(self.directory, name), state)
+            except OSError as e:
+                log.warning("⚠️  No se pudo guardar la foto de %s: %s", name, e)
+                continue
+            except Exception as e:
+                # Una partida que no se puede guardar no detiene el hilo de fotos
+                log.error("❌ Error al guardar la foto de %s: %s", name, e)
+                continue
+            self.saved[name] = (game, state['v'])
+            written += 1
+
+        removed = [name for name in self.saved if name not in games]
+        for name in removed:
+            del self.saved[name]
+            try:
+                os.remove(snapshot_path(self.directory, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("⚠️  No se pudo borrar la foto de %s: %s", name, e)
+
+        if written or removed:
+            log.debug("💾 Foto: %s partidas guardadas, %s borradas en %.1f ms",
+                      written, len(removed), (time.perf_counter() - started) * 1000.0)
+        return written
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.snapshot()
@@ -0,0 +1,93 @@
+"""
+Reproducción fuera de línea de la bitácora de partidas
+Reconstruye las partidas de un directorio de bitácora (--journal-dir del
+servidor) sin red ni hilos, para inspeccionar el estado de una partida,
+reproducir un error paso a paso o medir la lógica del juego por sí sola.
+"""
+import argparse
+import json
+import sys
+import time
+
+from game_journal import read_journal, DEFAULT_JOURNAL_DIR
+from game_server_with_logging import replay_event, replay_journal
+from console_log import setup_logging, LOG_LEVELS
+
+def summarize(game) -> dict:
+    state = game.to_state()
+    return {
+        "name": state["name"],
+        "v": state["v"],
+        "players": len(state["players"]),
+        "started": state["started"],
+        "finished": state["finished"],
+        "winner": state["winner"],
+        "teams": {team["name"]: team["position"] for team in state["teams"]}
+    }
+
+def trace(events, game_name):
+    """Aplica los eventos de a uno mostrando el estado de la partida tras cada uno"""
+    games = {}
+    for number, event in enumerate(events, 1):
+        if event.get('game') != game_name:
+            continue
+        try:
+            replay_event(games, event)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            print(f"#{number:<7} ❌ evento inválido: {e}")
+            continue
+        shown = {key: value for key, value in event.items() if key != 'state'}
+        game = games.get(game_name)
+        print(f"#{number:<7} {json.dumps(shown, ensure_ascii=False)}")
+        print(f"         -> {json.dumps(summarize(game), ensure_ascii=False) if game else 'sin partida'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce la bitácora de partidas fuera de línea")
+    parser.add_argument('journal_dir', nargs='?', default=DEFAULT_JOURNAL_DIR)
+    parser.add_argument('--game', help="Reconstruye solo esta partida")
+    parser.add_argument('--trace', action='store_true',
+                        help="Muestra cada evento de --game con el estado resultante")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Repeticiones de la reproducción para medir eventos por segundo")
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='WARNING')
+    args = parser.parse_args()
+    setup_logging(args.log_level, fmt="%(message)s")
+
+    # La lectura se mide aparte: la reproducción trabaja sobre eventos ya decodificados
+    started = time.perf_counter()
+    events = list(read_journal(args.journal_dir))
+    read_seconds = time.perf_counter() - started
+    if not events:
+        print(f"❌ No hay eventos en {args.journal_dir}")
+        sys.exit(1)
+    print(f"📖 {len(events)} eventos leídos en {read_seconds * 1000.0:.1f} ms")
+
+    if args.trace:
+        if not args.game:
+            parser.error("--trace requiere --game")
+        trace(events, args.game)
+        return
+
+    reference = None
+    elapsed = []
+    for _ in range(max(1, args.repeat)):
+        started = time.perf_counter()
+        games, applied = replay_journal(events, args.game)
+        elapsed.append(time.perf_counter() - started)
+        # Con los dados registrados, cada repetición debe llegar al mismo estado
+        states = {name: game.to_state() for name, game in games.items()}
+        if reference is None:
+            reference = states
+        elif states != reference:
+            print("❌ La reproducción no es determinista: el estado final cambió entre repeticiones")
+            sys.exit(1)
+
+    best = min(elapsed)
+    print(f"⚡ {applied} eventos aplicados: mejor {best * 1000.0:.2f} ms "
+          f"({applied / best if best else 0:.0f} eventos/s) en {len(elapsed)} repeticiones")
+    print(f"🎮 {len(games)} partidas activas al final de la bitácora")
+    for game in games.values():
+        print(f"   {json.dumps(summarize(game), ensure_ascii=False)}")
+
+if __name__ == "__main__":
+    main()
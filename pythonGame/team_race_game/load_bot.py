@@ -0,0 +1,402 @@
+"""
+Generador de carga y benchmark del servidor del juego
+Simula miles de jugadores sin interfaz: cada bot habla el mismo protocolo que
+GameClient ('hello', identificadores de solicitud, JSON o binario) y juega
+partidas completas: crea o se une a la partida, forma equipos con votación,
+vota para iniciar y tira los dados en su turno. Al final informa p50/p99 por
+comando, throughput y tasa de errores, y puede compararlos con una línea base.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from protocol import (
+    CODECS, JSON_CODEC, PROTOCOL_JSON, PROTOCOL_BINARY, PROTOCOL_VERSION,
+    FEATURE_BINARY, FEATURE_REQUEST_IDS
+)
+from game_server_with_logging import raise_fd_limit
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONNECT_CONCURRENCY = 200
+
+class CommandStats:
+    """Latencias y errores de un comando"""
+    __slots__ = ('latencies', 'errors', 'failures')
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0     # Respuestas con status 'error'
+        self.failures = 0   # Timeouts y conexiones caídas
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies) + self.failures
+
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "failures": self.failures,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(max(self.latencies, default=0.0), 3)
+        }
+
+class LoadStats:
+    """Resultados agregados de todos los bots"""
+
+    def __init__(self):
+        self.commands: Dict[str, CommandStats] = {}
+        self.notifications = 0
+        self.games_finished = 0
+        self.games_failed = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def command(self, name: str) -> CommandStats:
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    def report(self) -> dict:
+        duration = (self.finished_at or time.perf_counter()) - self.started_at
+        total = sum(stats.count for stats in self.commands.values())
+        errors = sum(stats.errors + stats.failures for stats in self.commands.values())
+        return {
+            "duration_s": round(duration, 3),
+            "requests": total,
+            "throughput_rps": round(total / duration, 1) if duration > 0 else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "notifications": self.notifications,
+            "games_finished": self.games_finished,
+            "games_failed": self.games_failed,
+            "commands": {name: stats.snapshot() for name, stats in sorted(self.commands.items())}
+        }
+
+class BotClient:
+    """Jugador sin interfaz sobre asyncio; muchos bots comparten un mismo event loop"""
+
+    def __init__(self, name: str, stats: LoadStats, protocol=PROTOCOL_JSON, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.stats = stats
+        self.protocol = protocol
+        self.timeout = timeout
+        self.codec = JSON_CODEC
+        self.framer = JSON_CODEC.new_framer()
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task = None
+        self.request_ids = itertools.count(1)
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.tasks = set()
+        # Estado de la partida conocido por las notificaciones
+        self.team = None
+        self.join_result: Optional[asyncio.Future] = None
+        self.started = asyncio.Event()
+        self.my_turn = asyncio.Event()
+        self.finished = asyncio.Event()
+
+    async def connect(self, host: str, port: int):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.reader_task = asyncio.get_running_loop().create_task(self.read_loop())
+
+        features = [FEATURE_REQUEST_IDS]
+        if self.protocol == PROTOCOL_BINARY:
+            features.append(FEATURE_BINARY)
+        response = await self.request("hello", version=PROTOCOL_VERSION, features=features)
+        if response.get('status') == 'ok' and response.get('protocol', PROTOCOL_JSON) != self.codec.name:
+            codec = CODECS[response['protocol']]
+            leftover = self.framer.buffer
+            self.codec = codec
+            self.framer = codec.new_framer()
+            self.framer.buffer += leftover
+
+        await self.request("set_player_name", name=self.name)
+
+    async def request(self, command: str, **fields) -> dict:
+        """Envía un comando, espera su respuesta y registra la latencia"""
+        stats = self.stats.command(command)
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        fields["command"] = command
+        fields["id"] = request_id
+
+        started = time.perf_counter()
+        try:
+            self.writer.write(self.codec.encode(fields))
+            response = await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            self.pending.pop(request_id, None)
+            stats.failures += 1
+            raise
+        stats.latencies.append((time.perf_counter() - started) * 1000.0)
+        if response.get('status') != 'ok':
+            stats.errors += 1
+        return response
+
+    async def read_loop(self):
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                for frame in self.framer.feed(data):
+                    message = self.codec.decode(frame)
+                    if message.get('type') == 'notification':
+                        self.handle_notification(message.get('data', {}))
+                        continue
+                    future = self.pending.pop(message.get('id'), None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Conexión cerrada"))
+            self.pending.clear()
+            self.finished.set()
+
+    def handle_notification(self, data: dict):
+        self.stats.notifications += 1
+        msg_type = data.get('type')
+        if msg_type == 'vote_request':
+            # Los miembros del equipo aceptan a todo el que pide unirse
+            self.spawn(self.request("vote_team_join", vote_id=data['vote_id'], vote="si"))
+        elif msg_type == 'team_join_result':
+            if self.join_result is not None and not self.join_result.done():
+                self.join_result.set_result(data.get('status') == 'accepted')
+        elif msg_type == 'game_started':
+            self.started.set()
+        elif msg_type == 'turn_played':
+            if data.get('next_turn') == self.team:
+                self.my_turn.set()
+        elif msg_type in ('game_finished', 'game_closed'):
+            self.finished.set()
+            self.my_turn.set()
+
+    def spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # Ya contabilizado como fallo del comando
+
+    def reset_game(self):
+        self.team = None
+        self.join_result = None
+        self.started = asyncio.Event()
+        self.my_turn = asyncio.Event()
+        self.finished = asyncio.Event()
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except asyncio.CancelledError:
+                pass
+
+class LoadScenario:
+    """Parámetros de las partidas que juegan los bots"""
+
+    def __init__(self, args):
+        self.teams = args.teams
+        self.players_per_team = args.players_per_team
+        self.board_length = args.board_length
+        self.min_dice = args.min_dice
+        self.max_dice = args.max_dice
+        self.think_time = args.think_time
+        self.status_interval = args.status_interval
+        self.rounds = args.rounds
+
+    @property
+    def players_per_game(self) -> int:
+        return self.teams * self.players_per_team
+
+async def jittered_sleep(seconds: float):
+    if seconds > 0:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * seconds)
+
+async def form_team(members: List[BotClient], team_name: str):
+    """El capitán crea el equipo y el resto entra de a uno pasando por la votación"""
+    captain = members[0]
+    await captain.request("create_team", team_name=team_name)
+    for member in members:
+        member.team = team_name
+    for member in members[1:]:
+        member.join_result = asyncio.get_running_loop().create_future()
+        response = await member.request("join_team", team_name=team_name)
+        if response.get('status') != 'ok':
+            raise RuntimeError(f"{member.name} no pudo pedir unirse a {team_name}")
+        if not await asyncio.wait_for(member.join_result, member.timeout):
+            raise RuntimeError(f"{member.name} fue rechazado en {team_name}")
+
+async def play(bot: BotClient, captain: bool, scenario: LoadScenario):
+    """El capitán tira en cada turno de su equipo; el resto consulta el estado"""
+    if captain:
+        response = await bot.request("game_status")
+        if response.get('current_turn') == bot.team:
+            bot.my_turn.set()
+        while not bot.finished.is_set():
+            await bot.my_turn.wait()
+            bot.my_turn.clear()
+            if bot.finished.is_set():
+                break
+            await jittered_sleep(scenario.think_time)
+            response = await bot.request("roll_dice")
+            if response.get('game_finished'):
+                break
+    elif scenario.status_interval > 0:
+        while not bot.finished.is_set():
+            await jittered_sleep(scenario.status_interval)
+            if not bot.finished.is_set():
+                await bot.request("game_status")
+
+async def run_game(bots: List[BotClient], game_name: str, scenario: LoadScenario):
+    """Juega una partida completa de principio a fin con un grupo de bots"""
+    for bot in bots:
+        bot.reset_game()
+    creator = bots[0]
+    response = await creator.request(
+        "create_game", game_name=game_name, max_teams=scenario.teams,
+        max_players_per_team=scenario.players_per_team, board_length=scenario.board_length,
+        min_dice=scenario.min_dice, max_dice=scenario.max_dice
+    )
+    if response.get('status') != 'ok':
+        raise RuntimeError(f"No se pudo crear {game_name}")
+    await asyncio.gather(*(bot.request("join_game", game_name=game_name) for bot in bots[1:]))
+
+    size = scenario.players_per_team
+    teams = [bots[i:i + size] for i in range(0, len(bots), size)]
+    await asyncio.gather(*(form_team(members, f"equipo{index + 1}") for index, members in enumerate(teams)))
+
+    await asyncio.gather(*(bot.request("vote_start") for bot in bots))
+    await asyncio.gather(*(asyncio.wait_for(bot.started.wait(), bot.timeout) for bot in bots))
+
+    await asyncio.gather(*(play(bot, bot is members[0], scenario)
+                           for members in teams for bot in members))
+
+    # El creador sale al final: su salida cierra la partida
+    await asyncio.gather(*(bot.request("leave_game") for bot in bots[1:]))
+    await creator.request("leave_game")
+
+async def run_group(bots: List[BotClient], group: int, run_id: str, scenario: LoadScenario):
+    for round_number in range(scenario.rounds):
+        try:
+            await run_game(bots, f"bench-{run_id}-{group}-{round_number}", scenario)
+            bots[0].stats.games_finished += 1
+        except (RuntimeError, asyncio.TimeoutError, ConnectionError, OSError) as e:
+            bots[0].stats.games_failed += 1
+            print(f"⚠️  Partida {group}/{round_number} falló: {e!r}", file=sys.stderr)
+            return
+
+async def run_load(args) -> dict:
+    scenario = LoadScenario(args)
+    stats = LoadStats()
+    run_id = args.run_id or f"{int(time.time()) % 100000}"
+    bots = [BotClient(f"bot-{run_id}-{index}", stats, args.protocol, args.timeout)
+            for index in range(args.games * scenario.players_per_game)]
+
+    # Conexiones escalonadas para no desbordar el backlog del servidor
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    async def connect(bot):
+        async with semaphore:
+            await bot.connect(args.host, args.port)
+    print(f"🔌 Conectando {len(bots)} bots a {args.host}:{args.port} ({args.protocol})...")
+    await asyncio.gather(*(connect(bot) for bot in bots))
+
+    print(f"🎲 Jugando {args.games} partidas x {scenario.rounds} rondas...")
+    stats.started_at = time.perf_counter()
+    size = scenario.players_per_game
+    await asyncio.gather(*(run_group(bots[i:i + size], i // size, run_id, scenario)
+                           for i in range(0, len(bots), size)))
+    stats.finished_at = time.perf_counter()
+
+    await asyncio.gather(*(bot.close() for bot in bots))
+    return stats.report()
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    print()
+    print(f"{'comando':<18}{'n':>9}{'errores':>9}{'fallos':>8}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for name, command in report["commands"].items():
+        line = (f"{name:<18}{command['count']:>9}{command['errors']:>9}{command['failures']:>8}"
+                f"{command['p50_ms']:>10.2f}{command['p99_ms']:>10.2f}{command['max_ms']:>10.2f}")
+        previous = (baseline or {}).get("commands", {}).get(name)
+        if previous:
+            line += f"   p50 {_change(previous['p50_ms'], command['p50_ms'])} p99 {_change(previous['p99_ms'], command['p99_ms'])}"
+        print(line)
+    print()
+    print(f"📊 {report['requests']} solicitudes en {report['duration_s']} s "
+          f"-> {report['throughput_rps']} req/s, errores {report['error_rate']:.2%}, "
+          f"{report['notifications']} notificaciones")
+    print(f"🏁 Partidas completadas: {report['games_finished']}, fallidas: {report['games_failed']}")
+    if baseline:
+        print(f"📏 Línea base: {baseline['throughput_rps']} req/s "
+              f"({_change(baseline['throughput_rps'], report['throughput_rps'])})")
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before:+.1%}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generador de carga para el servidor del juego")
+    parser.add_argument('host', nargs='?', default='localhost')
+    parser.add_argument('--port', type=int, default=12345)
+    parser.add_argument('--protocol', choices=[PROTOCOL_JSON, PROTOCOL_BINARY], default=PROTOCOL_JSON)
+    parser.add_argument('--games', type=int, default=10, help="Partidas simultáneas")
+    parser.add_argument('--rounds', type=int, default=1, help="Partidas seguidas por grupo de bots")
+    parser.add_argument('--teams', type=int, default=2, help="Equipos por partida")
+    parser.add_argument('--players-per-team', type=int, default=2)
+    parser.add_argument('--board-length', type=int, default=100)
+    parser.add_argument('--min-dice', type=int, default=1)
+    parser.add_argument('--max-dice', type=int, default=6)
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help="Segundos promedio antes de tirar los dados en el turno propio")
+    parser.add_argument('--status-interval', type=float, default=1.0,
+                        help="Segundos promedio entre consultas de estado (0 las desactiva)")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--connect-concurrency', type=int, default=DEFAULT_CONNECT_CONCURRENCY)
+    parser.add_argument('--run-id', help="Sufijo de nombres de bots y partidas (por defecto, aleatorio)")
+    parser.add_argument('--seed', type=int, help="Semilla para los tiempos de espera")
+    parser.add_argument('--output', help="Guarda el reporte en JSON (sirve como línea base)")
+    parser.add_argument('--baseline', help="Reporte JSON previo contra el que comparar")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    raise_fd_limit()
+
+    report = asyncio.run(run_load(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Reporte guardado en {args.output}")
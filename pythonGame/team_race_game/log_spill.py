@@ -0,0 +1,205 @@
+"""
+Cola de logs pendientes respaldada en disco
+Los registros que no se pudieron enviar al proxy RMI se escriben antes que
+nada en segmentos JSONL de solo escritura al final, cada uno con un número
+de secuencia. Un archivo de confirmación guarda la última secuencia aceptada
+por el proxy: tras una caída se reanuda desde ahí, sin perder registros y
+sin reenviar los ya confirmados.
+"""
+import json
+import os
+import threading
+from typing import Iterator, List, Tuple
+
+DEFAULT_SPILL_DIR = "local_logs_spill"
+DEFAULT_SEGMENT_RECORDS = 10000
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+ACK_FILE = "ack"
+
+class SpillQueue:
+    """Cola FIFO de registros en disco con confirmación por número de secuencia
+
+    Cada segmento se llama segment-<primera secuencia>.jsonl y contiene una
+    línea {"seq": n, "record": {...}} por registro. En memoria solo se guardan
+    los límites de los segmentos, así que su uso no crece con el atraso.
+    """
+
+    def __init__(self, directory: str = DEFAULT_SPILL_DIR,
+                 segment_records: int = DEFAULT_SEGMENT_RECORDS, fsync: bool = True):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.segments: List[int] = []
+        self.last_seq = 0
+        self.acked_seq = 0
+        self.current = None
+        self.current_count = 0
+        self._load()
+
+    def pending(self) -> int:
+        """Cantidad de registros aún no confirmados por el proxy"""
+        with self.lock:
+            return self.last_seq - self.acked_seq
+
+    def append(self, records: list) -> int:
+        """Escribe los registros al final del segmento activo en una sola escritura"""
+        if not records:
+            return self.last_seq
+        with self.lock:
+            index = 0
+            while index < len(records):
+                if self.current is None or self.current_count >= self.segment_records:
+                    self._open_segment(self.last_seq + 1)
+                chunk = records[index:index + self.segment_records - self.current_count]
+                lines = []
+                for record in chunk:
+                    self.last_seq += 1
+                    lines.append(json.dumps({"seq": self.last_seq, "record": record}, ensure_ascii=False))
+                self.current.write('\n'.join(lines) + '\n')
+                self.current.flush()
+                if self.fsync:
+                    os.fsync(self.current.fileno())
+                self.current_count += len(chunk)
+                index += len(chunk)
+            return self.last_seq
+
+    def read_batches(self, batch_size: int) -> Iterator[Tuple[int, list]]:
+        """Recorre los registros pendientes en lotes de (última secuencia, registros)
+
+        Solo se leen los registros escritos hasta el momento de la llamada; los
+        que se agreguen después quedan para la siguiente pasada.
+        """
+        with self.lock:
+            segments = list(self.segments)
+            start_seq = self.acked_seq
+            end_seq = self.last_seq
+
+        batch = []
+        last = start_seq
+        for first in segments:
+            if first > end_seq:
+                break
+            try:
+                with open(self._segment_path(first), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.endswith('\n'):
+                            break  # Línea incompleta de una escritura interrumpida
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        seq = entry.get("seq", 0)
+                        if seq <= start_seq or seq <= last:
+                            continue
+                        if seq > end_seq:
+                            break
+                        batch.append(entry.get("record"))
+                        last = seq
+                        if len(batch) >= batch_size:
+                            yield last, batch
+                            batch = []
+            except FileNotFoundError:
+                continue  # Segmento ya confirmado y eliminado
+        if batch or last < end_seq:
+            # Un lote vacío indica que el resto de secuencias no se pudo leer
+            yield end_seq, batch
+
+    def ack(self, seq: int):
+        """Marca como confirmados todos los registros hasta 'seq' inclusive"""
+        with self.lock:
+            if seq <= self.acked_seq:
+                return
+            self.acked_seq = min(seq, self.last_seq)
+            self._write_ack()
+            self._purge_segments()
+
+    def sync(self):
+        """Fuerza a disco el segmento activo"""
+        with self.lock:
+            if self.current is not None:
+                self.current.flush()
+                os.fsync(self.current.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.current is not None:
+                self.current.close()
+                self.current = None
+
+    def _segment_path(self, first: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{first:012d}{SEGMENT_SUFFIX}")
+
+    def _open_segment(self, first: int):
+        if self.current is not None:
+            self.current.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._segment_path(first)
+        self.current = open(path, 'a', encoding='utf-8')
+        if os.path.getsize(path) > 0:
+            # Cierra una posible línea incompleta antes de seguir escribiendo
+            self.current.write('\n')
+        self.current_count = 0
+        if not self.segments or self.segments[-1] != first:
+            self.segments.append(first)
+
+    def _write_ack(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, ACK_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(self.acked_seq))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _purge_segments(self):
+        """Elimina los segmentos cuyos registros ya fueron todos confirmados"""
+        while self.segments:
+            first = self.segments[0]
+            is_active = len(self.segments) == 1
+            last_in_segment = self.last_seq if is_active else self.segments[1] - 1
+            if last_in_segment > self.acked_seq:
+                return
+            if is_active and self.current is not None:
+                self.current.close()
+                self.current = None
+            try:
+                os.remove(self._segment_path(first))
+            except FileNotFoundError:
+                pass
+            self.segments.pop(0)
+
+    def _load(self):
+        """Recupera segmentos y confirmación de una ejecución anterior"""
+        if not os.path.isdir(self.directory):
+            return
+        try:
+            with open(os.path.join(self.directory, ACK_FILE), 'r', encoding='utf-8') as f:
+                self.acked_seq = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            self.acked_seq = 0
+
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    self.segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        self.segments.sort()
+
+        self.last_seq = self.acked_seq
+        if self.segments:
+            with open(self._segment_path(self.segments[-1]), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    try:
+                        self.last_seq = max(self.last_seq, json.loads(line).get("seq", 0))
+                    except ValueError:
+                        continue
+        # Las escrituras nuevas siempre van a un segmento nuevo
+        self._purge_segments()
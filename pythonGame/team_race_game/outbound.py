@@ -0,0 +1,228 @@
+"""
+Colas de salida por conexión para el servidor del juego
+Las notificaciones se encolan sin bloquear al hilo que las genera y un
+escritor dedicado (hilo o tarea de asyncio) las envía al cliente
+"""
+import asyncio
+import socket
+import threading
+from collections import deque
+from typing import List, Optional
+
+from protocol import JSON_CODEC
+
+# Políticas ante un cliente lento que no consume sus notificaciones
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_COALESCE = 'coalesce'
+POLICY_DISCONNECT = 'disconnect'
+SLOW_CONSUMER_POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT)
+
+# Cantidad máxima de tramas pendientes por conexión
+DEFAULT_MAX_BACKLOG = 256
+
+class SlowConsumerError(ConnectionError):
+    """El cliente superó el backlog permitido con la política 'disconnect'"""
+
+class OutboundQueue:
+    """Cola acotada de tramas pendientes de envío
+
+    Cada entrada es (trama, clave, descartable). Las respuestas a solicitudes
+    no son descartables; las notificaciones sí, y al superar el backlog se
+    aplica la política configurada:
+      - drop_oldest: se descarta la notificación más antigua
+      - coalesce: la nueva reemplaza a una pendiente con la misma clave
+        (o se descarta la más antigua si no hay ninguna)
+      - disconnect: se desconecta al cliente
+    """
+    __slots__ = ('entries', 'max_backlog', 'policy', 'dropped')
+
+    def __init__(self, max_backlog: int = DEFAULT_MAX_BACKLOG, policy: str = POLICY_DROP_OLDEST):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Política desconocida: {policy}")
+        self.entries = deque()
+        self.max_backlog = max_backlog
+        self.policy = policy
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, frame: bytes, key=None, droppable: bool = True):
+        if droppable and len(self.entries) >= self.max_backlog:
+            if self.policy == POLICY_DISCONNECT:
+                raise SlowConsumerError("Cliente lento: backlog de salida lleno")
+            if self.policy == POLICY_COALESCE and key is not None and self._replace(frame, key):
+                self.dropped += 1
+                return
+            self._drop_oldest()
+        self.entries.append((frame, key, droppable))
+
+    def pop_all(self) -> List[bytes]:
+        frames = [entry[0] for entry in self.entries]
+        self.entries.clear()
+        return frames
+
+    def _replace(self, frame: bytes, key) -> bool:
+        for index in range(len(self.entries) - 1, -1, -1):
+            if self.entries[index][1] == key:
+                self.entries[index] = (frame, key, True)
+                return True
+        return False
+
+    def _drop_oldest(self):
+        for index, entry in enumerate(self.entries):
+            if entry[2]:
+                del self.entries[index]
+                self.dropped += 1
+                return
+
+class BroadcastStats:
+    """Contadores de bytes serializados frente a bytes enviados en notificaciones
+
+    Con serialización única por difusión, bytes_sent / bytes_encoded es el
+    número medio de destinatarios que comparten cada trama.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    def record_encoded(self, frame: bytes):
+        with self.lock:
+            self.frames_encoded += 1
+            self.bytes_encoded += len(frame)
+
+    def record_sent(self, frame: bytes, recipients: int = 1):
+        with self.lock:
+            self.frames_sent += recipients
+            self.bytes_sent += len(frame) * recipients
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "frames_encoded": self.frames_encoded,
+                "bytes_encoded": self.bytes_encoded,
+                "frames_sent": self.frames_sent,
+                "bytes_sent": self.bytes_sent,
+                "fanout": round(self.bytes_sent / self.bytes_encoded, 2) if self.bytes_encoded else 0.0
+            }
+
+class ThreadedClientConnection:
+    """Conexión de un cliente atendida por un hilo escritor propio"""
+
+    def __init__(self, sock: socket.socket, max_backlog: int = DEFAULT_MAX_BACKLOG,
+                 policy: str = POLICY_DROP_OLDEST):
+        self.sock = sock
+        # Formato de las tramas de esta conexión (se negocia por conexión)
+        self.codec = JSON_CODEC
+        self.queue = OutboundQueue(max_backlog, policy)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def send(self, data: bytes, key=None, droppable: bool = True) -> int:
+        """Encola una trama sin bloquear (salvo contrapresión sobre respuestas)"""
+        with self.condition:
+            if self.closed:
+                raise ConnectionError("Conexión cerrada")
+            if not droppable:
+                # Contrapresión: el propio hilo del cliente espera a su escritor
+                while len(self.queue) >= self.queue.max_backlog and not self.closed:
+                    self.condition.wait()
+            try:
+                self.queue.push(data, key, droppable)
+            except SlowConsumerError:
+                self._abort()
+                raise
+            self.condition.notify_all()
+        return len(data)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def _abort(self):
+        # Despierta al hilo lector para que limpie la sesión
+        self.closed = True
+        self.condition.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _writer_loop(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                frames = self.queue.pop_all()
+                self.condition.notify_all()
+            try:
+                self.sock.sendall(b''.join(frames))
+            except OSError:
+                with self.condition:
+                    self._abort()
+                return
+
+class AsyncClientConnection:
+    """Conexión de un cliente en modo asyncio con una tarea escritora propia"""
+
+    def __init__(self, writer: asyncio.StreamWriter, max_backlog: int = DEFAULT_MAX_BACKLOG,
+                 policy: str = POLICY_DROP_OLDEST):
+        self.writer = writer
+        self.codec = JSON_CODEC
+        self.queue = OutboundQueue(max_backlog, policy)
+        self.ready = asyncio.Event()
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.closed = False
+        self.writer_task: Optional[asyncio.Task] = asyncio.get_running_loop().create_task(self._writer_loop())
+
+    def send(self, data: bytes, key=None, droppable: bool = True) -> int:
+        """Encola una trama; debe llamarse desde el hilo del event loop"""
+        if self.closed or self.writer.is_closing():
+            raise ConnectionError("Conexión cerrada")
+        try:
+            self.queue.push(data, key, droppable)
+        except SlowConsumerError:
+            self._abort()
+            raise
+        if len(self.queue) >= self.queue.max_backlog:
+            self.writable.clear()
+        self.ready.set()
+        return len(data)
+
+    async def wait_writable(self):
+        """Contrapresión para el lector: espera a que baje el backlog"""
+        await self.writable.wait()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+        self.writable.set()
+
+    def _abort(self):
+        self.close()
+        self.writer.transport.abort()
+
+    async def _writer_loop(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                if self.closed:
+                    return
+                frames = self.queue.pop_all()
+                self.writable.set()
+                if frames:
+                    self.writer.write(b''.join(frames))
+                    await self.writer.drain()
+        except ConnectionError:
+            self._abort()
@@ -0,0 +1,499 @@
+"""
+Protocolo de comunicación cliente-servidor del juego
+Framing de mensajes JSON delimitados por salto de línea y, opcionalmente,
+tramas binarias con prefijo de longitud y códigos numéricos
+"""
+import json
+import struct
+from typing import List
+
+# Tamaño máximo de una trama antes de considerar la conexión inválida
+MAX_FRAME_SIZE = 64 * 1024
+# Anidamiento máximo de listas y mapas en una trama binaria (el estado más hondo usa 5)
+MAX_NESTING = 32
+
+class FrameTooLarge(ValueError):
+    """La trama recibida supera el tamaño máximo permitido"""
+
+class LineFramer:
+    """Separa un flujo de bytes en tramas delimitadas por '\\n'
+
+    Mantiene un buffer persistente por conexión: las tramas partidas entre
+    varias lecturas se completan y varias tramas llegadas en una misma
+    lectura se devuelven juntas.
+    """
+    __slots__ = ('buffer', 'max_frame_size')
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Agrega datos recibidos y devuelve todas las tramas completas"""
+        self.buffer += data
+        if b'\n' not in data:
+            if len(self.buffer) > self.max_frame_size:
+                raise FrameTooLarge(f"Trama de más de {self.max_frame_size} bytes")
+            return []
+
+        end = self.buffer.rfind(b'\n')
+        chunk = bytes(self.buffer[:end])
+        del self.buffer[:end + 1]
+        if len(self.buffer) > self.max_frame_size:
+            raise FrameTooLarge(f"Trama de más de {self.max_frame_size} bytes")
+        return [frame for frame in chunk.split(b'\n') if frame.strip()]
+
+def encode_json_frame(message: dict) -> bytes:
+    """Serializa un mensaje como trama JSON terminada en '\\n'"""
+    return (json.dumps(message) + '\n').encode('utf-8')
+
+# ---------------------------------------------------------------------------
+# Protocolo binario opcional
+#
+# Trama: longitud (uint32 big-endian) + tipo de mensaje (1 byte) + cuerpo.
+# Los comandos, tipos de notificación, claves frecuentes y mensajes al usuario
+# viajan como códigos numéricos; el texto se arma del lado del cliente.
+# ---------------------------------------------------------------------------
+
+PROTOCOL_JSON = 'json'
+PROTOCOL_BINARY = 'binary'
+
+# Versión del protocolo y funcionalidades opcionales negociadas con 'hello'.
+# Una conexión que no envía 'hello' queda en la versión 0: JSON y ninguna
+# funcionalidad opcional.
+PROTOCOL_VERSION = 1
+MIN_PROTOCOL_VERSION = 1
+FEATURE_BINARY = 'binary'
+FEATURE_DELTAS = 'deltas'
+FEATURE_REQUEST_IDS = 'request_ids'
+SUPPORTED_FEATURES = frozenset({FEATURE_BINARY, FEATURE_DELTAS, FEATURE_REQUEST_IDS})
+
+FRAME_HEADER = struct.Struct('>I')
+
+# Tipos de mensaje
+KIND_REQUEST = 1
+KIND_RESPONSE = 2
+KIND_RESPONSE_OK = 3
+KIND_RESPONSE_ERROR = 4
+KIND_NOTIFICATION = 5
+
+# Etiquetas de valores
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_STR = 4
+TAG_LIST = 5
+TAG_MAP = 6
+TAG_MESSAGE = 7
+TAG_FLOAT = 8
+
+COMMAND_CODES = {
+    'set_player_name': 1, 'create_game': 2, 'join_game': 3, 'list_games': 4,
+    'create_team': 5, 'join_team': 6, 'list_teams': 7, 'game_status': 8,
+    'vote_start': 9, 'roll_dice': 10, 'leave_game': 11, 'vote_team_join': 12,
+    'broadcast_stats': 13, 'hello': 14, 'subscribe': 15, 'unsubscribe': 16,
+    'server_stats': 17, 'relay': 18, 'relay_close': 19
+}
+
+NOTIFICATION_CODES = {
+    'team_created': 1, 'vote_request': 2, 'team_join_result': 3, 'team_member_added': 4,
+    'game_started': 5, 'turn_played': 6, 'game_finished': 7, 'game_closed': 8,
+    'state_delta': 9
+}
+
+# Claves frecuentes; el resto viaja como texto
+KEY_CODES = {key: code for code, key in enumerate((
+    'status', 'message', 'command', 'name', 'game_name', 'max_teams',
+    'max_players_per_team', 'board_length', 'min_dice', 'max_dice', 'team_name',
+    'vote_id', 'vote', 'player_name', 'current_game', 'games', 'teams', 'players',
+    'creator', 'started', 'finished', 'position', 'positions', 'team', 'game_status',
+    'votes_to_start', 'can_start', 'current_turn', 'winner', 'roll', 'new_position',
+    'next_turn', 'game_finished', 'type', 'data', 'player', 'player_requesting',
+    'protocol', 'broadcast_stats', 'version', 'features', 'v', 'op', 'since',
+    'changes', 'snapshot', 'game', 'votes', 'id', 'server_stats'
+), start=1)}
+
+# Mensajes al usuario: código -> plantilla
+MSG_INVALID_JSON = 1
+MSG_NOT_IN_GAME = 2
+MSG_UNKNOWN_COMMAND = 3
+MSG_GAME_EXISTS = 4
+MSG_GAME_CREATED = 5
+MSG_GAME_NOT_FOUND = 6
+MSG_GAME_ALREADY_STARTED = 7
+MSG_GAME_JOINED = 8
+MSG_TEAM_CREATED = 9
+MSG_TEAM_NOT_CREATED = 10
+MSG_TEAM_NOT_FOUND = 11
+MSG_TEAM_FULL = 12
+MSG_ALREADY_IN_TEAM = 13
+MSG_JOIN_VOTE_REQUEST = 14
+MSG_JOIN_REQUEST_SENT = 15
+MSG_VOTE_NOT_FOUND = 16
+MSG_TEAM_GONE = 17
+MSG_CANNOT_VOTE = 18
+MSG_JOIN_ACCEPTED = 19
+MSG_JOIN_REJECTED = 20
+MSG_VOTE_COMPLETED = 21
+MSG_VOTE_WAITING = 22
+MSG_WAITING_START = 23
+MSG_GAME_STARTED = 24
+MSG_VOTE_FAILED = 25
+MSG_GAME_NOT_RUNNING = 26
+MSG_NOT_IN_TEAM = 27
+MSG_NOT_YOUR_TURN = 28
+MSG_TEAM_WON = 29
+MSG_TEAM_ADVANCED = 30
+MSG_GAME_CLOSED_BY_CREATOR = 31
+MSG_GAME_CLOSED = 32
+MSG_GAME_LEFT = 33
+MSG_PROTOCOL_UNSUPPORTED = 34
+MSG_PROTOCOL_NEGOTIATED = 35
+MSG_INVALID_FRAME = 36
+MSG_CLUSTER_UNAVAILABLE = 37
+MSG_GAME_RESUMED = 38
+
+MESSAGES = {
+    MSG_INVALID_JSON: "Formato JSON inválido",
+    MSG_NOT_IN_GAME: "No estás en ninguna partida",
+    MSG_UNKNOWN_COMMAND: "Comando no reconocido",
+    MSG_GAME_EXISTS: "Ya existe una partida con ese nombre",
+    MSG_GAME_CREATED: "Partida '{game_name}' creada exitosamente",
+    MSG_GAME_NOT_FOUND: "La partida no existe",
+    MSG_GAME_ALREADY_STARTED: "La partida ya ha comenzado",
+    MSG_GAME_JOINED: "Te has unido a la partida '{game_name}'",
+    MSG_TEAM_CREATED: "Equipo '{team_name}' creado exitosamente",
+    MSG_TEAM_NOT_CREATED: "No se pudo crear el equipo",
+    MSG_TEAM_NOT_FOUND: "El equipo no existe",
+    MSG_TEAM_FULL: "El equipo está lleno",
+    MSG_ALREADY_IN_TEAM: "Ya estás en un equipo",
+    MSG_JOIN_VOTE_REQUEST: "{player_name} quiere unirse al equipo {team_name}. Vota 'si' o 'no'",
+    MSG_JOIN_REQUEST_SENT: "Solicitud enviada al equipo '{team_name}'. Esperando votación...",
+    MSG_VOTE_NOT_FOUND: "Votación no encontrada",
+    MSG_TEAM_GONE: "El equipo ya no existe",
+    MSG_CANNOT_VOTE: "No puedes votar en este equipo",
+    MSG_JOIN_ACCEPTED: "¡Has sido aceptado en el equipo '{team_name}'!",
+    MSG_JOIN_REJECTED: "Solicitud de unión al equipo '{team_name}' ¡RECHAZADA!",
+    MSG_VOTE_COMPLETED: "Voto registrado. Votación completada.",
+    MSG_VOTE_WAITING: "Voto registrado. Esperando más votos...",
+    MSG_WAITING_START: "Esperando inicio de partida",
+    MSG_GAME_STARTED: "¡La partida ha comenzado!",
+    MSG_VOTE_FAILED: "No se pudo registrar el voto",
+    MSG_GAME_NOT_RUNNING: "La partida no está en curso",
+    MSG_NOT_IN_TEAM: "No estás en ningún equipo",
+    MSG_NOT_YOUR_TURN: "No es el turno de tu equipo. Turno actual: {current_team}",
+    MSG_TEAM_WON: "¡El equipo {team} ha ganado!",
+    MSG_TEAM_ADVANCED: "Equipo avanzó {roll} posiciones",
+    MSG_GAME_CLOSED_BY_CREATOR: "La partida ha sido cerrada por el creador",
+    MSG_GAME_CLOSED: "Partida cerrada",
+    MSG_GAME_LEFT: "Has abandonado la partida",
+    MSG_PROTOCOL_UNSUPPORTED: "Versión de protocolo no soportada (mínima: {min_version})",
+    MSG_PROTOCOL_NEGOTIATED: "Protocolo v{version} negociado",
+    MSG_INVALID_FRAME: "Formato de mensaje inválido",
+    MSG_CLUSTER_UNAVAILABLE: "El clúster no está disponible, intenta de nuevo",
+    MSG_GAME_RESUMED: "Has vuelto a la partida '{game_name}'"
+}
+_KEY_BYTES = {}
+
+class Message(str):
+    """Texto para el usuario que recuerda su código y parámetros
+
+    En JSON se serializa como un string normal; en binario viaja solo el
+    código con sus parámetros y el cliente vuelve a armar el texto.
+    """
+    __slots__ = ('code', 'args')
+
+    def __new__(cls, code: int, **args):
+        template = MESSAGES[code]
+        message = super().__new__(cls, template.format(**args) if args else template)
+        message.code = code
+        message.args = args
+        return message
+
+    @classmethod
+    def from_code(cls, code: int, args: dict) -> str:
+        if code not in MESSAGES:
+            return f"[mensaje {code}]"
+        try:
+            return cls(code, **args)
+        except (KeyError, IndexError, ValueError):
+            return MESSAGES[code]
+
+class BinaryFramer:
+    """Separa un flujo de bytes en tramas con prefijo de longitud"""
+    __slots__ = ('buffer', 'max_frame_size')
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Agrega datos recibidos y devuelve el cuerpo de todas las tramas completas"""
+        self.buffer += data
+        frames = []
+        offset = 0
+        buffer = self.buffer
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+            if length > self.max_frame_size:
+                raise FrameTooLarge(f"Trama de más de {self.max_frame_size} bytes")
+            end = offset + FRAME_HEADER.size + length
+            if end > len(buffer):
+                break
+            frames.append(bytes(buffer[offset + FRAME_HEADER.size:end]))
+            offset = end
+        if offset:
+            del buffer[:offset]
+        return frames
+
+# Codificaciones precalculadas de enteros chicos y claves conocidas
+_SMALL_UINTS = tuple(bytes((n,)) for n in range(0x80))
+
+def _encode_uint(n: int, out: list):
+    if n < 0x80:
+        out.append(_SMALL_UINTS[n])
+        return
+    parts = bytearray()
+    while n >= 0x80:
+        parts.append((n & 0x7f) | 0x80)
+        n >>= 7
+    parts.append(n)
+    out.append(bytes(parts))
+
+def _encode_value(value, out: list):
+    value_type = type(value)
+    if value_type is str:
+        data = value.encode('utf-8')
+        length = len(data)
+        out.append(b'\x04')
+        out.append(_SMALL_UINTS[length] if length < 0x80 else _uint_bytes(length))
+        out.append(data)
+    elif value_type is int:
+        out.append(b'\x03')
+        _encode_uint(value << 1 if value >= 0 else (-value << 1) - 1, out)
+    elif value is None:
+        out.append(b'\x00')
+    elif value is True:
+        out.append(b'\x02')
+    elif value is False:
+        out.append(b'\x01')
+    elif isinstance(value, int):
+        out.append(b'\x03')
+        _encode_uint(value << 1 if value >= 0 else (-value << 1) - 1, out)
+    elif isinstance(value, Message):
+        out.append(b'\x07')
+        _encode_uint(value.code, out)
+        _encode_map(value.args, out)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out.append(b'\x04')
+        _encode_uint(len(data), out)
+        out.append(data)
+    elif isinstance(value, dict):
+        out.append(b'\x06')
+        _encode_map(value, out)
+    elif isinstance(value, (list, tuple, set)):
+        out.append(b'\x05')
+        _encode_uint(len(value), out)
+        for item in value:
+            _encode_value(item, out)
+    elif isinstance(value, float):
+        out.append(b'\x08')
+        out.append(struct.pack('>d', value))
+    else:
+        raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def _uint_bytes(n: int) -> bytes:
+    parts = []
+    _encode_uint(n, parts)
+    return b''.join(parts)
+
+def _encode_map(mapping: dict, out: list, skip: str = None):
+    count = len(mapping) - (1 if skip is not None and skip in mapping else 0)
+    _encode_uint(count, out)
+    for key, value in mapping.items():
+        if key == skip:
+            continue
+        key_bytes = _KEY_BYTES.get(key)
+        if key_bytes is None:
+            out.append(b'\x00')
+            _encode_value(str(key), out)
+        else:
+            out.append(key_bytes)
+        _encode_value(value, out)
+
+def encode_binary_frame(message: dict) -> bytes:
+    """Serializa una solicitud, respuesta o notificación como trama binaria"""
+    out = []
+    if message.get('type') == 'notification':
+        data = message.get('data') or {}
+        code = NOTIFICATION_CODES.get(data.get('type'), 0)
+        out.append(bytes((KIND_NOTIFICATION, code)))
+        _encode_map(data, out, skip='type' if code else None)
+    elif 'command' in message:
+        code = COMMAND_CODES.get(message['command'], 0)
+        out.append(bytes((KIND_REQUEST, code)))
+        _encode_map(message, out, skip='command' if code else None)
+    else:
+        status = message.get('status')
+        if status == 'ok':
+            out.append(bytes((KIND_RESPONSE_OK,)))
+            _encode_map(message, out, skip='status')
+        elif status == 'error':
+            out.append(bytes((KIND_RESPONSE_ERROR,)))
+            _encode_map(message, out, skip='status')
+        else:
+            out.append(bytes((KIND_RESPONSE,)))
+            _encode_map(message, out)
+    body = b''.join(out)
+    return FRAME_HEADER.pack(len(body)) + body
+
+_KEY_BYTES.update((key, _uint_bytes(code)) for key, code in KEY_CODES.items())
+
+COMMAND_NAMES = {code: name for name, code in COMMAND_CODES.items()}
+NOTIFICATION_NAMES = {code: name for name, code in NOTIFICATION_CODES.items()}
+KEY_NAMES = {code: key for key, code in KEY_CODES.items()}
+
+def _decode_uint(data: bytes, pos: int):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _decode_value(data: bytes, pos: int, depth: int = 0):
+    tag = data[pos]
+    pos += 1
+    if tag == TAG_STR:
+        length = data[pos]
+        if length < 0x80:
+            pos += 1
+        else:
+            length, pos = _decode_uint(data, pos)
+        end = pos + length
+        if end > len(data):
+            raise ValueError("Cadena truncada")
+        return data[pos:end].decode('utf-8'), end
+    if tag == TAG_INT:
+        n = data[pos]
+        if n < 0x80:
+            pos += 1
+        else:
+            n, pos = _decode_uint(data, pos)
+        return (n >> 1) ^ -(n & 1), pos
+    if tag == TAG_NONE:
+        return None, pos
+    if tag == TAG_TRUE:
+        return True, pos
+    if tag == TAG_FALSE:
+        return False, pos
+    if tag == TAG_MAP:
+        return _decode_map(data, pos, depth + 1)
+    if tag == TAG_LIST:
+        if depth >= MAX_NESTING:
+            raise ValueError("Anidamiento excesivo")
+        count, pos = _decode_uint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _decode_value(data, pos, depth + 1)
+            items.append(item)
+        return items, pos
+    if tag == TAG_MESSAGE:
+        code, pos = _decode_uint(data, pos)
+        args, pos = _decode_map(data, pos, depth + 1)
+        return Message.from_code(code, args), pos
+    if tag == TAG_FLOAT:
+        end = pos + 8
+        if end > len(data):
+            raise ValueError("Decimal truncado")
+        return struct.unpack_from('>d', data, pos)[0], end
+    raise ValueError(f"Etiqueta desconocida: {tag}")
+
+def _decode_map(data: bytes, pos: int, depth: int = 0):
+    if depth >= MAX_NESTING:
+        raise ValueError("Anidamiento excesivo")
+    count, pos = _decode_uint(data, pos)
+    result = {}
+    for _ in range(count):
+        code = data[pos]
+        if code == 0:
+            key, pos = _decode_value(data, pos + 1, depth)
+            if not isinstance(key, str):
+                raise ValueError("Clave de mapa inválida")
+        elif code < 0x80:
+            key = KEY_NAMES.get(code, str(code))
+            pos += 1
+        else:
+            code, pos = _decode_uint(data, pos)
+            key = KEY_NAMES.get(code, str(code))
+        result[key], pos = _decode_value(data, pos, depth)
+    return result, pos
+
+def decode_binary_frame(body: bytes) -> dict:
+    """Reconstruye el mensaje (mismo formato que en JSON) a partir del cuerpo de una trama"""
+    try:
+        kind = body[0]
+        if kind == KIND_NOTIFICATION:
+            code = body[1]
+            data, _ = _decode_map(body, 2)
+            if code:
+                data['type'] = NOTIFICATION_NAMES.get(code, str(code))
+            return {"type": "notification", "data": data}
+        if kind == KIND_REQUEST:
+            code = body[1]
+            message, _ = _decode_map(body, 2)
+            if code:
+                message['command'] = COMMAND_NAMES.get(code, str(code))
+            return message
+        message, _ = _decode_map(body, 1)
+        if kind == KIND_RESPONSE_OK:
+            message['status'] = 'ok'
+        elif kind == KIND_RESPONSE_ERROR:
+            message['status'] = 'error'
+        elif kind != KIND_RESPONSE:
+            raise ValueError(f"Tipo de mensaje desconocido: {kind}")
+        return message
+    except IndexError:
+        raise ValueError("Trama binaria truncada")
+
+class JsonCodec:
+    """Tramas JSON delimitadas por salto de línea (protocolo por defecto)"""
+    name = PROTOCOL_JSON
+
+    def new_framer(self, max_frame_size: int = MAX_FRAME_SIZE):
+        return LineFramer(max_frame_size)
+
+    def encode(self, message: dict) -> bytes:
+        return encode_json_frame(message)
+
+    def decode(self, frame: bytes):
+        return json.loads(frame)
+
+    def wrap(self, payload: bytes) -> bytes:
+        """Rearma la trama completa a partir del cuerpo devuelto por el framer"""
+        return payload + b'\n'
+
+class BinaryCodec:
+    """Tramas binarias con prefijo de longitud y códigos numéricos"""
+    name = PROTOCOL_BINARY
+
+    def new_framer(self, max_frame_size: int = MAX_FRAME_SIZE):
+        return BinaryFramer(max_frame_size)
+
+    def encode(self, message: dict) -> bytes:
+        return encode_binary_frame(message)
+
+    def decode(self, frame: bytes):
+        return decode_binary_frame(frame)
+
+    def wrap(self, payload: bytes) -> bytes:
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {PROTOCOL_JSON: JSON_CODEC, PROTOCOL_BINARY: BINARY_CODEC}
@@ -0,0 +1,182 @@
+"""
+Métricas del servidor del juego
+Cuenta solicitudes por comando con su histograma de latencias, y lleva
+medidores de solicitudes en curso, conexiones activas y tamaño de las
+difusiones. Los datos se consultan con el comando 'server_stats' o se vuelcan
+periódicamente a un archivo JSONL.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from protocol import COMMAND_CODES
+from console_log import get_logger
+
+log = get_logger("metrics")
+
+# Límites superiores de los buckets de latencia, en milisegundos (escala ~x2)
+LATENCY_BUCKETS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000
+)
+# Límites superiores de los buckets de destinatarios por difusión
+FANOUT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+DEFAULT_STATS_INTERVAL = 10.0
+
+# Nombre bajo el que se cuentan comandos desconocidos y tramas inválidas
+UNKNOWN_COMMAND = 'unknown'
+INVALID_FRAME = 'invalid'
+
+class Histogram:
+    """Histograma de buckets fijos; los percentiles se estiman por el límite del bucket"""
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # El último bucket no tiene límite
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": round(self.max, 3),
+            # Solo los buckets con datos: [límite superior, cantidad]
+            "buckets": [
+                [self.bounds[index] if index < len(self.bounds) else None, bucket_count]
+                for index, bucket_count in enumerate(self.counts) if bucket_count
+            ]
+        }
+
+class CommandMetrics:
+    __slots__ = ('errors', 'latency')
+
+    def __init__(self):
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+
+class ServerMetrics:
+    """Contadores y medidores del servidor, seguros entre hilos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.commands: Dict[str, CommandMetrics] = {}
+        self.in_flight = 0
+        self.connections = 0
+        self.connections_total = 0
+        self.fanout = Histogram(FANOUT_BUCKETS)
+
+    def request_started(self) -> float:
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def request_finished(self, command, started: float, ok: bool):
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        # Solo comandos conocidos: un cliente no puede inflar el diccionario
+        known = isinstance(command, str) and (command in COMMAND_CODES or command == INVALID_FRAME)
+        name = command if known else UNKNOWN_COMMAND
+        with self.lock:
+            self.in_flight -= 1
+            metrics = self.commands.get(name)
+            if metrics is None:
+                metrics = self.commands[name] = CommandMetrics()
+            metrics.latency.record(elapsed_ms)
+            if not ok:
+                metrics.errors += 1
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections += 1
+            self.connections_total += 1
+
+    def connection_closed(self):
+        with self.lock:
+            self.connections -= 1
+
+    def record_fanout(self, recipients: int):
+        with self.lock:
+            self.fanout.record(recipients)
+
+    def snapshot(self, games: int = 0) -> dict:
+        with self.lock:
+            commands = {}
+            for name, metrics in sorted(self.commands.items()):
+                latency = metrics.latency.snapshot()
+                commands[name] = {
+                    "count": latency.pop("count"),
+                    "errors": metrics.errors,
+                    "latency_ms": latency
+                }
+            return {
+                "timestamp": time.time(),
+                "uptime": round(time.time() - self.started_at, 1),
+                "requests_in_flight": self.in_flight,
+                "connections": self.connections,
+                "connections_total": self.connections_total,
+                "games": games,
+                "commands": commands,
+                "fanout": self.fanout.snapshot()
+            }
+
+class MetricsDumper:
+    """Hilo que agrega una foto de las métricas a un archivo JSONL cada cierto intervalo"""
+
+    def __init__(self, snapshot: Callable[[], dict], path: str,
+                 interval: float = DEFAULT_STATS_INTERVAL):
+        self.snapshot = snapshot
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1.0)
+        self.dump()
+
+    def dump(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.snapshot(), ensure_ascii=False) + '\n')
+        except OSError as e:
+            log.warning("⚠️  No se pudieron volcar las métricas: %s", e)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.dump()
@@ -0,0 +1,436 @@
+"""
+Despliegue del servidor del juego repartido en varios procesos (shards)
+Un proceso frontal acepta las conexiones de los clientes y las reparte entre
+N procesos trabajadores, cada uno con su propio GameServer. Cada partida vive
+en el shard crc32(nombre) % N; la conexión del jugador se reenvía al shard de
+la partida que crea o a la que se une (proxy interno), y list_games junta las
+partidas de todos los shards.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import zlib
+from typing import Dict, List, Optional
+
+from protocol import (
+    FrameTooLarge, CODECS, JSON_CODEC, PROTOCOL_JSON, PROTOCOL_VERSION, FEATURE_REQUEST_IDS
+)
+from console_log import get_logger, setup_logging, DEFAULT_LOG_LEVEL
+from game_server_with_logging import (
+    GameServer, negotiate_hello, raise_fd_limit, RECV_SIZE, ASYNC_BACKLOG, MODE_ASYNCIO
+)
+from simple_rmi_logger import simple_rmi_logger
+from log_spill import DEFAULT_SPILL_DIR
+
+log = get_logger("shards")
+
+INTERNAL_HOST = '127.0.0.1'
+# Comandos que eligen el shard por el nombre de la partida
+ROUTED_BY_GAME = {'create_game', 'join_game'}
+DEFAULT_INTERNAL_TIMEOUT = 10.0
+# Tiempo máximo para que los trabajadores empiecen a aceptar conexiones
+STARTUP_TIMEOUT = 15.0
+
+def shard_for(game_name, shards: int) -> int:
+    """Shard dueño de una partida; estable entre procesos y reinicios (a diferencia de hash())"""
+    return zlib.crc32(str(game_name).encode('utf-8')) % shards
+
+async def read_frame(reader: asyncio.StreamReader, framer, frames: list) -> bytes:
+    """Devuelve la siguiente trama, leyendo del socket solo si no hay ninguna pendiente"""
+    while not frames:
+        data = await reader.read(RECV_SIZE)
+        if not data:
+            raise ConnectionError("Conexión interna cerrada")
+        frames.extend(framer.feed(data))
+    return frames.pop(0)
+
+class ShardConnection:
+    """Conexión interna persistente a un servidor, con varias solicitudes en vuelo por id"""
+
+    def __init__(self, host: str, port: int, timeout: float = DEFAULT_INTERNAL_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task = None
+        self.connect_lock = asyncio.Lock()
+        self.request_ids = itertools.count(1)
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.connected:
+                return
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.reader_task = asyncio.get_running_loop().create_task(
+                self._read_loop(self.reader, self.writer)
+            )
+        await self.request({"command": "hello", "version": PROTOCOL_VERSION,
+                            "features": [FEATURE_REQUEST_IDS]})
+
+    async def request(self, request: dict) -> dict:
+        if not self.connected:
+            await self.connect()
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(JSON_CODEC.encode(dict(request, id=request_id)))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        framer = JSON_CODEC.new_framer()
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                for frame in framer.feed(data):
+                    message = JSON_CODEC.decode(frame)
+                    future = self.pending.get(message.pop('id', None))
+                    if future is not None and not future.done():
+                        future.set_result(message)
+        except (ConnectionError, OSError, ValueError) as e:
+            log.warning("⚠️  Conexión interna con %s:%s interrumpida: %s", self.host, self.port, e)
+        finally:
+            writer.close()
+            if self.writer is writer:
+                self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        for future in list(self.pending.values()):
+            if not future.done():
+                future.set_exception(ConnectionError("Conexión interna cerrada"))
+
+class Upstream:
+    """Conexión de un jugador hacia un shard, reenviada tal cual por el frontal"""
+    __slots__ = ('index', 'writer', 'pump_task', 'closing', 'route_waiters')
+
+    def __init__(self, index: int, writer: asyncio.StreamWriter):
+        self.index = index
+        self.writer = writer
+        self.pump_task = None
+        self.closing = False
+        # create_game/join_game en vuelo: (id de la solicitud, Future de su respuesta)
+        self.route_waiters: List[tuple] = []
+
+    def resolve_route(self, message) -> None:
+        """Entrega la respuesta a un create_game/join_game; las notificaciones no cuentan"""
+        if not isinstance(message, dict) or message.get('type') == 'notification':
+            return
+        request_id = message.get('id')
+        for position, (waiting_id, future) in enumerate(self.route_waiters):
+            # Sin ids el shard responde en orden: la primera respuesta es la esperada
+            if waiting_id is None or waiting_id == request_id:
+                del self.route_waiters[position]
+                if not future.done():
+                    future.set_result(message)
+                return
+
+    def fail_routes(self):
+        for _, future in self.route_waiters:
+            if not future.done():
+                future.set_exception(ConnectionError("Conexión con el shard cerrada"))
+        self.route_waiters.clear()
+
+    def close(self):
+        self.closing = True
+        self.writer.close()
+        self.fail_routes()
+        if self.pump_task is not None:
+            self.pump_task.cancel()
+
+class RouterSession:
+    """Estado de una conexión de cliente en el frontal"""
+
+    def __init__(self, writer: asyncio.StreamWriter, lobby: int):
+        self.writer = writer
+        self.codec = JSON_CODEC
+        self.framer = JSON_CODEC.new_framer()
+        # Se repiten en cada conexión nueva hacia un shard
+        self.hello: Optional[dict] = None
+        self.player_name = None
+        # Shard que recibe los comandos; cambia cuando el shard confirma que
+        # el jugador creó una partida o se unió a una
+        self.active = lobby
+        self.upstreams: Dict[int, Upstream] = {}
+        self.closed = False
+
+    def close_upstreams(self):
+        for upstream in self.upstreams.values():
+            upstream.close()
+        self.upstreams.clear()
+
+class ShardRouter:
+    """Frontal: acepta clientes y reenvía cada conexión al shard de su partida"""
+
+    def __init__(self, host: str, port: int, shard_ports: List[int],
+                 timeout: float = DEFAULT_INTERNAL_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.shard_ports = shard_ports
+        self.timeout = timeout
+        # Conexiones propias del frontal para consultas que abarcan todos los shards
+        self.links = [ShardConnection(INTERNAL_HOST, p, timeout) for p in shard_ports]
+        # Los clientes sin partida se reparten entre shards en ronda
+        self.lobby = itertools.count()
+
+    async def serve(self):
+        raise_fd_limit()
+        await self.wait_for_shards()
+        server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, backlog=ASYNC_BACKLOG
+        )
+        log.info("🎮 Frontal con %s shards iniciado en %s:%s", len(self.shard_ports), self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def wait_for_shards(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STARTUP_TIMEOUT
+        for link in self.links:
+            while True:
+                try:
+                    await link.connect()
+                    break
+                except OSError:
+                    if loop.time() > deadline:
+                        raise
+                    await asyncio.sleep(0.1)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        log.debug("🔌 Cliente conectado desde %s", writer.get_extra_info('peername'))
+        session = RouterSession(writer, next(self.lobby) % len(self.shard_ports))
+        try:
+            while not session.closed:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                for frame in session.framer.feed(data):
+                    await self.route(session, frame)
+        except FrameTooLarge as e:
+            log.warning("❌ Solicitud demasiado grande: %s", e)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            log.warning("❌ Error manejando cliente: %s", e)
+        finally:
+            session.closed = True
+            session.close_upstreams()
+            writer.close()
+
+    async def route(self, session: RouterSession, frame: bytes):
+        """Decide a qué shard va una trama; la trama se reenvía sin volver a codificar"""
+        try:
+            request = session.codec.decode(frame)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            # El shard responde el error de formato
+            await self.forward(session, session.active, frame)
+            return
+
+        command = request.get('command')
+        if command == 'hello':
+            self.hello(session, request)
+            return
+        if command == 'list_games':
+            await self.list_games(session, request)
+            return
+        if command in ROUTED_BY_GAME:
+            await self.route_to_game(session, request, frame)
+            return
+
+        await self.forward(session, session.active, frame)
+        if command == 'set_player_name':
+            session.player_name = request.get('name')
+
+    async def route_to_game(self, session: RouterSession, request: dict, frame: bytes):
+        """Envía create_game/join_game al shard de la partida y lo activa solo si aceptó
+
+        Las tramas siguientes del cliente esperan la respuesta: así los
+        comandos de la partida ya van al shard correcto, y un error deja al
+        jugador en el shard donde sigue su partida anterior.
+        """
+        index = shard_for(request.get('game_name'), len(self.shard_ports))
+        upstream = await self.upstream(session, index)
+        future = asyncio.get_running_loop().create_future()
+        upstream.route_waiters.append((request.get('id'), future))
+        await self.forward(session, index, frame)
+        try:
+            response = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            log.warning("⚠️  El shard %s no respondió %s", index, request.get('command'))
+            return
+        if response.get('status') == 'ok' and response.get('current_game'):
+            session.active = index
+
+    def reply(self, session: RouterSession, request: dict, response: dict):
+        if 'id' in request:
+            response['id'] = request['id']
+        session.writer.write(session.codec.encode(response))
+
+    def hello(self, session: RouterSession, request: dict):
+        """El frontal negocia igual que un shard y repite el 'hello' en cada conexión interna"""
+        response = negotiate_hello(request)
+        self.reply(session, request, response)
+        if response.get('status') != 'ok':
+            return
+        session.hello = {key: value for key, value in request.items() if key != 'id'}
+        if response['protocol'] != session.codec.name:
+            # Las conexiones internas ya abiertas hablan el formato anterior:
+            # se cierran y se vuelven a abrir con el nuevo al necesitarlas
+            session.close_upstreams()
+            codec = CODECS[response['protocol']]
+            leftover = session.framer.buffer
+            session.codec = codec
+            session.framer = codec.new_framer()
+            session.framer.buffer += leftover
+
+    async def list_games(self, session: RouterSession, request: dict):
+        responses = await asyncio.gather(
+            *(link.request({"command": "list_games"}) for link in self.links),
+            return_exceptions=True
+        )
+        games = []
+        for index, response in enumerate(responses):
+            if isinstance(response, dict) and response.get('status') == 'ok':
+                games.extend(response.get('games', []))
+            else:
+                log.warning("⚠️  El shard %s no respondió list_games: %r", index, response)
+        self.reply(session, request, {"status": "ok", "games": games})
+
+    async def upstream(self, session: RouterSession, index: int) -> Upstream:
+        upstream = session.upstreams.get(index)
+        if upstream is None:
+            upstream = await self.open_upstream(session, index)
+        return upstream
+
+    async def forward(self, session: RouterSession, index: int, frame: bytes):
+        upstream = await self.upstream(session, index)
+        upstream.writer.write(session.codec.wrap(frame))
+        await upstream.writer.drain()
+
+    async def open_upstream(self, session: RouterSession, index: int) -> Upstream:
+        """Abre la conexión del jugador hacia un shard y repite su 'hello' y su nombre"""
+        reader, writer = await asyncio.open_connection(INTERNAL_HOST, self.shard_ports[index])
+        codec = JSON_CODEC
+        framer = codec.new_framer()
+        frames = []
+        try:
+            if session.hello is not None:
+                writer.write(codec.encode(session.hello))
+                response = codec.decode(await asyncio.wait_for(read_frame(reader, framer, frames), self.timeout))
+                protocol = response.get('protocol', PROTOCOL_JSON)
+                if protocol != codec.name:
+                    codec = CODECS[protocol]
+                    leftover = framer.buffer
+                    framer = codec.new_framer()
+                    framer.buffer += leftover
+            if session.player_name is not None:
+                writer.write(codec.encode({"command": "set_player_name", "name": session.player_name}))
+                await asyncio.wait_for(read_frame(reader, framer, frames), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+        upstream = Upstream(index, writer)
+        session.upstreams[index] = upstream
+        upstream.pump_task = asyncio.get_running_loop().create_task(
+            self.pump(session, upstream, reader, framer, frames)
+        )
+        return upstream
+
+    async def pump(self, session: RouterSession, upstream: Upstream,
+                   reader: asyncio.StreamReader, framer, frames: list):
+        """Copia al cliente, trama por trama, todo lo que envía el shard"""
+        client = session.writer
+        codec = session.codec
+        try:
+            if frames:
+                client.write(b''.join(codec.wrap(frame) for frame in frames))
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                ready = framer.feed(data)
+                if ready:
+                    if upstream.route_waiters:
+                        # Solo se decodifica mientras se espera un create_game/join_game
+                        for frame in ready:
+                            try:
+                                upstream.resolve_route(codec.decode(frame))
+                            except ValueError:
+                                pass
+                    client.write(b''.join(codec.wrap(frame) for frame in ready))
+                    await client.drain()
+        except (ConnectionError, OSError, FrameTooLarge) as e:
+            log.warning("⚠️  Conexión con el shard %s interrumpida: %s", upstream.index, e)
+        finally:
+            upstream.writer.close()
+            upstream.fail_routes()
+            if not upstream.closing and not session.closed:
+                # El shard se cayó: el cliente debe reconectarse
+                session.closed = True
+                client.close()
+
+def run_shard(index: int, port: int, server_options: dict, log_level: str):
+    """Punto de entrada de un proceso trabajador"""
+    setup_logging(log_level)
+    # Cada proceso lleva su propio spill de logs pendientes
+    simple_rmi_logger.spill_dir = f"{DEFAULT_SPILL_DIR}-shard{index}"
+    options = dict(server_options)
+    if options.get('stats_file'):
+        root, ext = os.path.splitext(options['stats_file'])
+        options['stats_file'] = f"{root}-shard{index}{ext}"
+    if options.get('snapshot_dir'):
+        # Las partidas caen en el mismo shard mientras no cambie el número de shards
+        options['snapshot_dir'] = os.path.join(options['snapshot_dir'], f"shard{index}")
+    if options.get('journal_dir'):
+        options['journal_dir'] = os.path.join(options['journal_dir'], f"shard{index}")
+    server = GameServer(host=INTERNAL_HOST, port=port, **options)
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        pass
+
+def run_sharded(host: str, port: int, shards: int, base_port: int,
+                server_options: Optional[dict] = None, log_level: str = DEFAULT_LOG_LEVEL):
+    """Lanza N procesos trabajadores y el frontal que reparte las conexiones"""
+    server_options = dict(server_options or {}, mode=MODE_ASYNCIO)
+    shard_ports = [base_port + index for index in range(shards)]
+    # 'spawn': los trabajadores no heredan hilos ni sockets del frontal
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=run_shard, args=(index, shard_port, server_options, log_level),
+                        name=f"shard-{index}", daemon=True)
+        for index, shard_port in enumerate(shard_ports)
+    ]
+    for worker in workers:
+        worker.start()
+    log.info("🧩 %s shards en puertos internos %s-%s", shards, shard_ports[0], shard_ports[-1])
+
+    router = ShardRouter(host, port, shard_ports)
+    try:
+        asyncio.run(router.serve())
+    except KeyboardInterrupt:
+        log.info("🛑 Cerrando servidor...")
+    finally:
+        # SIGINT deja que cada trabajador guarde sus logs pendientes antes de salir
+        for worker in workers:
+            if worker.is_alive():
+                os.kill(worker.pid, signal.SIGINT)
+        for worker in workers:
+            worker.join(timeout=5.0)
+            if worker.is_alive():
+                worker.terminate()
@@ -5,40 +5,205 @@ Utiliza un servidor proxy en Java que expone RMI a través de sockets TCP
 import socket
 import json
 import time
+import random
 import threading
+from collections import deque
 from datetime import datetime
 
+from log_spill import SpillQueue, DEFAULT_SPILL_DIR
+from console_log import get_logger, setup_logging
+
+log = get_logger("rmi_logger")
+
+# Capacidad del buffer en memoria y cantidad de registros por envío
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_BATCH_SIZE = 200
+# Lotes enviados sin esperar acuse al reenviar los logs pendientes
+DEFAULT_REPLAY_WINDOW = 4
+# Espera entre intentos de reconexión (crece exponencialmente hasta el máximo)
+DEFAULT_RECONNECT_MIN_DELAY = 0.5
+DEFAULT_RECONNECT_MAX_DELAY = 30.0
+# Revisión periódica del supervisor cuando no hay eventos
+SUPERVISOR_IDLE_INTERVAL = 5.0
+# Espera máxima por la respuesta a la sonda de logBatch al conectar
+PROBE_TIMEOUT = 5.0
+
+def backoff_delay(attempt, min_delay=DEFAULT_RECONNECT_MIN_DELAY, max_delay=DEFAULT_RECONNECT_MAX_DELAY):
+    """Espera exponencial con jitter: entre la mitad y el total del tope del intento"""
+    cap = min(max_delay, min_delay * (2 ** min(attempt, 16)))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+def batch_ack(response: str, size: int):
+    """Registros aceptados según el acuse "OK n" de un lote de 'size', o None si no es un acuse
+
+    El proxy descarta los registros inválidos y responde cuántos guardó, así
+    que n puede ser menor que el lote: la diferencia no se reintenta.
+    """
+    status, _, count = response.partition(' ')
+    if status != 'OK' or not count.isdigit():
+        return None
+    accepted = int(count)
+    return accepted if accepted <= size else None
+
+def encode_log_batch(log_requests) -> bytes:
+    """Codifica varios registros como una única solicitud logBatch del proxy"""
+    return (json.dumps({'method': 'logBatch', 'records': log_requests}) + '\n').encode('utf-8')
+
 class SimpleRMILogger:
-    def __init__(self, proxy_host='localhost', proxy_port=25334):
+    def __init__(self, proxy_host='localhost', proxy_port=25334,
+                 buffer_size=DEFAULT_BUFFER_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 spill_dir=DEFAULT_SPILL_DIR, replay_window=DEFAULT_REPLAY_WINDOW,
+                 reconnect_min_delay=DEFAULT_RECONNECT_MIN_DELAY,
+                 reconnect_max_delay=DEFAULT_RECONNECT_MAX_DELAY):
         self.proxy_host = proxy_host
         self.proxy_port = proxy_port
         self.connected = False
         self.socket = None
-        self.log_queue = []
-        self.queue_lock = threading.Lock()
+        self.recv_buffer = b''
+        self.batch_supported = True
+        self.send_lock = threading.Lock()
+        
+        # Logs pendientes sin conexión: en disco, no en memoria
+        self.spill_dir = spill_dir
+        self.spill = None
+        self.spill_lock = threading.Lock()
+        self.replay_lock = threading.Lock()
+        self.replay_window = replay_window
+        
+        # Buffer circular drenado por el hilo emisor: el juego nunca espera a la red
+        self.batch_size = batch_size
+        self.buffer = deque(maxlen=buffer_size)
+        self.buffer_condition = threading.Condition()
+        self.in_flight = 0
+        self.sent_count = 0
+        self.dropped_count = 0
+        # Registros que el proxy descartó por inválidos
+        self.rejected_count = 0
+        self.closing = False
+        self.sender_thread = None
+        
+        # Supervisor: reconecta con backoff y reenvía el spill en segundo plano
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.reconnect_count = 0
+        self.supervisor_thread = None
+        self.supervisor_wakeup = threading.Event()
+        self.supervisor_stop = threading.Event()
         
     def connect(self):
-        """Conecta al proxy del servidor RMI"""
+        """Conecta al proxy del servidor RMI
+        
+        Los logs pendientes se reenvían en segundo plano; si la conexión falla
+        el supervisor sigue reintentando sin bloquear al llamador.
+        """
+        self._start_sender()
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.proxy_host, self.proxy_port))
-            self.connected = True
-            
-            print(f"✅ Conectado al proxy RMI en {self.proxy_host}:{self.proxy_port}")
-            
-            # Procesar logs pendientes
-            self._process_queued_logs()
-            
+            self._open_connection()
+            log.info("✅ Conectado al proxy RMI en %s:%s", self.proxy_host, self.proxy_port)
             return True
             
         except Exception as e:
-            print(f"❌ Error conectando al proxy RMI: {e}")
-            print("⚠️  Los logs se almacenarán localmente hasta que se restablezca la conexión")
+            log.error("❌ Error conectando al proxy RMI: %s", e)
+            log.warning("⚠️  Los logs se almacenarán localmente hasta que se restablezca la conexión")
             self.connected = False
             return False
+        
+        finally:
+            self._start_supervisor()
     
-    def disconnect(self):
-        """Desconecta del proxy RMI"""
+    def _open_connection(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect((self.proxy_host, self.proxy_port))
+            batch_supported, leftover = self._probe_batch_support(sock)
+        except Exception:
+            sock.close()
+            raise
+        with self.send_lock:
+            self.socket = sock
+            self.recv_buffer = leftover
+            self.batch_supported = batch_supported
+            self.connected = True
+    
+    def _probe_batch_support(self, sock):
+        """Envía un lote vacío: solo un proxy con logBatch responde "OK 0"
+        
+        Un proxy antiguo responde "ERROR: ..." (falla antes de mirar el método),
+        y entonces los registros se envían de a uno.
+        """
+        sock.settimeout(PROBE_TIMEOUT)
+        sock.sendall(encode_log_batch([]))
+        data = b''
+        while b'\n' not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("El proxy cerró la conexión")
+            data += chunk
+        sock.settimeout(None)
+        line, leftover = data.split(b'\n', 1)
+        response = line.decode('utf-8').strip()
+        if response != "OK 0":
+            log.warning("⚠️  El proxy RMI no soporta logBatch (%s), se usarán envíos individuales", response)
+            return False, leftover
+        return True, leftover
+    
+    def _connection_lost(self):
+        """Marca la conexión como caída y despierta al supervisor (con send_lock tomado)"""
+        self.connected = False
+        if self.socket:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+            self.socket = None
+        self.supervisor_wakeup.set()
+    
+    def _start_supervisor(self):
+        if self.supervisor_thread is None:
+            self.supervisor_stop.clear()
+            self.supervisor_thread = threading.Thread(target=self._supervisor_loop, daemon=True)
+            self.supervisor_thread.start()
+    
+    def _supervisor_loop(self):
+        """Reconecta con espera exponencial y jitter, y drena el spill al estar conectado"""
+        attempt = 0
+        replay_failures = 0
+        while not self.supervisor_stop.is_set():
+            self.supervisor_wakeup.clear()
+            
+            if not self.connected:
+                try:
+                    self._open_connection()
+                except Exception:
+                    delay = backoff_delay(attempt, self.reconnect_min_delay, self.reconnect_max_delay)
+                    attempt += 1
+                    self.supervisor_stop.wait(delay)
+                    continue
+                attempt = 0
+                self.reconnect_count += 1
+                log.info("🔁 Reconectado al proxy RMI en %s:%s", self.proxy_host, self.proxy_port)
+            
+            if self._get_spill().pending():
+                # Los lotes nuevos siguen saliendo por el hilo emisor mientras tanto
+                if not self._process_queued_logs():
+                    # El proxy rechazó un lote: se reintenta con espera, sin girar en vacío
+                    delay = backoff_delay(replay_failures, self.reconnect_min_delay, self.reconnect_max_delay)
+                    replay_failures += 1
+                    self.supervisor_stop.wait(delay)
+                    continue
+                replay_failures = 0
+                if self.connected and self._get_spill().pending():
+                    continue
+            
+            self.supervisor_wakeup.wait(SUPERVISOR_IDLE_INTERVAL)
+    
+    def disconnect(self, timeout=5.0):
+        """Detiene el supervisor y desconecta del proxy RMI"""
+        self.supervisor_stop.set()
+        self.supervisor_wakeup.set()
+        if self.supervisor_thread and self.supervisor_thread is not threading.current_thread():
+            self.supervisor_thread.join(timeout)
+        self.supervisor_thread = None
         self.connected = False
         if self.socket:
             try:
@@ -47,6 +212,45 @@ class SimpleRMILogger:
                 pass
             self.socket = None
     
+    def flush(self, timeout=5.0):
+        """Espera a que el buffer en memoria se haya enviado o almacenado localmente"""
+        deadline = time.time() + timeout
+        with self.buffer_condition:
+            while self.buffer or self.in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.buffer_condition.wait(remaining)
+        return True
+    
+    def close(self, timeout=5.0):
+        """Vacía el buffer, detiene el hilo emisor y el supervisor y cierra la conexión"""
+        self.flush(timeout)
+        with self.buffer_condition:
+            self.closing = True
+            self.buffer_condition.notify_all()
+        if self.sender_thread:
+            self.sender_thread.join(timeout)
+            self.sender_thread = None
+        self.disconnect(timeout)
+        if self.spill:
+            self.spill.close()
+    
+    def metrics(self):
+        """Métricas del transporte de logs"""
+        with self.buffer_condition:
+            queue_depth = len(self.buffer) + self.in_flight
+        pending_local = self.spill.pending() if self.spill else 0
+        return {
+            "queue_depth": queue_depth,
+            "sent": self.sent_count,
+            "dropped": self.dropped_count,
+            "rejected": self.rejected_count,
+            "pending_local": pending_local,
+            "connected": self.connected,
+            "reconnects": self.reconnect_count
+        }
+    
     def log_start(self, game_id, operation, *details):
         """Registra el inicio de una operación"""
         timestamp = int(time.time() * 1000)  # Timestamp en milisegundos
@@ -58,7 +262,7 @@ class SimpleRMILogger:
         self._send_log('logEnd', timestamp, game_id, operation, details)
     
     def _send_log(self, method, timestamp, game_id, operation, details):
-        """Envía un log al proxy RMI"""
+        """Encola un log para el hilo emisor sin bloquear al llamador"""
         log_request = {
             'method': method,
             'timestamp': timestamp,
@@ -67,69 +271,188 @@ class SimpleRMILogger:
             'details': list(details) if details else []
         }
         
-        if self.connected and self.socket:
+        with self.buffer_condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                # Buffer lleno: se descarta el registro más antiguo
+                self.dropped_count += 1
+            self.buffer.append(log_request)
+            self.buffer_condition.notify()
+            if self.sender_thread is None:
+                self._start_sender()
+    
+    def _start_sender(self):
+        if self.sender_thread is None:
+            self.closing = False
+            self.sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+            self.sender_thread.start()
+    
+    def _sender_loop(self):
+        """Drena el buffer en lotes y los envía al proxy en una sola escritura"""
+        while True:
+            with self.buffer_condition:
+                while not self.buffer and not self.closing:
+                    self.buffer_condition.wait()
+                if not self.buffer:
+                    return
+                count = min(self.batch_size, len(self.buffer))
+                batch = [self.buffer.popleft() for _ in range(count)]
+                self.in_flight = count
+            
+            if not (self.connected and self._send_batch(batch)):
+                self._queue_logs(batch)
+            
+            with self.buffer_condition:
+                self.in_flight = 0
+                self.buffer_condition.notify_all()
+    
+    def _send_batch(self, batch):
+        """Envía un lote en una escritura y lee su acuse"""
+        return self._send_batches([batch]) == 1
+    
+    def _send_batches(self, batches, on_sent=None):
+        """Envía varios lotes en una sola escritura y lee sus acuses en orden
+        
+        Un lote se da por entregado con el acuse "OK n" (n hasta la cantidad
+        del lote: lo que falta son registros inválidos que el proxy descartó);
+        desde el primer lote con otra respuesta ninguno se confirma y el
+        llamador los conserva para reintentarlos (entrega al menos una vez).
+        Devuelve cuántos lotes consecutivos se entregaron; 'on_sent' se llama
+        con el índice de cada uno.
+        """
+        with self.send_lock:
+            if not self.connected or not self.socket:
+                return 0
+            delivered = 0
             try:
-                message = json.dumps(log_request) + '\n'
-                self.socket.send(message.encode('utf-8'))
+                if not self.batch_supported:
+                    for index, batch in enumerate(batches):
+                        if not self._send_lines(batch):
+                            break
+                        delivered += 1
+                        if on_sent:
+                            on_sent(index)
+                    return delivered
+                
+                self.socket.sendall(b''.join(encode_log_batch(batch) for batch in batches))
+                # Se leen todos los acuses aunque uno falle, para no desfasar la conexión
+                failed = False
+                for index, response in enumerate(self._read_responses(len(batches))):
+                    batch = batches[index]
+                    accepted = batch_ack(response, len(batch))
+                    if accepted is None:
+                        if not failed:
+                            log.warning("⚠️  Lote de %s logs rechazado por el proxy: %s", len(batch), response)
+                        failed = True
+                        continue
+                    self.sent_count += accepted
+                    if accepted < len(batch):
+                        # Reintentarlos no cambiaría nada: se descartan
+                        self.rejected_count += len(batch) - accepted
+                        log.warning("⚠️  El proxy descartó %s logs inválidos de un lote de %s",
+                                    len(batch) - accepted, len(batch))
+                    if not failed:
+                        delivered += 1
+                        if on_sent:
+                            on_sent(index)
+                return delivered
                 
-                # Leer respuesta
-                response = self.socket.recv(1024).decode('utf-8').strip()
-                if response == 'OK':
-                    print(f"📝 Log enviado: {method} - {game_id} - {operation}")
-                else:
-                    print(f"⚠️  Respuesta inesperada del servidor: {response}")
-                    
             except Exception as e:
-                print(f"❌ Error enviando log: {e}")
-                self.connected = False
-                self._queue_log(log_request)
-        else:
-            self._queue_log(log_request)
-    
-    def _queue_log(self, log_request):
-        """Almacena un log en la cola local"""
-        with self.queue_lock:
-            self.log_queue.append(log_request)
-            print(f"📋 Log almacenado localmente: {log_request['operation']}")
+                log.error("❌ Error enviando logs: %s", e)
+                self._connection_lost()
+                return delivered
+    
+    def _send_lines(self, batch):
+        """Envía un registro por línea en una escritura; True si el proxy aceptó todos"""
+        payload = ''.join(json.dumps(log_request) + '\n' for log_request in batch)
+        self.socket.sendall(payload.encode('utf-8'))
+        
+        errors = 0
+        for response in self._read_responses(len(batch)):
+            if response != 'OK':
+                errors += 1
+                log.warning("⚠️  Respuesta inesperada del servidor: %s", response)
+        self.sent_count += len(batch) - errors
+        return errors == 0
+    
+    def _read_responses(self, count):
+        """Lee 'count' líneas de respuesta del proxy"""
+        responses = []
+        while len(responses) < count:
+            while b'\n' not in self.recv_buffer:
+                data = self.socket.recv(4096)
+                if not data:
+                    raise ConnectionError("El proxy cerró la conexión")
+                self.recv_buffer += data
+            line, self.recv_buffer = self.recv_buffer.split(b'\n', 1)
+            responses.append(line.decode('utf-8').strip())
+        return responses
+    
+    def _get_spill(self):
+        """Abre el spill en disco la primera vez que se necesita"""
+        with self.spill_lock:
+            if self.spill is None:
+                self.spill = SpillQueue(self.spill_dir)
+            return self.spill
+    
+    def _queue_logs(self, log_requests):
+        """Almacena logs en el spill local en disco"""
+        try:
+            self._get_spill().append(log_requests)
+            log.debug("📋 %s logs almacenados localmente", len(log_requests))
+            self.supervisor_wakeup.set()
+        except OSError as e:
+            log.error("❌ Error guardando logs localmente: %s", e)
+            with self.buffer_condition:
+                self.dropped_count += len(log_requests)
     
     def _process_queued_logs(self):
-        """Procesa los logs almacenados en cola"""
-        with self.queue_lock:
-            if not self.log_queue:
-                return
-            
-            print(f"📤 Procesando {len(self.log_queue)} logs pendientes...")
+        """Reenvía los logs del spill en lotes, con varios lotes en vuelo a la vez
+        
+        Cada acuse confirma en disco la secuencia de su lote, así que si el
+        proceso se cae a mitad del reenvío se reanuda desde el último lote
+        confirmado sin duplicar los anteriores.
+        """
+        spill = self._get_spill()
+        if not spill.pending():
+            return True
+        
+        with self.replay_lock:
+            log.info("📤 Procesando %s logs pendientes...", spill.pending())
             
-            for log_request in self.log_queue.copy():
-                try:
-                    message = json.dumps(log_request) + '\n'
-                    self.socket.send(message.encode('utf-8'))
-                    
-                    response = self.socket.recv(1024).decode('utf-8').strip()
-                    if response == 'OK':
-                        self.log_queue.remove(log_request)
-                    else:
-                        print(f"⚠️  Error procesando log pendiente: {response}")
-                        break
-                        
-                except Exception as e:
-                    print(f"❌ Error procesando log pendiente: {e}")
-                    self.connected = False
-                    break
+            window = []
+            for last_seq, batch in spill.read_batches(self.batch_size):
+                if not batch:
+                    # Registros ilegibles (p. ej. una escritura interrumpida): se saltan
+                    spill.ack(last_seq)
+                    continue
+                window.append((last_seq, batch))
+                if len(window) >= self.replay_window:
+                    if not self._replay_window(spill, window):
+                        log.error("❌ Error procesando logs pendientes")
+                        return False
+                    window = []
+            if window and not self._replay_window(spill, window):
+                log.error("❌ Error procesando logs pendientes")
+                return False
             
-            if not self.log_queue:
-                print("✅ Todos los logs pendientes han sido enviados")
+            if not spill.pending():
+                log.info("✅ Todos los logs pendientes han sido enviados")
+            return True
     
-    def save_logs_to_file(self, filename="local_logs.json"):
-        """Guarda los logs pendientes en un archivo"""
-        with self.queue_lock:
-            if self.log_queue:
-                try:
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(self.log_queue, f, indent=2, ensure_ascii=False)
-                    print(f"💾 Logs guardados en {filename}")
-                except Exception as e:
-                    print(f"❌ Error guardando logs: {e}")
+    def _replay_window(self, spill, window):
+        """Envía una ventana de lotes del spill y confirma solo los que el proxy aceptó"""
+        batches = [batch for _, batch in window]
+        delivered = self._send_batches(batches, on_sent=lambda index: spill.ack(window[index][0]))
+        return delivered == len(window)
+    
+    def save_logs_to_file(self):
+        """Asegura en disco los logs pendientes del spill"""
+        if self.spill and self.spill.pending():
+            try:
+                self.spill.sync()
+                log.info("💾 %s logs pendientes guardados en %s", self.spill.pending(), self.spill_dir)
+            except OSError as e:
+                log.error("❌ Error guardando logs: %s", e)
 
 # Instancia global del logger RMI simplificado
 simple_rmi_logger = SimpleRMILogger()
@@ -182,17 +505,19 @@ def log_game_win(game_id, team_name):
 
 def init_rmi_logging():
     """Inicializa el cliente RMI de logging"""
-    print("🔌 Inicializando cliente RMI para logging...")
+    log.info("🔌 Inicializando cliente RMI para logging...")
     if not simple_rmi_logger.connect():
-        print("⚠️  Continuando sin logging RMI (se almacenará localmente)")
+        log.warning("⚠️  Continuando sin logging RMI (se almacenará localmente)")
 
 def cleanup_rmi_logging():
-    """Limpia la conexión RMI y guarda logs pendientes"""
+    """Envía los logs en memoria, guarda los pendientes y cierra la conexión RMI"""
+    simple_rmi_logger.flush()
     simple_rmi_logger.save_logs_to_file()
-    simple_rmi_logger.disconnect()
+    simple_rmi_logger.close()
 
 if __name__ == "__main__":
     # Prueba del cliente RMI simple
+    setup_logging()
     print("🧪 Probando cliente RMI simple de logging...")
     
     init_rmi_logging()
@@ -0,0 +1,269 @@
+"""
+Pruebas de los componentes internos del servidor, sin red ni proxy RMI
+Cubren el decodificador binario, los deltas de estado, la bitácora con
+compactación, el spill de logs y el frontal con shards. Se ejecutan con
+'python test_components.py' (o con pytest, que recoge las funciones test_*).
+"""
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from protocol import (
+    BINARY_CODEC, MAX_NESTING, KIND_REQUEST, TAG_LIST, TAG_FLOAT, decode_binary_frame
+)
+from game_server_with_logging import Game, GameServer, replay_journal
+from game_client import GameStateMirror
+from game_journal import read_journal, list_segments
+from log_spill import SpillQueue
+from shard_router import shard_for
+from simple_rmi_logger import simple_rmi_logger, batch_ack
+
+GAME_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'game_server_with_logging.py')
+
+def decode_or_value_error(body: bytes) -> bool:
+    """True si la trama se decodificó, False si se rechazó con ValueError"""
+    try:
+        decode_binary_frame(body)
+        return True
+    except ValueError:
+        return False
+
+def test_binary_decoder_rejects_malformed_frames():
+    """Toda trama binaria mal formada se rechaza con ValueError"""
+    message = {"command": "create_game", "game_name": "g", "max_teams": 2,
+               "extra": {"lista": [1, 2.5, None, True], "texto": "ñandú"}}
+    body = BINARY_CODEC.encode(message)[4:]
+    assert decode_binary_frame(body) == message
+    # Cualquier corte de una trama válida
+    for end in range(len(body)):
+        decode_or_value_error(body[:end])
+    # Clave explícita (etiqueta 0) que no es texto: una lista vacía
+    assert not decode_or_value_error(bytes([KIND_REQUEST, 4, 1, 0, TAG_LIST, 0, 0]))
+    # Anidamiento más hondo que MAX_NESTING
+    deep = bytes([KIND_REQUEST, 4, 1, 0x10]) + bytes([TAG_LIST, 1]) * (MAX_NESTING + 1) + bytes([TAG_LIST, 0])
+    assert not decode_or_value_error(deep)
+    # Decimal sin sus 8 bytes
+    assert not decode_or_value_error(bytes([KIND_REQUEST, 4, 1, 0x10, TAG_FLOAT, 0, 0]))
+    # Bytes al azar: nunca otra excepción que ValueError
+    rng = random.Random(7)
+    for _ in range(2000):
+        decode_or_value_error(bytes(rng.randrange(256) for _ in range(rng.randrange(1, 40))))
+
+def new_game_with_teams(teams) -> Game:
+    game = Game('g', teams[0][0], len(teams), 3, 30, 1, 6)
+    for player, team_name in teams:
+        game.add_player(player)
+        game.create_team(team_name, player)
+    return game
+
+def test_mirror_follows_changes_since():
+    """Una copia con la foto y los deltas de changes_since coincide con la partida"""
+    game = new_game_with_teams([('ana', 'rojo'), ('beto', 'azul'), ('caro', 'verde')])
+    mirror = GameStateMirror(game.snapshot(), game.version)
+
+    game.add_player('dani')
+    game.open_join_vote('dani', 'rojo', 1)
+    game.cast_join_vote('dani', 'ana', 'si')
+    game.teams['rojo'].add_player('dani')
+    game.close_join_vote('dani')
+    for player in ('ana', 'beto', 'caro', 'dani'):
+        game.vote_to_start(player)
+    assert game.start_game()
+    game.apply_roll('rojo', [3])
+    game.apply_roll('azul', [2])
+    # Se va el equipo anterior al del turno: el turno no debe moverse
+    game.remove_player('ana')
+    game.remove_player('dani')
+
+    assert mirror.apply(game.changes_since(mirror.version))
+    snapshot = game.snapshot()
+    assert mirror.version == game.version
+    assert mirror.current_turn == snapshot['current_turn'] == 'verde'
+    assert mirror.teams == {team['name']: {"position": team['position'], "players": team['players']}
+                            for team in snapshot['teams']}
+    assert game.changes_since(game.version) == []
+
+    # Un delta de un equipo desconocido pide la foto completa en lugar de fallar
+    broken = GameStateMirror(game.snapshot(), game.version)
+    del broken.teams['azul']
+    game.apply_roll('azul', [1])
+    assert not broken.apply(game.changes_since(broken.version))
+    assert broken.needs_snapshot
+
+def comparable_state(game: Game) -> dict:
+    """to_state sin el orden de los conjuntos (jugadores y votos), que varía entre procesos"""
+    state = game.to_state()
+    state['players'] = sorted(state['players'])
+    for team in state['teams']:
+        team['votes'] = sorted(team['votes'])
+    return state
+
+def test_replay_journal_after_compaction():
+    """La bitácora compactada reconstruye las partidas igual que en memoria"""
+    directory = tempfile.mkdtemp()
+    simple_rmi_logger.spill_dir = os.path.join(directory, 'spill')
+    server = GameServer(journal_dir=os.path.join(directory, 'journal'), journal_compact_interval=0.1)
+    server.journal.start()
+    try:
+        def request(player, current_game, **fields):
+            return server.process_request(fields, player, current_game)
+
+        assert request('ana', None, command='create_game', game_name='g', max_teams=2,
+                       max_players_per_team=2, board_length=1000, min_dice=1, max_dice=6)['status'] == 'ok'
+        request('beto', None, command='join_game', game_name='g')
+        request('caro', None, command='join_game', game_name='g')
+        request('ana', 'g', command='create_team', team_name='rojo')
+        request('beto', 'g', command='create_team', team_name='azul')
+        request('caro', 'g', command='join_team', team_name='rojo')
+        request('ana', 'g', command='vote_team_join', vote_id='caro', vote='si')
+        for player in ('ana', 'beto', 'caro'):
+            request(player, 'g', command='vote_start')
+        request('ana', 'g', command='roll_dice')
+        # Otra partida con una votación de ingreso que sigue abierta
+        request('eva', None, command='create_game', game_name='h', max_teams=2,
+                max_players_per_team=3, board_length=10, min_dice=1, max_dice=6)
+        request('gabi', None, command='join_game', game_name='h')
+        request('fede', None, command='join_game', game_name='h')
+        request('eva', 'h', command='create_team', team_name='verde')
+        request('gabi', 'h', command='join_team', team_name='verde')
+        request('eva', 'h', command='vote_team_join', vote_id='gabi', vote='si')
+        request('fede', 'h', command='join_team', team_name='verde')
+
+        # Se espera una compactación: el primer segmento desaparece
+        first = list_segments(server.journal.directory)[0]
+        deadline = time.monotonic() + 5.0
+        while first in list_segments(server.journal.directory):
+            assert time.monotonic() < deadline, "la compactación no ocurrió"
+            time.sleep(0.05)
+
+        request('beto', 'g', command='roll_dice')
+        request('caro', 'g', command='leave_game')
+        # Voto posterior al checkpoint: la votación queda abierta con un voto
+        request('eva', 'h', command='vote_team_join', vote_id='fede', vote='si')
+        assert server.games['h'].pending_votes['fede']['votes'] == {'eva': 'si'}
+    finally:
+        server.journal.stop()
+
+    games, applied = replay_journal(read_journal(server.journal.directory))
+    assert applied > 0
+    assert set(games) == set(server.games)
+    for name, game in server.games.items():
+        assert comparable_state(games[name]) == comparable_state(game)
+    shutil.rmtree(directory, ignore_errors=True)
+
+def test_spill_queue_ack_and_replay():
+    """El spill reenvía desde la última confirmación, también tras reabrirlo"""
+    directory = tempfile.mkdtemp()
+    try:
+        spill = SpillQueue(directory, segment_records=4, fsync=False)
+        spill.append([{"n": n} for n in range(10)])
+        batches = list(spill.read_batches(3))
+        assert [len(batch) for _, batch in batches] == [3, 3, 3, 1]
+        spill.ack(batches[1][0])
+        assert spill.pending() == 4
+        spill.close()
+
+        # Una caída no pierde lo pendiente ni reenvía lo confirmado
+        spill = SpillQueue(directory, segment_records=4, fsync=False)
+        assert spill.pending() == 4
+        assert [record["n"] for _, batch in spill.read_batches(10) for record in batch] == [6, 7, 8, 9]
+        spill.ack(spill.last_seq)
+        assert spill.pending() == 0
+        spill.close()
+
+        # Acuses del proxy: "OK n" con n hasta el tamaño del lote
+        assert batch_ack("OK 3", 3) == 3
+        assert batch_ack("OK 2", 3) == 2
+        assert batch_ack("OK 4", 3) is None
+        assert batch_ack("ERROR: RMI caído", 3) is None
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def json_request(sock, buffer: bytes, **request):
+    sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+    while True:
+        while b'\n' not in buffer:
+            data = sock.recv(65536)
+            assert data, "el frontal cerró la conexión"
+            buffer += data
+        line, buffer = buffer.split(b'\n', 1)
+        message = json.loads(line)
+        if message.get('type') != 'notification':
+            return message, buffer
+
+def test_router_keeps_shard_after_failed_join():
+    """Un join_game fallido no saca al jugador del shard de su partida"""
+    port = random.randint(20000, 40000)
+    directory = tempfile.mkdtemp()
+    server = subprocess.Popen(
+        [sys.executable, GAME_SERVER, '--port', str(port),
+         '--shards', '2', '--shard-base-port', str(port + 1), '--log-level', 'WARNING'],
+        cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 15.0
+        while True:
+            try:
+                sock = socket.create_connection(('localhost', port))
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "el frontal no arrancó"
+                time.sleep(0.2)
+        home = 'casa'
+        other = next(f'otra{n}' for n in range(100) if shard_for(f'otra{n}', 2) != shard_for(home, 2))
+        buffer = b''
+        response, buffer = json_request(sock, buffer, command='set_player_name', name='ana')
+        assert response['status'] == 'ok'
+        response, buffer = json_request(sock, buffer, command='create_game', game_name=home, max_teams=2,
+                                        max_players_per_team=2, board_length=10, min_dice=1, max_dice=6)
+        assert response['status'] == 'ok'
+        response, buffer = json_request(sock, buffer, command='join_game', game_name=other)
+        assert response['status'] == 'error'
+        # Los comandos siguen llegando al shard de la partida del jugador
+        response, buffer = json_request(sock, buffer, command='create_team', team_name='rojo')
+        assert response['status'] == 'ok', response
+        response, buffer = json_request(sock, buffer, command='leave_game')
+        assert response['status'] == 'ok', response
+        sock.close()
+    finally:
+        # Como Ctrl+C: el frontal cierra también a los shards
+        server.send_signal(signal.SIGINT)
+        server.wait(10)
+        shutil.rmtree(directory, ignore_errors=True)
+
+TESTS = [
+    test_binary_decoder_rejects_malformed_frames,
+    test_mirror_follows_changes_since,
+    test_replay_journal_after_compaction,
+    test_spill_queue_ack_and_replay,
+    test_router_keeps_shard_after_failed_join,
+]
+
+def main():
+    print("================================")
+    print("Team Race Game - Component Tests")
+    print("================================")
+    print()
+
+    failures = 0
+    for number, test in enumerate(TESTS, 1):
+        try:
+            test()
+            print(f"{number}. ✅ PASS: {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"{number}. ❌ FAIL: {test.__doc__}: {type(e).__name__}: {e}")
+
+    print()
+    print(f"Test completed: {len(TESTS) - failures}/{len(TESTS)} passed.")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,22 @@ def test_game_server(host='localhost', port=12345):
         sock.connect((host, port))
         
         # Enviar una solicitud simple
-        request = {"action": "list_games"}
-        sock.send(json.dumps(request).encode('utf-8'))
+        request = {"command": "list_games"}
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
         
-        # Recibir respuesta
-        response = sock.recv(1024).decode('utf-8')
-        data = json.loads(response)
+        # Recibir respuesta completa (una línea JSON)
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+        data = json.loads(response.decode('utf-8'))
         
         sock.close()
-        return True, "Game server is responding"
+        if data.get('status') != 'ok':
+            return False, f"Game server returned: {data.get('message')}"
+        return True, f"Game server is responding ({len(data.get('games', []))} games)"
     except Exception as e:
         return False, f"Game server error: {e}"
 